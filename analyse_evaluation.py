@@ -1,5 +1,8 @@
 
 import json
+import numpy as np
+
+from evaluation_matrix import EvaluationMatrix
 
 def load_deck():
     """Charge les données du deck depuis deck.json"""
@@ -19,27 +22,20 @@ def load_evaluations():
         print("Erreur: fichier evaluations.json introuvable.")
         return {}
 
-def analyze_card_evaluations(deck, evaluations):
+def analyze_card_evaluations(deck, evaluations, matrix=None):
     """Analyse les évaluations des cartes et retourne la liste triée"""
+    if matrix is None:
+        matrix = EvaluationMatrix(evaluations, (int(card['numero']) for card in deck))
+
+    # Nombre de rôles positifs par carte, en une seule opération sur la matrice
+    positive_counts = matrix.positive_counts()
     card_analysis = []
     
     for card in deck:
-        card_numero = card['numero']
-        card_name = card['mot']
-        
-        # Compter les évaluations positives pour cette carte
-        positive_count = 0
-        
-        # Parcourir tous les rôles dans evaluations
-        for role, role_evaluations in evaluations.items():
-            if card_numero in role_evaluations:
-                if role_evaluations[card_numero] == '+':
-                    positive_count += 1
-        
         card_analysis.append({
-            'numero': card_numero,
-            'nom': card_name,
-            'evaluations_positives': positive_count
+            'numero': card['numero'],
+            'nom': card['mot'],
+            'evaluations_positives': int(positive_counts[matrix.card_index[int(card['numero'])]])
         })
     
     # Trier par nombre d'évaluations positives (décroissant)
@@ -47,6 +43,30 @@ def analyze_card_evaluations(deck, evaluations):
     
     return sorted_analysis
 
+def print_role_statistics(matrix):
+    """Affiche l'équilibre de chaque rôle et la corrélation entre rôles"""
+    print("\n=== ÉQUILIBRE DES RÔLES ===")
+    print(f"{'Rôle':<15} {'Positives':<10} {'Négatives':<10} {'Bilan':<6}")
+    print("-" * 45)
+    positives = (matrix.matrix == 1).sum(axis=1)
+    negatives = (matrix.matrix == -1).sum(axis=1)
+    balance = matrix.role_balance()
+    for i, role in enumerate(matrix.roles):
+        print(f"{role:<15} {positives[i]:<10} {negatives[i]:<10} {balance[i]:+d}")
+
+    if len(matrix.roles) > 1:
+        print("\n=== CORRÉLATION ENTRE RÔLES ===")
+        correlation = matrix.role_correlation()
+        print(" " * 15 + "".join(f"{role[:8]:>9}" for role in matrix.roles))
+        for i, role in enumerate(matrix.roles):
+            print(f"{role:<15}" + "".join(f"{value:>9.2f}" for value in correlation[i]))
+
+        # Paire de rôles la plus semblable (hors diagonale)
+        upper = np.triu_indices(len(matrix.roles), k=1)
+        best = int(np.argmax(correlation[upper]))
+        i, j = upper[0][best], upper[1][best]
+        print(f"\nRôles les plus proches: {matrix.roles[i]} et {matrix.roles[j]} ({correlation[i, j]:.2f})")
+
 def main():
     """Fonction principale"""
     print("=== ANALYSE DES ÉVALUATIONS DE CARTES ===\n")
@@ -60,7 +80,8 @@ def main():
         return
     
     # Analyser les évaluations
-    analyzed_cards = analyze_card_evaluations(deck, evaluations)
+    matrix = EvaluationMatrix(evaluations, (int(card['numero']) for card in deck))
+    analyzed_cards = analyze_card_evaluations(deck, evaluations, matrix)
     
     # Afficher les résultats
     print(f"{'Numéro':<8} {'Nom':<15} {'Évaluations positives':<20}")
@@ -82,5 +103,7 @@ def main():
     
     print(f"\nCartes sans évaluations positives: {len([card for card in analyzed_cards if card['evaluations_positives'] == 0])}")
 
+    print_role_statistics(matrix)
+
 if __name__ == "__main__":
     main()
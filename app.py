@@ -1,35 +1,113 @@
 import os
+import re
 import json
+import atexit
 import logging
 import time
+import threading
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response, abort
+from flask import Flask, render_template, request, jsonify, send_from_directory, send_file, Response, abort, stream_with_context, g
 from dotenv import load_dotenv
 import requests
-from game_logic import GameState, evaluate_card_effect, get_story_prompt, call_mistral_ai, generate_game_conclusion, generate_image_prompt, generate_card_image_with_replicate, CARD_DECK, EVALUATIONS, ROLES, GAME_CONFIG, reload_config
+from game_logic import CARD_DECK, DECK, ROLES, GAME_CONFIG, TIMING_CONFIG, BASE_CARDS_TO_PLAY, starting_score, reload_config
 from speech_service import tts_service
+from audio_cache import audio_cache, is_audio_key
+from room_manager import room_registry, normalize_room_id
+from event_log import event_log
+from log_writer import log_writer
+from metrics import metrics, errors_total, http_request_seconds
+from archive import ARCHIVE_CONFIG, game_archive
+from card_play import PlayError, PlayJob, check_play, play_queue, image_jobs
+from card_image_cache import card_image_cache
+from image_ingest import IMAGE_EXTENSIONS
+from result_files import result_files
 import base64
 
 # Load environment variables
 load_dotenv()
 
-# Game configuration
-BASE_CARDS_TO_PLAY = 4  # Base number of cards + number of players
-
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Seuls les fichiers écrits par /sauver sont téléchargeables (pas les journaux ni la configuration)
+SAVED_FILE_NAME = re.compile(r'histoire_\d{8}_\d{6}\.json')
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET",
                                 "default-secret-key-for-development")
 
-# Global game state
-game_state = GameState()
-# Log initial action - Game start
-logger.info("Début de la partie")
-game_state.log_action("Début")
+# Lignes de journal encore en file écrites à l'arrêt (enregistré en premier : exécuté en dernier)
+atexit.register(log_writer.close)
+
+# Avec plusieurs workers, chaque worker écrit ses métriques dans METRICS_DIR (dernière écriture
+# à l'arrêt, après la file d'images) et /metrics les additionne
+if metrics.directory:
+    metrics.start_writer()
+    atexit.register(metrics.write_values)
+
+# Archive des parties (SQLite ou DATABASE_URL)
+game_archive.init_app(app)
+
+# Salles rechargées depuis le journal d'événements (avant les images qui les ciblent).
+# Avec un état partagé entre workers (STATE_BACKEND=sqlite), la base sert de persistance.
+if not room_registry.backend.shared:
+    room_registry.on_create = event_log.attach
+    room_registry.on_evict = event_log.detach
+    event_log.recover(room_registry)
+    atexit.register(event_log.snapshot_all, room_registry)
+
+# Images interrompues par le dernier arrêt, puis vidage de la file à l'arrêt
+image_jobs.restore(room_registry.get)
+atexit.register(image_jobs.shutdown)
+
+# Jauges lues à chaque collecte de /metrics (une série par worker)
+metrics.gauge('rooms_active', "Tables en mémoire", lambda: len(room_registry))
+metrics.gauge('players_active', "Joueurs actifs sur l'ensemble des tables", room_registry.player_count)
+metrics.gauge('play_jobs_queued', "Coups en attente ou en cours", play_queue.pending_count)
+metrics.gauge('image_jobs_queued', "Images en attente ou en cours", image_jobs.pending_count)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Latency per route pattern (not per URL, so room ids do not multiply the series)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        http_request_seconds.observe(time.perf_counter() - started,
+                                     route, request.method, str(response.status_code))
+        if response.status_code >= 500:
+            errors_total.inc('http')
+    return response
+
+
+
+class InvalidRoomError(ValueError):
+    """Raised when the client sends a malformed room id"""
+
+
+def get_room():
+    """Get the room targeted by the request (query string first, then JSON payload)"""
+    raw_room_id = request.args.get('room')
+    if raw_room_id is None:
+        data = request.get_json(silent=True) or {}
+        raw_room_id = data.get('room')
+    room_id = normalize_room_id(raw_room_id)
+    if room_id is None:
+        raise InvalidRoomError(raw_room_id)
+    return room_registry.get(room_id)
+
+
+@app.errorhandler(InvalidRoomError)
+def handle_invalid_room(e):
+    """Reject malformed room ids before touching any game state"""
+    return jsonify({'error': 'Identifiant de salle invalide'}), 400
 
 
 @app.route('/')
@@ -40,7 +118,13 @@ def index():
 
 @app.route('/envoyer', methods=['POST'])
 def envoyer():
-    """Handle card play or message from player"""
+    """
+    Handle card play or message from player.
+    The play is validated immediately, then executed as a background job:
+    the response carries the job id and progress is published through /refresh.
+    """
+    room = get_room()
+    game_state = room.state
     try:
         data = request.get_json()
         player_name = data.get('player_name', '').strip()
@@ -50,358 +134,180 @@ def envoyer():
         if not player_name or not player_role:
             return jsonify({'error': 'Nom et rôle requis'}), 400
 
-        # Update player activity
-        game_state.update_player_activity(player_name, player_role)
-
-        # Set processing state
-        game_state.processing_player = player_name
-        # For processing card, use the original prompt for display purposes
-        if prompt == '0':
-            game_state.processing_card = 0
-        elif prompt == '100':
-            game_state.processing_card = 100
-        elif prompt.startswith('101 '):
-            game_state.processing_card = prompt  # Store full string for special card 101
-        else:
-            try:
-                game_state.processing_card = int(prompt)
-            except ValueError:
-                game_state.processing_card = prompt  # Fallback to string
-
-        # Handle conclusion request
-        if prompt == '0':
-            if len(game_state.story) > 0:
-                # Generate conclusion based on score comparison
-                conclusion_text = generate_game_conclusion(
-                    game_state.score, game_state.score_initial,
-                    game_state.get_story_history())
-                game_state.story.append({
-                    'player': 'Narrateur',
-                    'role': 'Narrateur',
-                    'text': conclusion_text,
-                    'card': None,
-                    'effect': None,
-                    'timestamp': datetime.now().isoformat()
-                })
-                game_state.game_ended = True
-                game_state.update_card_played_timestamp(
-                )  # Update timestamp for conclusion
-                game_state.log_action(f"Conclusion demandée par {player_name}")
-
-            # Clear processing state
-            game_state.processing_player = None
-            game_state.processing_card = None
-            return jsonify({'success': True, 'message': 'Conclusion générée'})
-
-        # Validate card input using new validation system
-        validation_result = game_state.validate_card_input(prompt)
-        card_type = validation_result[0]
-
-        if card_type == 'invalid':
-            # Clear processing state on error
-            game_state.processing_player = None
-            game_state.processing_card = None
-            error_msg = validation_result[3] if len(
-                validation_result) > 3 else 'Entrée invalide'
-            return jsonify({'error': error_msg}), 400
-
-        card_number = validation_result[1]
-        target_card = validation_result[2] if len(
-            validation_result) > 2 else None
-
-        # Handle special cards
-        if card_type == 'special_100':
-            # Vérifier si la carte spéciale a déjà été jouée par ce joueur
-            already_played = any(
-                sc['player'] == player_name and sc['card_number'] == 100
-                for sc in game_state.special_cards_played)
-            if already_played:
-                # Clear processing state on error
-                game_state.processing_player = None
-                game_state.processing_card = None
-                return jsonify(
-                    {'error': 'Vous avez déjà joué la carte Inversion'}), 400
-
-            # Execute inversion logic
-            inversion_result = game_state.handle_inversion_card(
-                player_name, player_role)
-            game_state.update_card_played_timestamp()
-
-            # Clear processing state
-            game_state.processing_player = None
-            game_state.processing_card = None
-
-            return jsonify({
-                'success': True,
-                'message': inversion_result,
-                'special_card': True,
-                'inversion': True
-            })
+        with room.lock:
+            # Update player activity
+            game_state.update_player_activity(player_name, player_role)
+            check_play(game_state, player_name, prompt)
 
-        elif card_type == 'special_101':
-            # Vérifier si la carte spéciale a déjà été jouée par ce joueur
-            already_played = any(
-                sc['player'] == player_name and sc['card_number'] == 101
-                for sc in game_state.special_cards_played)
-            if already_played:
-                # Clear processing state on error
-                game_state.processing_player = None
-                game_state.processing_card = None
-                return jsonify(
-                    {'error': 'Vous avez déjà joué la carte Suppression'}), 400
-
-            # Execute suppression logic
-            if target_card is not None:
-                suppression_result = game_state.handle_suppression_card(
-                    player_name, player_role, target_card)
-            else:
-                return jsonify({'error':
-                                'Numéro de carte cible manquant'}), 400
-            game_state.update_card_played_timestamp()
-
-            # Clear processing state
-            game_state.processing_player = None
-            game_state.processing_card = None
-
-            return jsonify({
-                'success': True,
-                'message': suppression_result,
-                'special_card': True,
-                'suppression': True
-            })
+        job = play_queue.submit(room, PlayJob(room.room_id, player_name, player_role, prompt))
+        return jsonify({
+            'success': True,
+            'message': 'Carte en cours de traitement',
+            'job_id': job.id,
+            'status': job.status
+        }), 202
 
-        # Find card in deck
-        card = next((c for c in CARD_DECK if int(c['numero']) == card_number),
-                    None)
-        if not card:
-            # Clear processing state on error
-            game_state.processing_player = None
-            game_state.processing_card = None
-            return jsonify({'error': 'Carte non trouvée'}), 404
-
-        # Check if card already played
-        if card_number in game_state.played_cards:
-            # Clear processing state on error
-            game_state.processing_player = None
-            game_state.processing_card = None
-            return jsonify({'error': 'Carte déjà jouée'}), 400
-
-        # Evaluate card effect
-        effect = evaluate_card_effect(card_number, player_role, EVALUATIONS)
-
-        # Generate story text
-        story_prompt = get_story_prompt(
-            game_state.story,
-            game_state.score,
-            card,
-            player_role,
-            effect,
-            story_history=game_state.get_story_history())
-        story_text = call_mistral_ai(story_prompt)
-
-        # Initialize image_result
-        image_result = None
-        
-        # Generate image prompt using Mistral AI and log it, then generate actual image
-        try:
-            story_history = game_state.get_story_history()
-            image_prompt = generate_image_prompt(story_history, story_text)
-
-            # Log the image prompt to a separate file for later use
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open('image_prompts.txt', 'a', encoding='utf-8') as f:
-                f.write(
-                    f"[{timestamp}] {player_name} - Carte {card_number}: {image_prompt}\n\n"
-                )
+    except PlayError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        logger.error(f"Error in envoyer: {e}")
+        return jsonify({'error': 'Erreur interne du serveur'}), 500
 
-            logger.info(
-                f"Image prompt generated and logged for card {card_number}")
 
-            # Generate actual image using Replicate API
-            try:
-                card_name = card.get('mot', '') if card else ''
-                image_result = generate_card_image_with_replicate(
-                    image_prompt, player_name, card_number, card_name)
-                if image_result.get("success"):
-                    logger.info(
-                        f"Actual image generated successfully for card {card_number}"
-                    )
-                else:
-                    logger.warning(
-                        f"Image generation failed for card {card_number}: {image_result.get('error')}"
-                    )
-            except Exception as img_error:
-                logger.error(
-                    f"Error generating actual image for card {card_number}: {img_error}"
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status, stages and result of a card play job"""
+    job = play_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job non trouvé'}), 404
+    return jsonify(job.snapshot())
+
+
+def update_table_state(game_state):
+    """Adjust the starting score, auto-reset idle tables and publish player presence"""
+    # Update score based on active players if game hasn't started
+    if not game_state.jeu_commence:
+        active_players = game_state.get_active_players()
+        # Only update score if there are active players
+        if active_players:
+            new_score = starting_score(len(active_players))
+            if new_score != game_state.score:
+                game_state.score = new_score
+                game_state.log_action(
+                    f"Score ajusté à {new_score} pour {len(active_players)} joueurs actifs"
                 )
 
-        except Exception as e:
-            logger.error(f"Error generating image prompt: {e}")
-
-        # Update game state
-        game_state.played_cards.add(card_number)
-        game_state.update_card_played_timestamp()
-
-        # Logger la carte normale dans déroulement.txt
-        game_state.log_card_play(player_name, card_number, "normale")
-
-        # Mark game as started on first card
-        if not game_state.jeu_commence:
-            game_state.jeu_commence = True
-            game_state.score_initial = game_state.score
-            game_state.log_action(
-                f"Jeu commencé - Première carte jouée - Score initial: {game_state.score_initial}"
-            )
-
-        # Create story entry with image information
-        story_entry = {
-            'player': player_name,
-            'role': player_role,
-            'text': story_text,
-            'card': card,
-            'effect': effect,
-            'timestamp': datetime.now().isoformat(),
-            'image_path': None  # Will be updated if image generation succeeds
-        }
-
-        # If image generation was successful, add image information
-        if image_result and 'success' in image_result and image_result['success']:
-            images = image_result.get('images', [])
-            if images:
-                image_info = images[0]
-                
-                # Handle original images (fallback to barbason.be)
-                if image_info.get('is_original', False):
-                    story_entry['image_path'] = image_info.get('url', '')
-                    story_entry['is_original_image'] = True
-                else:
-                    # Handle generated images from Replicate
-                    full_filename = image_info.get('filename', '')
-                    if full_filename.startswith('result/'):
-                        story_entry['image_path'] = full_filename[7:]  # Remove 'result/' prefix
-                    else:
-                        story_entry['image_path'] = full_filename
-                    story_entry['is_original_image'] = False
-
-        game_state.story.append(story_entry)
-
-        # Story history is now automatically built from game_state.story
-
-        # Update score
-        if effect == '+':
-            game_state.score += 1
-        elif effect == '-':
-            game_state.score -= 1
-
-        # Check game end conditions
-        if len(game_state.played_cards) >= game_state.get_total_cards(
-                BASE_CARDS_TO_PLAY):
-            game_state.game_ended = True
-            game_state.log_action(f"Jeu terminé - Toutes les cartes jouées")
-            # Generate conclusion
-            conclusion_text = generate_game_conclusion(
-                game_state.score, game_state.score_initial,
-                game_state.get_story_history())
-            game_state.story.append({
-                'player': 'Narrateur',
-                'role': 'Narrateur',
-                'text': conclusion_text,
-                'card': None,
-                'effect': None,
-                'timestamp': datetime.now().isoformat()
-            })
-        # Note: Score reaching 0 no longer auto-ends the game
-
+    # Check for auto-reset (only if there is content and no active players)
+    if game_state.should_auto_reset():
+        logger.info("Auto-reset triggered due to inactivity")
+        game_state.reset_game()
         game_state.log_action(
-            f"{player_name} ({player_role}) a joué la carte {card_number} - {card['mot']}"
-        )
+            "Jeu réinitialisé automatiquement après inactivité")
 
-        # Clear processing state
-        game_state.processing_player = None
-        game_state.processing_card = None
+    game_state.publish_presence(BASE_CARDS_TO_PLAY)
 
-        return jsonify({
-            'success': True,
-            'message': 'Carte jouée avec succès',
-            'story_text': story_text,
-            'effect': effect
-        })
 
-    except Exception as e:
-        logger.error(f"Error in envoyer: {e}")
-        return jsonify({'error': 'Erreur interne du serveur'}), 500
+def parse_since(value):
+    """Parse the client's last known state version (None when absent or invalid)"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
 
 
 @app.route('/refresh', methods=['POST'])
 def refresh():
-    """Get current game state and update player activity"""
+    """
+    Get current game state and update player activity.
+    With `since=<version>` only what changed after that version is returned,
+    or {"not_modified": true} when nothing changed. With `wait=<seconds>` the
+    request is held until the state changes (long-polling fallback of /stream).
+    """
+    room = get_room()
+    game_state = room.state
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         player_name = data.get('player_name', '').strip()
         player_role = data.get('player_role', '').strip()
+        since = parse_since(data.get('since', request.args.get('since')))
+        try:
+            wait = min(float(data.get('wait', 0) or 0), TIMING_CONFIG['LONG_POLL_MAX_WAIT'])
+        except (TypeError, ValueError):
+            wait = 0
+
+        if wait > 0 and since is not None and since == game_state.version:
+            with room.lock:
+                game_state.connect_player(player_name, player_role)
+                room.subscribers += 1
+            try:
+                room.wait_for_change(since, wait)
+            finally:
+                with room.lock:
+                    room.subscribers -= 1
+                    game_state.disconnect_player(player_name)
 
-        if player_name and player_role:
-            game_state.update_player_activity(player_name, player_role)
-
-        # Update score based on active players if game hasn't started
-        if not game_state.jeu_commence:
-            active_players = game_state.get_active_players()
-            # Only update score if there are active players
-            if active_players:
-                new_score = max(2,
-                                len(active_players) *
-                                2)  # 2 points per active player, minimum 2
-                if new_score != game_state.score:
-                    game_state.score = new_score
-                    game_state.log_action(
-                        f"Score ajusté à {new_score} pour {len(active_players)} joueurs actifs"
-                    )
-
-        # Check for auto-reset (only if there is content and no active players)
-        if game_state.should_auto_reset():
-            logger.info("Auto-reset triggered due to inactivity")
-            game_state.reset_game()
-            game_state.log_action(
-                "Jeu réinitialisé automatiquement après inactivité")
-        else:
-            # Log debug info about auto-reset conditions
-            from game_logic import TIMING_CONFIG
-            inactive_time = datetime.now() - game_state.last_card_played
-            #logger.debug(f"Auto-reset check: story_count={len(game_state.story)}, "
-            #           f"cards_inactive_time={inactive_time.total_seconds():.1f}s/"
-            #           f"{TIMING_CONFIG['AUTO_RESET_TIMEOUT']}s")
+        with room.lock:
+            if player_name and player_role:
+                game_state.update_player_activity(player_name, player_role)
 
-        return jsonify({
-            'story':
-            game_state.story,
-            'score':
-            game_state.score,
-            'played_cards':
-            list(game_state.played_cards),
-            'active_players':
-            game_state.get_active_players(),
-            'game_ended':
-            game_state.game_ended,
-            'total_cards':
-            game_state.get_total_cards(BASE_CARDS_TO_PLAY),
-            'processing_player':
-            game_state.processing_player,
-            'processing_card':
-            game_state.processing_card,
-            'special_cards_played':
-            game_state.special_cards_played
-        })
+            update_table_state(game_state)
+            return jsonify(game_state.get_delta(since))
 
     except Exception as e:
         logger.error(f"Error in refresh: {e}")
         return jsonify({'error': 'Erreur lors du rafraîchissement'}), 500
 
 
+def schedule_presence_update(room):
+    """Publish the departure of a player once their presence has expired"""
+    def publish():
+        with room.lock:
+            update_table_state(room.state)
+
+    timer = threading.Timer(TIMING_CONFIG['PLAYER_TIMEOUT'] + 0.1, publish)
+    timer.daemon = True
+    timer.start()
+
+
+def format_sse(delta):
+    """Format a state delta as a Server-Sent Event"""
+    payload = json.dumps(delta, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {delta['version']}\nevent: state\ndata: {payload}\n\n"
+
+
+@app.route('/stream')
+def stream():
+    """
+    Server-Sent Events stream of state deltas for a room.
+    The connection sleeps until the room state changes; a comment line is
+    sent every STREAM_HEARTBEAT seconds to detect closed connections.
+    """
+    room = get_room()
+    game_state = room.state
+    player_name = request.args.get('player_name', '').strip()
+    player_role = request.args.get('player_role', '').strip()
+    # EventSource resends the last received id when it reconnects
+    since = parse_since(request.headers.get('Last-Event-ID', request.args.get('since')))
+
+    def generate(since):
+        with room.lock:
+            game_state.connect_player(player_name, player_role)
+            room.subscribers += 1
+        try:
+            yield f"retry: {int(TIMING_CONFIG['STREAM_RETRY'] * 1000)}\n\n"
+            while True:
+                with room.lock:
+                    room.touch()
+                    game_state.update_player_activity(player_name, player_role)
+                    update_table_state(game_state)
+                    delta = game_state.get_delta(since)
+                if not delta.get('not_modified'):
+                    since = delta['version']
+                    yield format_sse(delta)
+                if not room.wait_for_change(since, TIMING_CONFIG['STREAM_HEARTBEAT']):
+                    yield ": ping\n\n"
+        finally:
+            with room.lock:
+                room.subscribers -= 1
+                game_state.disconnect_player(player_name)
+            schedule_presence_update(room)
+
+    return Response(generate(since),
+                    mimetype='text/event-stream',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+                    })
+
+
 @app.route('/reset', methods=['POST'])
 def reset():
     """Reset the game"""
+    room = get_room()
+    game_state = room.state
     try:
-        game_state.reset_game()
+        with room.lock:
+            game_state.reset_game()
         game_state.log_action("Jeu réinitialisé manuellement")
         return jsonify({'success': True, 'message': 'Jeu réinitialisé'})
     except Exception as e:
@@ -412,23 +318,32 @@ def reset():
 @app.route('/sauver', methods=['POST'])
 def sauver():
     """Save the current game state"""
+    room = get_room()
+    game_state = room.state
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        saved_at = datetime.now()
+        timestamp = saved_at.strftime("%Y%m%d_%H%M%S")
         filename = f"histoire_{timestamp}.json"
 
-        save_data = {
-            'timestamp': timestamp,
-            'story': game_state.story,
-            'score': game_state.score,
-            'played_cards': list(game_state.played_cards),
-            'game_ended': game_state.game_ended
-        }
+        with room.lock:
+            save_data = {
+                'timestamp': timestamp,
+                'room': room.room_id,
+                'story': list(game_state.story),
+                'score': game_state.score,
+                'played_cards': list(game_state.played_cards),
+                'game_ended': game_state.game_ended
+            }
+            snapshot = game_state.to_snapshot()
+            players = game_state.get_active_players()
 
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(save_data, f, ensure_ascii=False, indent=2)
 
+        archive_id = game_archive.archive_state(room.room_id, snapshot, 'sauvegarde', players,
+                                                saved_at=saved_at)
         game_state.log_action(f"Jeu sauvegardé dans {filename}")
-        return jsonify({'success': True, 'filename': filename})
+        return jsonify({'success': True, 'filename': filename, 'archive_id': archive_id})
 
     except Exception as e:
         logger.error(f"Error in sauver: {e}")
@@ -437,7 +352,9 @@ def sauver():
 
 @app.route('/download/<filename>')
 def download(filename):
-    """Download a saved game file"""
+    """Download a saved game file (only the histoire_*.json files written by /sauver)"""
+    if not SAVED_FILE_NAME.fullmatch(filename):
+        abort(404)
     try:
         return send_from_directory('.', filename, as_attachment=True)
     except Exception as e:
@@ -457,15 +374,94 @@ def download_game():
         return jsonify({'error': 'Archive non trouvée'}), 404
 
 
+def _int_arg(name: str, default: int) -> int:
+    try:
+        return int(request.args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@app.route('/archive/games')
+def archive_games():
+    """Archived games, filtered by role, outcome, card or room (paginated)"""
+    try:
+        card = request.args.get('card')
+        pagination = game_archive.find_games(
+            role=request.args.get('role'),
+            outcome=request.args.get('outcome'),
+            card=int(card) if card and card.isdigit() else None,
+            room=request.args.get('room'),
+            page=_int_arg('page', 1),
+            per_page=_int_arg('per_page', ARCHIVE_CONFIG['PAGE_SIZE']))
+        return jsonify({
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'games': [game.to_dict() for game in pagination.items]
+        })
+    except Exception as e:
+        logger.error(f"Error listing archived games: {e}")
+        return jsonify({'error': "Erreur lors de la lecture de l'archive"}), 500
+
+
+@app.route('/archive/games/<int:game_id>')
+def archive_game(game_id):
+    """One archived game with its story"""
+    try:
+        game = game_archive.get_game(game_id)
+        if game is None:
+            return jsonify({'error': 'Partie non trouvée'}), 404
+        return jsonify(game.to_dict(with_entries=True))
+    except Exception as e:
+        logger.error(f"Error reading archived game {game_id}: {e}")
+        return jsonify({'error': "Erreur lors de la lecture de l'archive"}), 500
+
+
+@app.route('/archive/search')
+def archive_search():
+    """Full-text search in the archived stories"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Paramètre q manquant'}), 400
+    try:
+        return jsonify(game_archive.search(query, page=_int_arg('page', 1),
+                                           per_page=_int_arg('per_page', ARCHIVE_CONFIG['PAGE_SIZE'])))
+    except Exception as e:
+        logger.error(f"Error searching archive: {e}")
+        return jsonify({'error': 'Erreur lors de la recherche'}), 500
+
+
+@app.route('/archive/export.ndjson')
+def archive_export():
+    """Stream archived games as NDJSON; the next page starts after X-Next-After"""
+    try:
+        ids = game_archive.export_ids(after=_int_arg('after', 0),
+                                      limit=_int_arg('limit', ARCHIVE_CONFIG['EXPORT_MAX']))
+    except Exception as e:
+        logger.error(f"Error exporting archive: {e}")
+        return jsonify({'error': "Erreur lors de l'export"}), 500
+    response = Response(stream_with_context(game_archive.export_ndjson(ids)),
+                        mimetype='application/x-ndjson')
+    if ids:
+        response.headers['X-Next-After'] = str(ids[-1])
+    return response
+
+
+@app.cli.command('archive-import')
+def archive_import():
+    """Archive the histoire_*.json files that are not archived yet"""
+    print(f"{game_archive.import_saved_files()} parties importées")
+
+
 @app.route('/cards')
 def cards():
     """Get available cards"""
+    room = get_room()
+    game_state = room.state
     try:
-        available_cards = [
-            card for card in CARD_DECK
-            if int(card['numero']) not in game_state.played_cards
-        ]
-        return jsonify(available_cards)
+        # Précalculé une fois par combinaison de cartes jouées
+        return Response(DECK.available_json(game_state.played_mask),
+                        mimetype='application/json')
     except Exception as e:
         logger.error(f"Error getting cards: {e}")
         return jsonify({'error':
@@ -516,6 +512,7 @@ def api_config_reload():
 @app.route('/debug/env')
 def debug_env():
     """Debug endpoint for environment variables"""
+    game_state = get_room().state
     try:
         mistral_key = os.environ.get('MISTRAL_API_KEY')
         replicate_key = os.environ.get('REPLICATE_API_TOKEN')
@@ -527,14 +524,45 @@ def debug_env():
             'google_api_key': 'Present (' + str(len(google_key)) + ' chars)' if google_key else 'MISSING',
             'game_players': len(game_state.active_players),
             'cards_played': len(game_state.played_cards),
-            'current_score': game_state.score
+            'current_score': game_state.score,
+            'rooms': room_registry.stats(),
+            'event_log': event_log.stats(),
+            'archive': game_archive.stats(),
+            'logs': log_writer.stats()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metrics of this worker in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/mistral')
+def debug_mistral():
+    """Debug endpoint for the Mistral client (circuit breaker, retries)"""
+    try:
+        from mistral_client import mistral_client
+        from llm_cache import llm_cache
+        status = mistral_client.status()
+        status['enabled'] = GAME_CONFIG.get("mistral", {}).get("enabled", True)
+        status['cache'] = llm_cache.stats()
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/debug/speech')
+def debug_speech():
+    """Debug endpoint for the narration cache"""
+    return jsonify({
+        'configured': bool(tts_service.api_key),
+        'cache': audio_cache.stats()
+    })
+
 @app.route('/debug/story')
 def debug_story():
     """Debug endpoint specifically for story display issues"""
+    game_state = get_room().state
     try:
         story_data = []
         for i, entry in enumerate(game_state.story):
@@ -556,7 +584,8 @@ def debug_story():
                 'score': game_state.score,
                 'cards_played': len(game_state.played_cards),
                 'active_players': len(game_state.active_players)
-            }
+            },
+            'context': game_state.narrative_context.stats()
         })
     except Exception as e:
         logger.error(f"Error in debug_story: {e}")
@@ -572,26 +601,31 @@ def debug_page():
 def debug_images():
     """Debug endpoint to check available images and story data"""
     import os
+    game_state = get_room().state
     try:
         debug_info = {
             'available_images': [],
             'story_entries_with_images': [],
             'result_directory_exists': os.path.exists('result'),
-            'total_story_entries': len(game_state.story)
+            'total_story_entries': len(game_state.story),
+            'queue': image_jobs.stats(),
+            'card_image_cache': card_image_cache.stats(),
+            'result_files': result_files.stats()
         }
         
         # List available images
         if os.path.exists('result'):
-            images = [f for f in os.listdir('result') if f.endswith(('.jpg', '.jpeg', '.png'))]
+            images = [f for f in os.listdir('result') if f.endswith(IMAGE_EXTENSIONS)]
             debug_info['available_images'] = images[-5:]  # Last 5 images
         
         # Check story entries with images
         for i, entry in enumerate(game_state.story):
-            if entry.get('image_path'):
+            if entry.get('image_path') or entry.get('image_pending'):
                 debug_info['story_entries_with_images'].append({
                     'index': i,
                     'player': entry.get('player'),
                     'image_path': entry.get('image_path'),
+                    'image_pending': entry.get('image_pending', False),
                     'text_preview': entry.get('text', '')[:50] + '...'
                 })
         
@@ -604,28 +638,20 @@ def debug_images():
 @app.route('/result/<filename>')
 def serve_result_file(filename):
     """Serve generated images from the result directory"""
+    # Security check: only allow image files
+    if not filename.lower().endswith(IMAGE_EXTENSIONS):
+        return jsonify({'error': 'Type de fichier non autorisé'}), 400
     try:
-        import os
-        from flask import Response
-        
-        # Security check: only allow image files
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-            return jsonify({'error': 'Type de fichier non autorisé'}), 400
-            
-        # Check if file exists
-        file_path = os.path.join('result', filename)
-        if not os.path.exists(file_path):
-            logger.error(f"Image file not found: {file_path}")
+        response = result_files.response(filename)
+        if response is None:
+            logger.error(f"Image file not found: {filename}")
             return jsonify({'error': 'Image non trouvée'}), 404
-            
-        # Send file with proper headers for Chrome compatibility
-        response = send_from_directory('result', filename)
-        response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
+
         response.headers['Access-Control-Allow-Origin'] = '*'  # Allow CORS
         response.headers['Cross-Origin-Resource-Policy'] = 'cross-origin'  # Chrome fix
         response.headers['X-Content-Type-Options'] = 'nosniff'  # Chrome security
         return response
-        
+
     except Exception as e:
         logger.error(f"Error serving image {filename}: {e}")
         return jsonify({'error': 'Erreur lors du chargement de l\'image'}), 500
@@ -633,47 +659,27 @@ def serve_result_file(filename):
 
 @app.route('/proxy-image/<card_name>')
 def proxy_original_image(card_name):
-    """Proxy images from barbason.be to avoid CORS issues"""
-    try:
-        import requests
-        from unidecode import unidecode
-        
-        # Clean the card name for URL
-        clean_name = unidecode(card_name.lower().replace(' ', '').replace("'", ""))
-        original_url = f"http://www.barbason.be/public/{clean_name}.jpg"
-        
-        logger.info(f"Proxying image from: {original_url}")
-        
-        # Fetch the image from barbason.be
-        response = requests.get(original_url, timeout=10, stream=True)
-        response.raise_for_status()
-        
-        # Create a Flask response with the image data
-        from flask import Response
-        def generate():
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
-        
-        flask_response = Response(
-            generate(),
-            content_type=response.headers.get('content-type', 'image/jpeg'),
-            headers={
-                'Access-Control-Allow-Origin': '*',
-                'Cross-Origin-Resource-Policy': 'cross-origin',
-                'Cache-Control': 'public, max-age=3600',
-                'X-Content-Type-Options': 'nosniff'
-            }
-        )
-        
-        return flask_response
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error proxying image {card_name}: {e}")
+    """Serve barbason.be card images from the local cache (avoids CORS issues)"""
+    clean_name = DECK.slug_for_name(card_name)
+    if not DECK.has_slug(clean_name):
+        # Only deck cards: arbitrary names would grow the cache metadata without bound
         abort(404)
+    try:
+        path = card_image_cache.fetch(clean_name)
     except Exception as e:
         logger.error(f"Unexpected error proxying image {card_name}: {e}")
         abort(500)
+    if path is None:
+        abort(404)
+
+    flask_response = send_file(path, mimetype=card_image_cache.content_type(clean_name),
+                               conditional=True, max_age=3600)
+    flask_response.headers.update({
+        'Access-Control-Allow-Origin': '*',
+        'Cross-Origin-Resource-Policy': 'cross-origin',
+        'X-Content-Type-Options': 'nosniff'
+    })
+    return flask_response
 
 
 @app.route('/synthesize_speech', methods=['POST'])
@@ -693,19 +699,23 @@ def synthesize_speech():
         rate = float(data.get('rate', 1.0))  # Speaking rate
         pitch = float(data.get('pitch', 0.0))  # Pitch adjustment
         
-        # Call Google TTS service
-        result = tts_service.synthesize_speech(text, voice_type, rate, pitch)
+        # Long texts are split into sentences and streamed chunk by chunk
+        if data.get('chunked', True):
+            result = tts_service.prepare_speech(text, voice_type, rate, pitch)
+        else:
+            result = tts_service.synthesize_speech(text, voice_type, rate, pitch)
         
         if 'error' in result:
             logger.error(f"TTS synthesis error: {result['error']}")
             return jsonify(result), 500
         
-        # Return audio data as base64
+        # The client plays the MP3 from its URL (no base64 in the JSON)
         return jsonify({
             'success': True,
-            'audio_content': result['audio_content'],
+            'audio_url': f"/speech/{result['audio_key']}.mp3",
             'audio_format': result['audio_format'],
-            'text_length': result['text_length']
+            'text_length': result['text_length'],
+            'cached': result['cached']
         })
         
     except Exception as e:
@@ -713,6 +723,28 @@ def synthesize_speech():
         return jsonify({'error': f'Speech synthesis failed: {str(e)}'}), 500
 
 
+@app.route('/speech/<key>.mp3')
+def speech_audio(key):
+    """Serve a synthesized narration (content-addressed, ETag and Range supported)"""
+    if not is_audio_key(key):
+        return jsonify({'error': 'Identifiant audio invalide'}), 400
+    path = tts_service.audio_path(key)
+    if path is None:
+        # Narration still being synthesized: MP3 segments are sent as each chunk is ready
+        stream = tts_service.stream_speech(key)
+        if stream is None:
+            return jsonify({'error': 'Audio non trouvé'}), 404
+        return Response(stream, mimetype='audio/mpeg', headers={
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        })
+
+    response = send_file(path, mimetype='audio/mpeg', conditional=True, etag=key,
+                         max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
+
+
 @app.route('/speech_voices', methods=['GET'])
 def get_speech_voices():
     """Get available speech voices"""
@@ -0,0 +1,359 @@
+import os
+import glob
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import selectinload
+
+from story_log import entry_card_number
+
+logger = logging.getLogger(__name__)
+
+# Archive des parties terminées et sauvegardées (SQLite par défaut, Postgres via DATABASE_URL)
+ARCHIVE_CONFIG = {
+    'DATABASE_URL': os.getenv('DATABASE_URL', 'sqlite:///archive.db'),
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+    'EXPORT_MAX': 1000,  # Parties par page d'export NDJSON
+    'EXPORT_BATCH': 100  # Parties chargées à la fois pendant l'export
+}
+
+db = SQLAlchemy()
+
+
+class Game(db.Model):
+    __tablename__ = 'archive_games'
+
+    id = db.Column(db.Integer, primary_key=True)
+    room = db.Column(db.String(64), nullable=False, index=True)
+    source = db.Column(db.String(16), nullable=False)  # 'fin' (partie terminée) ou 'sauvegarde'
+    saved_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    started_at = db.Column(db.DateTime)
+    score = db.Column(db.Integer, nullable=False)
+    score_initial = db.Column(db.Integer)
+    game_ended = db.Column(db.Boolean, nullable=False, default=False)
+    outcome = db.Column(db.String(16), index=True)  # 'victoire', 'défaite', None si en cours
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    players = db.relationship('GamePlayer', backref='game', cascade='all, delete-orphan',
+                              lazy='selectin')
+    entries = db.relationship('GameEntry', backref='game', cascade='all, delete-orphan',
+                              order_by='GameEntry.position')
+
+    def to_dict(self, with_entries: bool = False) -> Dict:
+        data = {
+            'id': self.id,
+            'room': self.room,
+            'source': self.source,
+            'saved_at': self.saved_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'score': self.score,
+            'score_initial': self.score_initial,
+            'game_ended': self.game_ended,
+            'outcome': self.outcome,
+            'entry_count': self.entry_count,
+            'players': [{'name': p.name, 'role': p.role} for p in self.players]
+        }
+        if with_entries:
+            data['entries'] = [entry.to_dict() for entry in self.entries]
+        return data
+
+
+class GamePlayer(db.Model):
+    __tablename__ = 'archive_players'
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('archive_games.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    role = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (db.Index('ix_archive_players_role_game', 'role', 'game_id'),)
+
+
+class GameEntry(db.Model):
+    __tablename__ = 'archive_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('archive_games.id', ondelete='CASCADE'),
+                        nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    entry_id = db.Column(db.String(32))
+    player = db.Column(db.String(100))
+    role = db.Column(db.String(64))
+    text = db.Column(db.Text, nullable=False)
+    card_number = db.Column(db.Integer, index=True)
+    card_name = db.Column(db.String(100))
+    effect = db.Column(db.String(4))
+    image_path = db.Column(db.String(255))
+    timestamp = db.Column(db.String(32))
+
+    __table_args__ = (
+        db.Index('ix_archive_entries_game_position', 'game_id', 'position'),
+        db.Index('ix_archive_entries_role_effect', 'role', 'effect'),
+    )
+
+    def to_dict(self) -> Dict:
+        return {
+            'position': self.position,
+            'id': self.entry_id,
+            'player': self.player,
+            'role': self.role,
+            'text': self.text,
+            'card_number': self.card_number,
+            'card_name': self.card_name,
+            'effect': self.effect,
+            'image_path': self.image_path,
+            'timestamp': self.timestamp
+        }
+
+
+# Recherche plein texte : table FTS5 synchronisée par triggers (SQLite)
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS archive_entries_fts
+       USING fts5(text, content='archive_entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS archive_entries_fts_insert AFTER INSERT ON archive_entries BEGIN
+       INSERT INTO archive_entries_fts(rowid, text) VALUES (new.id, new.text); END""",
+    """CREATE TRIGGER IF NOT EXISTS archive_entries_fts_delete AFTER DELETE ON archive_entries BEGIN
+       INSERT INTO archive_entries_fts(archive_entries_fts, rowid, text) VALUES ('delete', old.id, old.text); END""",
+    """CREATE TRIGGER IF NOT EXISTS archive_entries_fts_update AFTER UPDATE OF text ON archive_entries BEGIN
+       INSERT INTO archive_entries_fts(archive_entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+       INSERT INTO archive_entries_fts(rowid, text) VALUES (new.id, new.text); END""",
+]
+
+# Index GIN équivalent pour Postgres
+POSTGRES_FTS_DDL = [
+    """CREATE INDEX IF NOT EXISTS ix_archive_entries_text_fts
+       ON archive_entries USING gin (to_tsvector('french', text))""",
+]
+
+
+def database_url(url: str) -> str:
+    """Accept the postgres:// scheme still used by some hosts"""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def game_outcome(game_ended: bool, score: int, score_initial: Optional[int]) -> Optional[str]:
+    """Same rule as generate_game_conclusion: victory when the final score is not below the initial one"""
+    if not game_ended:
+        return None
+    return 'victoire' if score >= (score_initial or 0) else 'défaite'
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    for parse in (datetime.fromisoformat, lambda v: datetime.strptime(v, "%Y%m%d_%H%M%S")):
+        try:
+            return parse(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class GameArchive:
+    """Indexed archive of games (players, entries, cards, effects, images) with full-text search"""
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url(ARCHIVE_CONFIG['DATABASE_URL']))
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {'pool_pre_ping': True})
+        db.init_app(app)
+        self.app = app
+        with app.app_context():
+            if db.engine.dialect.name == 'sqlite':
+                event.listen(db.engine, 'connect', _sqlite_pragmas)
+            db.create_all()
+            for statement in self._fts_ddl():
+                db.session.execute(text(statement))
+            db.session.commit()
+
+    def _dialect(self) -> str:
+        return db.engine.dialect.name
+
+    def _fts_ddl(self) -> List[str]:
+        return {'sqlite': SQLITE_FTS_DDL, 'postgresql': POSTGRES_FTS_DDL}.get(self._dialect(), [])
+
+    def archive_state(self, room_id: str, snapshot: Dict, source: str,
+                      players: Optional[List[Dict]] = None,
+                      saved_at: Optional[datetime] = None) -> Optional[int]:
+        """
+        Store a game from GameState.to_snapshot() (taken under the room lock).
+        Returns the archive id, None if the archive is not configured or failed.
+        """
+        if self.app is None:
+            return None
+        try:
+            with self.app.app_context():
+                game = Game(
+                    room=room_id,
+                    source=source,
+                    saved_at=saved_at or datetime.now(),
+                    started_at=_parse_datetime(snapshot.get('game_start_time')),
+                    score=snapshot['score'],
+                    score_initial=snapshot.get('score_initial'),
+                    game_ended=bool(snapshot.get('game_ended')),
+                    outcome=game_outcome(bool(snapshot.get('game_ended')), snapshot['score'],
+                                         snapshot.get('score_initial')),
+                    entry_count=len(snapshot['story'])
+                )
+                # Players: those at the table, plus every player seen in the story
+                roles = {(p['name'], p['role']) for p in players or []}
+                roles.update((entry['player'], entry['role']) for entry in snapshot['story']
+                             if entry.get('player') and entry.get('role') and entry['role'] != 'Narrateur')
+                game.players = [GamePlayer(name=name, role=role) for name, role in sorted(roles)]
+                game.entries = [self._entry(position, entry)
+                                for position, entry in enumerate(snapshot['story'])]
+                db.session.add(game)
+                db.session.commit()
+                logger.info(f"Partie archivée: {game.id} (salle {room_id}, {source}, {game.outcome})")
+                return game.id
+        except Exception as e:
+            logger.error(f"Erreur d'archivage de la partie de la salle {room_id}: {e}")
+            return None
+
+    @staticmethod
+    def _entry(position: int, entry: Dict) -> GameEntry:
+        card = entry.get('card') or {}
+        return GameEntry(
+            position=position,
+            entry_id=entry.get('id'),
+            player=entry.get('player'),
+            role=entry.get('role'),
+            text=entry.get('text') or '',
+            card_number=entry_card_number(entry),
+            card_name=card.get('mot'),
+            effect=entry.get('effect'),
+            image_path=entry.get('image_path'),
+            timestamp=entry.get('timestamp')
+        )
+
+    def import_saved_files(self, pattern: str = 'histoire_*.json') -> int:
+        """
+        Archive the /sauver files that are not archived yet. A file is matched
+        to its archived save by room and timestamp (to the second).
+        """
+        imported = 0
+        for path in sorted(glob.glob(pattern)):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Sauvegarde illisible ignorée: {path} ({e})")
+                continue
+            room_id = data.get('room', 'principale')
+            saved_at = _parse_datetime(data.get('timestamp'))
+            if saved_at is not None and self._has_save(room_id, saved_at):
+                continue
+            snapshot = {'story': data.get('story', []), 'score': data.get('score', 0),
+                        'game_ended': data.get('game_ended', False)}
+            if self.archive_state(room_id, snapshot, 'sauvegarde', saved_at=saved_at):
+                imported += 1
+        return imported
+
+    def _has_save(self, room_id: str, saved_at: datetime) -> bool:
+        with self.app.app_context():
+            return db.session.scalar(
+                select(func.count(Game.id)).where(
+                    Game.room == room_id, Game.source == 'sauvegarde',
+                    Game.saved_at >= saved_at, Game.saved_at < saved_at + timedelta(seconds=1))) > 0
+
+    def find_games(self, role: Optional[str] = None, outcome: Optional[str] = None,
+                   card: Optional[int] = None, room: Optional[str] = None,
+                   page: int = 1, per_page: int = ARCHIVE_CONFIG['PAGE_SIZE']):
+        """Paginated games, most recent first (must run in an app context)"""
+        query = select(Game).order_by(Game.id.desc())
+        if role:
+            query = query.where(Game.players.any(GamePlayer.role == role))
+        if outcome:
+            query = query.where(Game.outcome == outcome)
+        if card is not None:
+            query = query.where(Game.entries.any(GameEntry.card_number == card))
+        if room:
+            query = query.where(Game.room == room)
+        return db.paginate(query, page=page, per_page=per_page,
+                           max_per_page=ARCHIVE_CONFIG['MAX_PAGE_SIZE'], error_out=False)
+
+    def get_game(self, game_id: int) -> Optional[Game]:
+        return db.session.get(Game, game_id)
+
+    def search(self, query: str, page: int = 1,
+               per_page: int = ARCHIVE_CONFIG['PAGE_SIZE']) -> Dict:
+        """Full-text search over story entries (FTS5 on SQLite, tsvector on Postgres)"""
+        per_page = max(1, min(per_page, ARCHIVE_CONFIG['MAX_PAGE_SIZE']))
+        offset = (max(page, 1) - 1) * per_page
+        dialect = self._dialect()
+        if dialect == 'sqlite':
+            # Each word is quoted: user input never reaches the FTS5 query syntax
+            terms = ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+            rows = db.session.execute(text(
+                "SELECT e.id FROM archive_entries_fts f JOIN archive_entries e ON e.id = f.rowid "
+                "WHERE archive_entries_fts MATCH :terms ORDER BY f.rank LIMIT :limit OFFSET :offset"),
+                {'terms': terms, 'limit': per_page, 'offset': offset})
+        elif dialect == 'postgresql':
+            rows = db.session.execute(text(
+                "SELECT id FROM archive_entries "
+                "WHERE to_tsvector('french', text) @@ plainto_tsquery('french', :query) "
+                "ORDER BY ts_rank(to_tsvector('french', text), plainto_tsquery('french', :query)) DESC "
+                "LIMIT :limit OFFSET :offset"),
+                {'query': query, 'limit': per_page, 'offset': offset})
+        else:
+            rows = db.session.execute(
+                select(GameEntry.id).where(GameEntry.text.ilike(f"%{query}%"))
+                .order_by(GameEntry.id.desc()).limit(per_page).offset(offset))
+        ids = [row[0] for row in rows]
+        entries = {entry.id: entry for entry in
+                   db.session.scalars(select(GameEntry).where(GameEntry.id.in_(ids)))} if ids else {}
+        return {
+            'page': page,
+            'per_page': per_page,
+            'results': [dict(entries[i].to_dict(), game_id=entries[i].game_id) for i in ids]
+        }
+
+    def export_ids(self, after: int = 0, limit: int = ARCHIVE_CONFIG['EXPORT_MAX']) -> List[int]:
+        """Ids of the next export page (keyset pagination on the game id)"""
+        limit = max(1, min(limit, ARCHIVE_CONFIG['EXPORT_MAX']))
+        return list(db.session.scalars(
+            select(Game.id).where(Game.id > after).order_by(Game.id).limit(limit)))
+
+    def export_ndjson(self, ids: List[int]) -> Iterator[str]:
+        """One JSON line per game with its entries, loaded EXPORT_BATCH games at a time"""
+        batch = ARCHIVE_CONFIG['EXPORT_BATCH']
+        for start in range(0, len(ids), batch):
+            games = db.session.scalars(
+                select(Game).where(Game.id.in_(ids[start:start + batch]))
+                .order_by(Game.id).options(selectinload(Game.entries)))
+            for game in games:
+                yield json.dumps(game.to_dict(with_entries=True), ensure_ascii=False) + "\n"
+            db.session.expunge_all()
+
+    def stats(self) -> Dict:
+        if self.app is None:
+            return {'configured': False}
+        with self.app.app_context():
+            return {
+                'configured': True,
+                'dialect': self._dialect(),
+                'games': db.session.scalar(select(func.count(Game.id))),
+                'entries': db.session.scalar(select(func.count(GameEntry.id)))
+            }
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+# Global archive
+game_archive = GameArchive()
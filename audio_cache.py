@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cache disque des narrations (MP3 de Google TTS)
+AUDIO_CACHE_CONFIG = {
+    'DIR': os.getenv('AUDIO_CACHE_DIR', os.path.join('cache', 'audio')),
+    'MAX_BYTES': 200 * 1024 * 1024  # Au-delà, les narrations les moins récemment lues sont supprimées
+}
+
+
+def audio_key(text: str, voice_type: str, rate: float, pitch: float) -> str:
+    """Content address of a narration: sha256 of (text, voice, rate, pitch)"""
+    raw = f"{voice_type}\x00{rate:.2f}\x00{pitch:.1f}\x00{text}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def is_audio_key(key: str) -> bool:
+    return len(key) == 64 and all(c in '0123456789abcdef' for c in key)
+
+
+class AudioCache:
+    """
+    MP3 files named by audio_key, with LRU eviction once the directory grows
+    past max_bytes. Files are shared by every worker; the LRU order is kept
+    per process (seeded from the file mtimes at startup).
+    """
+
+    def __init__(self, directory: str = AUDIO_CACHE_CONFIG['DIR'],
+                 max_bytes: int = AUDIO_CACHE_CONFIG['MAX_BYTES']):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext == '.mp3' and is_audio_key(key):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(files):
+            self._sizes[key] = size
+            self._total += size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached narration, None if absent"""
+        path = self.path(key)
+        with self._lock:
+            if key in self._sizes:
+                if os.path.exists(path):
+                    self._sizes.move_to_end(key)
+                    self.hits += 1
+                    return path
+                self._total -= self._sizes.pop(key)
+            elif os.path.exists(path):
+                # Written by another worker
+                size = os.path.getsize(path)
+                self._sizes[key] = size
+                self._total += size
+                self.hits += 1
+                return path
+            self.misses += 1
+        return None
+
+    def put(self, key: str, audio: bytes) -> str:
+        """Store a narration (atomic rename) and evict the least recently used ones"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+            self._sizes[key] = len(audio)
+            self._total += len(audio)
+            while self._total > self.max_bytes and len(self._sizes) > 1:
+                old_key, size = self._sizes.popitem(last=False)
+                self._total -= size
+                self.evictions += 1
+                try:
+                    os.remove(self.path(old_key))
+                except OSError:
+                    pass
+        return self.path(key)
+
+    # Plan d'une narration synthétisée par morceaux (liste des phrases), lu par le flux audio
+
+    def put_plan(self, key: str, plan: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, f"{key}.json"))
+
+    def get_plan(self, key: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, f"{key}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def remove_plan(self, key: str):
+        try:
+            os.remove(os.path.join(self.directory, f"{key}.json"))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'files': len(self._sizes),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+# Global cache
+audio_cache = AudioCache()
@@ -0,0 +1,90 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from unidecode import unidecode
+
+logger = logging.getLogger(__name__)
+
+# Réponses /cards gardées en mémoire (une par combinaison de cartes jouées)
+AVAILABLE_CACHE_SIZE = 512
+
+
+def slugify_card_name(card_name: str) -> str:
+    """Canonical slug of a card name, as used in barbason.be image URLs"""
+    return unidecode(card_name).lower().replace(' ', '').replace("'", '').replace('’', '')
+
+
+def card_bit(card_number: int) -> int:
+    return 1 << card_number
+
+
+class CardDeck:
+    """
+    The deck, indexed once at load time: integer lookup, one precomputed slug
+    per card and JSON of the available cards cached by played-cards bitset.
+    """
+
+    def __init__(self, cards: List[Dict]):
+        self.cards = cards
+        self._by_number: Dict[int, Dict] = {}
+        self._slugs: Dict[int, str] = {}
+        self._slugs_by_name: Dict[str, str] = {}
+        self._bits: List[Tuple[int, Dict]] = []
+        for card in cards:
+            number = int(card['numero'])
+            self._by_number[number] = card
+            self._bits.append((card_bit(number), card))
+            slug = slugify_card_name(card['mot'])
+            self._slugs[number] = slug
+            self._slugs_by_name[card['mot']] = slug
+        self._slug_set = set(self._slugs.values())
+        self._available_json: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def get(self, card_number: int) -> Optional[Dict]:
+        """Card by number, None if it does not exist"""
+        return self._by_number.get(card_number)
+
+    def slug(self, card_number: int) -> Optional[str]:
+        return self._slugs.get(card_number)
+
+    def has_slug(self, slug: str) -> bool:
+        """True if slug is the image slug of a deck card"""
+        return slug in self._slug_set
+
+    def slug_for_name(self, card_name: str) -> str:
+        """Precomputed slug of a deck card name (computed on the fly for unknown names)"""
+        slug = self._slugs_by_name.get(card_name)
+        return slug if slug is not None else slugify_card_name(card_name)
+
+    @staticmethod
+    def mask_of(card_numbers: Iterable[int]) -> int:
+        """Bitset of a set of card numbers"""
+        mask = 0
+        for number in card_numbers:
+            mask |= card_bit(number)
+        return mask
+
+    def available_cards(self, played_mask: int) -> List[Dict]:
+        """Deck cards not in the played bitset, in deck order"""
+        return [card for bit, card in self._bits if not played_mask & bit]
+
+    def available_json(self, played_mask: int) -> str:
+        """JSON list of the available cards, computed once per played bitset"""
+        with self._lock:
+            body = self._available_json.get(played_mask)
+            if body is not None:
+                self._available_json.move_to_end(played_mask)
+                return body
+        body = json.dumps(self.available_cards(played_mask), ensure_ascii=False)
+        with self._lock:
+            self._available_json[played_mask] = body
+            if len(self._available_json) > AVAILABLE_CACHE_SIZE:
+                self._available_json.popitem(last=False)
+        return body
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import cache_requests_total, errors_total, external_call_seconds
+
+logger = logging.getLogger(__name__)
+
+# Cache disque des images originales des cartes (barbason.be)
+CARD_IMAGE_CACHE_CONFIG = {
+    'DIR': os.getenv('CARD_IMAGE_CACHE_DIR', os.path.join('cache', 'card_images')),
+    'BASE_URL': 'http://www.barbason.be/public',
+    'REVALIDATE_AFTER': 24 * 3600,  # Secondes avant de revalider une image (ETag / Last-Modified)
+    'NEGATIVE_TTL': 3600,  # Secondes pendant lesquelles un 404 est gardé en mémoire
+    'ERROR_TTL': 60,  # Secondes avant de réessayer une image jamais téléchargée après une erreur réseau
+    'TIMEOUT': 5,
+    'POOL_SIZE': 8
+}
+
+
+def card_image_url(slug: str) -> str:
+    """Public URL of a card image on barbason.be"""
+    return f"{CARD_IMAGE_CACHE_CONFIG['BASE_URL']}/{slug}.jpg"
+
+
+class CardImageCache:
+    """
+    Card images fetched once from barbason.be and kept on disk.
+    Each image has a metadata sidecar (ETag, Last-Modified, last check); stale
+    images are revalidated with a conditional GET, 404s are cached for
+    NEGATIVE_TTL seconds, and a stale copy is served when the site is down
+    (an image never downloaded is retried after ERROR_TTL seconds).
+    """
+
+    def __init__(self, directory: str = CARD_IMAGE_CACHE_CONFIG['DIR'],
+                 revalidate_after: float = CARD_IMAGE_CACHE_CONFIG['REVALIDATE_AFTER'],
+                 negative_ttl: float = CARD_IMAGE_CACHE_CONFIG['NEGATIVE_TTL'],
+                 error_ttl: float = CARD_IMAGE_CACHE_CONFIG['ERROR_TTL'],
+                 session: Optional[requests.Session] = None):
+        self.directory = os.path.abspath(directory)
+        self.revalidate_after = revalidate_after
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=CARD_IMAGE_CACHE_CONFIG['POOL_SIZE'])
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self._meta: Dict[str, Dict] = {}
+        self._slug_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.downloads = 0
+        self.revalidated = 0
+        self.not_found = 0
+        self.errors = 0
+
+    def image_path(self, slug: str) -> str:
+        return os.path.join(self.directory, f"{slug}.jpg")
+
+    def _meta_path(self, slug: str) -> str:
+        return os.path.join(self.directory, f"{slug}.json")
+
+    def _slug_lock(self, slug: str) -> threading.Lock:
+        with self._lock:
+            return self._slug_locks.setdefault(slug, threading.Lock())
+
+    def _load_meta(self, slug: str) -> Optional[Dict]:
+        meta = self._meta.get(slug)
+        if meta is None:
+            try:
+                with open(self._meta_path(slug), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._meta[slug] = meta
+        return meta
+
+    def _save_meta(self, slug: str, meta: Dict):
+        self._meta[slug] = meta
+        if meta['status'] != 200:
+            # 404s and errors are only remembered in memory
+            return
+        with open(self._meta_path(slug), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _write_image(self, slug: str, response: requests.Response):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+            os.replace(tmp_path, self.image_path(slug))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def fetch(self, slug: str) -> Optional[str]:
+        """Local path of a card image, downloaded or revalidated if needed; None if it does not exist"""
+        with self._slug_lock(slug):
+            meta = self._load_meta(slug)
+            now = time.time()
+            has_file = meta is not None and meta['status'] == 200 and os.path.exists(self.image_path(slug))
+
+            if meta is not None:
+                age = now - meta['checked_at']
+                if meta['status'] != 200:
+                    if age < (self.negative_ttl if meta['status'] == 404 else self.error_ttl):
+                        self.hits += 1
+                        cache_requests_total.inc('card_image', 'hit')
+                        return None
+                if has_file and age < self.revalidate_after:
+                    self.hits += 1
+                    cache_requests_total.inc('card_image', 'hit')
+                    return self.image_path(slug)
+
+            headers = {}
+            if has_file:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            url = card_image_url(slug)
+            try:
+                with external_call_seconds.time('card_image'), \
+                        self.session.get(url, headers=headers, stream=True,
+                                         timeout=CARD_IMAGE_CACHE_CONFIG['TIMEOUT']) as response:
+                    if response.status_code == 304 and has_file:
+                        self.revalidated += 1
+                        cache_requests_total.inc('card_image', 'revalidated')
+                        self._save_meta(slug, dict(meta, checked_at=now))
+                        return self.image_path(slug)
+                    if response.status_code == 404:
+                        self.not_found += 1
+                        cache_requests_total.inc('card_image', 'miss')
+                        logger.info(f"Card image not found: {url}")
+                        self._save_meta(slug, {'status': 404, 'checked_at': now})
+                        return None
+                    response.raise_for_status()
+                    self._write_image(slug, response)
+                    self.downloads += 1
+                    cache_requests_total.inc('card_image', 'miss')
+                    logger.info(f"Card image cached: {url}")
+                    self._save_meta(slug, {
+                        'status': 200,
+                        'checked_at': now,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'content_type': response.headers.get('Content-Type', 'image/jpeg')
+                    })
+                    return self.image_path(slug)
+            except (requests.exceptions.RequestException, OSError) as e:
+                self.errors += 1
+                errors_total.inc('card_image')
+                if has_file:
+                    logger.warning(f"Could not revalidate {url}, serving cached copy: {e}")
+                    # Next attempt in ERROR_TTL seconds
+                    self._meta[slug] = dict(meta, checked_at=now - self.revalidate_after + self.error_ttl)
+                    return self.image_path(slug)
+                logger.warning(f"Could not fetch card image {url}: {e}")
+                self._save_meta(slug, {'status': 0, 'checked_at': now})
+                return None
+
+    def exists(self, slug: str) -> bool:
+        """True if barbason.be has an image for this slug (answered from the cache when possible)"""
+        return self.fetch(slug) is not None
+
+    def content_type(self, slug: str) -> str:
+        meta = self._load_meta(slug) or {}
+        return meta.get('content_type') or 'image/jpeg'
+
+    def stats(self) -> Dict:
+        return {
+            'directory': self.directory,
+            'hits': self.hits,
+            'downloads': self.downloads,
+            'revalidated': self.revalidated,
+            'not_found': self.not_found,
+            'errors': self.errors
+        }
+
+
+# Global cache
+card_image_cache = CardImageCache()
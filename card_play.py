@@ -0,0 +1,571 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from archive import game_archive
+from game_logic import (BASE_CARDS_TO_PLAY, DECK,
+                        evaluate_card_effect, get_story_prompt, call_mistral_ai,
+                        generate_game_conclusion, generate_image_prompt,
+                        generate_card_image_with_replicate, image_generation_enabled)
+from image_queue import ImageJob, ImageJobQueue
+from log_writer import log_writer
+from metrics import errors_total, play_stage_seconds
+from speech_service import tts_service
+from stage_graph import StageGraph
+from story_log import new_entry_id
+
+logger = logging.getLogger(__name__)
+
+# Configuration de l'exécution des cartes jouées
+PLAY_CONFIG = {
+    'MAX_WORKERS': 8,  # Parties traitées en parallèle (une carte à la fois par salle)
+    'MAX_FINISHED_JOBS': 1000,  # Jobs terminés gardés pour /jobs/<id>
+    'STREAM_UPDATE_INTERVAL': 0.2  # Secondes minimum entre deux publications du texte partiel
+}
+
+
+class PlayError(Exception):
+    """A card play rejected for a game reason (message shown to the player)"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class PlayJob:
+    """A card play accepted by /envoyer and executed in the background"""
+
+    def __init__(self, room_id: str, player_name: str, player_role: str, prompt: str):
+        self.id = uuid.uuid4().hex
+        self.room_id = room_id
+        self.player_name = player_name
+        self.player_role = player_role
+        self.prompt = prompt
+        self.status = 'queued'  # queued, running, done, failed
+        self.stages: "OrderedDict[str, Dict]" = OrderedDict()
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        # Called whenever the job progresses (publishes it in the room state)
+        self.on_update: Optional[Callable[["PlayJob"], None]] = None
+        # Stages may run concurrently on several threads
+        self._lock = threading.Lock()
+
+    def _updated(self):
+        if self.on_update:
+            self.on_update(self)
+
+    def start(self):
+        self.status = 'running'
+        self.started_at = datetime.now()
+        self._updated()
+
+    def finish(self, result: Dict):
+        self.status = 'done'
+        self.result = result
+        self.finished_at = datetime.now()
+        self._updated()
+
+    def fail(self, error: str):
+        self.status = 'failed'
+        self.error = error
+        self.finished_at = datetime.now()
+        self._updated()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Track the status and duration of one step of the play"""
+        info = {'status': 'running', 'duration': None}
+        with self._lock:
+            self.stages[name] = info
+        self._updated()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            info['status'] = 'failed'
+            raise
+        else:
+            info['status'] = 'done'
+        finally:
+            duration = time.monotonic() - started
+            play_stage_seconds.observe(duration, name)
+            info['duration'] = round(duration, 3)
+            self._updated()
+
+    def stage_list(self):
+        with self._lock:
+            # A list keeps the execution order once serialized
+            return [dict(info, name=name) for name, info in self.stages.items()]
+
+    def timings(self) -> Dict[str, float]:
+        """Duration in seconds of each finished stage"""
+        return {stage['name']: stage['duration'] for stage in self.stage_list()
+                if stage['duration'] is not None}
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable view of the job"""
+        return {
+            'id': self.id,
+            'room': self.room_id,
+            'player': self.player_name,
+            'prompt': self.prompt,
+            'status': self.status,
+            'stages': self.stage_list(),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class PlayJobQueue:
+    """Runs card plays on a thread pool, one at a time and in order for each room"""
+
+    def __init__(self, runner: Callable, max_workers: int = PLAY_CONFIG['MAX_WORKERS'],
+                 max_finished_jobs: int = PLAY_CONFIG['MAX_FINISHED_JOBS']):
+        self._runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='card-play')
+        self._max_finished_jobs = max_finished_jobs
+        self._jobs: "OrderedDict[str, PlayJob]" = OrderedDict()
+        self._room_queues: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, room, job: PlayJob) -> PlayJob:
+        """Queue a job; a room's jobs run sequentially, rooms run in parallel"""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_locked()
+            queue = self._room_queues.get(room.room_id)
+            if queue is None:
+                # No job running for this room: start a drain task
+                self._room_queues[room.room_id] = deque([(room, job)])
+                self._executor.submit(self._drain, room.room_id)
+            else:
+                queue.append((room, job))
+        return job
+
+    def _drain(self, room_id: str):
+        while True:
+            with self._lock:
+                queue = self._room_queues[room_id]
+                room, job = queue[0]
+            try:
+                self._runner(room, job)
+            except Exception as e:
+                logger.error(f"Unexpected error in play job {job.id}: {e}")
+            with self._lock:
+                queue.popleft()
+                if not queue:
+                    del self._room_queues[room_id]
+                    return
+
+    def _trim_locked(self):
+        """Forget the oldest finished jobs"""
+        excess = len(self._jobs) - self._max_finished_jobs
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs.keys()):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in ('done', 'failed'):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def get(self, job_id: str) -> Optional[PlayJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending_count(self) -> int:
+        """Number of jobs queued or running"""
+        with self._lock:
+            return sum(len(queue) for queue in self._room_queues.values())
+
+
+def processing_card_label(prompt: str):
+    """Value displayed as processing_card while a play is running"""
+    if prompt == '0':
+        return 0
+    if prompt == '100':
+        return 100
+    if prompt.startswith('101 '):
+        return prompt  # Store full string for special card 101
+    try:
+        return int(prompt)
+    except ValueError:
+        return prompt  # Fallback to string
+
+
+def check_play(game_state, player_name: str, prompt: str) -> Dict:
+    """
+    Validate a play against the current state.
+    Returns the parsed play, raises PlayError if it must be refused.
+    """
+    if prompt == '0':
+        return {'type': 'conclusion', 'card_number': 0, 'target_card': None, 'card': None}
+
+    # Validate card input using new validation system
+    validation_result = game_state.validate_card_input(prompt)
+    card_type = validation_result[0]
+
+    if card_type == 'invalid':
+        error_msg = validation_result[3] if len(
+            validation_result) > 3 else 'Entrée invalide'
+        raise PlayError(error_msg)
+
+    card_number = validation_result[1]
+    target_card = validation_result[2] if len(validation_result) > 2 else None
+    play = {'type': card_type, 'card_number': card_number,
+            'target_card': target_card, 'card': None}
+
+    # Vérifier si la carte spéciale a déjà été jouée par ce joueur
+    if card_type == 'special_100':
+        if game_state.story.has_played_special(player_name, 100):
+            raise PlayError('Vous avez déjà joué la carte Inversion')
+        return play
+
+    if card_type == 'special_101':
+        if game_state.story.has_played_special(player_name, 101):
+            raise PlayError('Vous avez déjà joué la carte Suppression')
+        if target_card is None:
+            raise PlayError('Numéro de carte cible manquant')
+        return play
+
+    # Find card in deck
+    card = DECK.get(card_number)
+    if not card:
+        raise PlayError('Carte non trouvée', 404)
+
+    # Check if card already played
+    if game_state.is_card_played(card_number):
+        raise PlayError('Carte déjà jouée')
+
+    play['card'] = card
+    return play
+
+
+def run_play_job(room, job: PlayJob):
+    """Execute a queued play: processing state is visible until the entry is committed"""
+    game_state = room.state
+
+    def publish(job):
+        with room.lock:
+            game_state.processing_job = job.snapshot() if job.status == 'running' else None
+
+    job.on_update = publish
+
+    with room.play_lock:
+        with room.lock:
+            game_state.processing_player = job.player_name
+            game_state.processing_card = processing_card_label(job.prompt)
+        job.start()
+        try:
+            with room.lock:
+                play = check_play(game_state, job.player_name, job.prompt)
+                was_ended = game_state.game_ended
+            job.finish(_execute_play(room, job, play))
+            if game_state.game_ended and not was_ended:
+                _archive_finished_game(room)
+            logger.info(f"Play {job.id} ({job.prompt}) timings: {job.timings()}")
+        except PlayError as e:
+            job.fail(e.message)
+        except Exception as e:
+            logger.error(f"Error in play job {job.id}: {e}")
+            errors_total.inc('play_job')
+            job.fail('Erreur interne du serveur')
+        finally:
+            with room.lock:
+                # Clear processing state
+                game_state.processing_player = None
+                game_state.processing_card = None
+                game_state.streaming_text = None
+                if job.status == 'failed':
+                    game_state.last_play_error = {
+                        'job_id': job.id,
+                        'player': job.player_name,
+                        'error': job.error
+                    }
+
+
+def _archive_finished_game(room):
+    """Write the game that just ended to the archive"""
+    with room.lock:
+        snapshot = room.state.to_snapshot()
+        players = room.state.get_active_players()
+    game_archive.archive_state(room.room_id, snapshot, 'fin', players)
+
+
+def partial_text_publisher(room, job: PlayJob) -> Callable[[str], None]:
+    """Publish the story text as it is generated, at most every STREAM_UPDATE_INTERVAL"""
+    last_published = [0.0]
+
+    def publish(text: str):
+        now = time.monotonic()
+        if now - last_published[0] < PLAY_CONFIG['STREAM_UPDATE_INTERVAL']:
+            return
+        last_published[0] = now
+        with room.lock:
+            room.state.streaming_text = {
+                'job_id': job.id,
+                'player': job.player_name,
+                'text': text
+            }
+
+    return publish
+
+
+def _add_conclusion(room, job: PlayJob):
+    """Generate the conclusion based on score comparison, append it and end the game"""
+    game_state = room.state
+    with room.lock:
+        score, score_initial = game_state.score, game_state.score_initial
+        story_context = game_state.get_story_context('conclusion')
+    with job.stage('conclusion'):
+        conclusion_text = generate_game_conclusion(score, score_initial, story_context)
+    with room.lock:
+        game_state.append_story_entry({
+            'player': 'Narrateur',
+            'role': 'Narrateur',
+            'text': conclusion_text,
+            'card': None,
+            'effect': None,
+            'timestamp': datetime.now().isoformat()
+        })
+        game_state.game_ended = True
+
+
+def _execute_play(room, job: PlayJob, play: Dict) -> Dict:
+    game_state = room.state
+    player_name = job.player_name
+    player_role = job.player_role
+
+    # Handle conclusion request
+    if play['type'] == 'conclusion':
+        with room.lock:
+            has_story = len(game_state.story) > 0
+        if has_story:
+            _add_conclusion(room, job)
+            with room.lock:
+                game_state.update_card_played_timestamp()  # Update timestamp for conclusion
+            game_state.log_action(f"Conclusion demandée par {player_name}")
+        return {'message': 'Conclusion générée'}
+
+    # Handle special cards (state changed under room.lock, the AI works without it)
+    if play['type'] == 'special_100':
+        with job.stage('inversion'):
+            inversion_result = game_state.handle_inversion_card(
+                player_name, player_role, lock=room.lock)
+        with room.lock:
+            game_state.update_card_played_timestamp()
+        return {'message': inversion_result, 'special_card': True, 'inversion': True}
+
+    if play['type'] == 'special_101':
+        with job.stage('suppression'):
+            suppression_result = game_state.handle_suppression_card(
+                player_name, player_role, play['target_card'], lock=room.lock)
+        with room.lock:
+            game_state.update_card_played_timestamp()
+        return {'message': suppression_result, 'special_card': True, 'suppression': True}
+
+    card = play['card']
+    card_number = play['card_number']
+
+    # Evaluate card effect
+    effect = evaluate_card_effect(card_number, player_role)
+    card_name = card.get('mot', '') if card else ''
+    with room.lock:
+        # Bounded history: recent entries verbatim, older ones summarized
+        story_history = game_state.get_story_context('story')
+        image_history = game_state.get_story_context('image_prompt')
+        story_entries = list(game_state.story)
+        score = game_state.score
+
+    def story():
+        # Generate story text
+        story_prompt = get_story_prompt(
+            story_entries,
+            score,
+            card,
+            player_role,
+            effect,
+            story_history=story_history)
+        # Partial text reaches the table while Mistral is still writing
+        return call_mistral_ai(story_prompt, on_text=partial_text_publisher(room, job))
+
+    def tts(story):
+        # Narration ready before the first client asks for it
+        tts_service.presynthesize(story)
+
+    # The image is generated after the commit, on the image queue
+    results = (StageGraph(job)
+               .add('story', story, required=True)
+               .add('tts', tts, deps=['story'], background=True)
+               .run())
+    story_text = results['story']
+
+    story_entry = {
+        'id': new_entry_id(),
+        'player': player_name,
+        'role': player_role,
+        'text': story_text,
+        'card': card,
+        'effect': effect,
+        'timestamp': datetime.now().isoformat(),
+        'image_path': None,  # Patched in by run_image_job
+        'image_pending': True
+    }
+
+    # Commit the play atomically with respect to /refresh of this room
+    with job.stage('commit'), room.lock:
+        # The card may have been played while the AI was working
+        if game_state.is_card_played(card_number):
+            raise PlayError('Carte déjà jouée')
+
+        # Update game state
+        game_state.add_played_card(card_number)
+        game_state.update_card_played_timestamp()
+
+        # Mark game as started on first card
+        if not game_state.jeu_commence:
+            game_state.jeu_commence = True
+            game_state.score_initial = game_state.score
+            game_state.log_action(
+                f"Jeu commencé - Première carte jouée - Score initial: {game_state.score_initial}"
+            )
+
+        # Same lock as the append: clients never see the partial and final text together
+        game_state.streaming_text = None
+        game_state.append_story_entry(story_entry)
+
+        # Update score
+        if effect == '+':
+            game_state.score += 1
+        elif effect == '-':
+            game_state.score -= 1
+
+        all_cards_played = len(game_state.played_cards) >= game_state.get_total_cards(
+            BASE_CARDS_TO_PLAY)
+        if all_cards_played:
+            game_state.game_ended = True
+
+    image_job = ImageJob(room.room_id, story_entry['id'], player_name, card_number,
+                         card_name, story_text, image_history)
+    if not image_jobs.submit(room, image_job):
+        with room.lock:
+            _patch_entry_image(game_state, story_entry['id'], {})
+
+    # Logger la carte normale dans déroulement.txt
+    game_state.log_card_play(player_name, card_number, "normale")
+
+    # Check game end conditions
+    if all_cards_played:
+        game_state.log_action("Jeu terminé - Toutes les cartes jouées")
+        _add_conclusion(room, job)
+    # Note: Score reaching 0 no longer auto-ends the game
+
+    game_state.log_action(
+        f"{player_name} ({player_role}) a joué la carte {card_number} - {card['mot']}"
+    )
+
+    return {
+        'message': 'Carte jouée avec succès',
+        'story_text': story_text,
+        'effect': effect,
+        'timings': job.timings()
+    }
+
+
+def story_entry_image_fields(image_result: Optional[Dict]) -> Dict:
+    """Story entry fields describing the image of a generation result"""
+    # If image generation was successful, add image information
+    if not (image_result and image_result.get('success')):
+        return {}
+    images = image_result.get('images', [])
+    if not images:
+        return {}
+    image_info = images[0]
+
+    # Handle original images (fallback to barbason.be)
+    if image_info.get('is_original', False):
+        return {'image_path': image_info.get('url', ''), 'is_original_image': True}
+
+    # Handle generated images from Replicate
+    full_filename = image_info.get('filename', '')
+    if full_filename.startswith('result/'):
+        full_filename = full_filename[7:]  # Remove 'result/' prefix
+    return {'image_path': full_filename, 'is_original_image': False}
+
+
+def _patch_entry_image(game_state, entry_id: str, fields: Dict):
+    """Set the image of a story entry, if it is still in the story"""
+    position = game_state.story.position_of(entry_id)
+    if position is None:
+        return False
+    game_state.update_story_entry(position, image_pending=False, **fields)
+    return True
+
+
+def run_image_job(room, job: ImageJob):
+    """Generate the image of a committed story entry and patch it in"""
+    card_number = job.card_number
+
+    def image_prompt():
+        return generate_image_prompt(job.story_history, job.story_text)
+
+    def prompt_log(image_prompt):
+        # Log the image prompt to a separate file for later use
+        now = datetime.now()
+        log_writer.log('image_prompts.txt',
+                       f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {job.player_name} - Carte {card_number}: {image_prompt}\n\n",
+                       {'ts': now.isoformat(), 'room': job.room_id, 'player': job.player_name,
+                        'card': card_number, 'prompt': image_prompt})
+        logger.info(f"Image prompt generated and logged for card {card_number}")
+
+    def reference_image():
+        # Probed while Mistral writes the image prompt
+        if image_generation_enabled():
+            from image_generator import get_card_reference_image
+            return get_card_reference_image(job.card_name)
+        return None
+
+    def image(image_prompt, reference_image):
+        # Generate actual image using Replicate API
+        result = generate_card_image_with_replicate(
+            image_prompt, job.player_name, card_number, job.card_name, image_ref=reference_image)
+        if result.get("success"):
+            logger.info(f"Actual image generated successfully for card {card_number}")
+        else:
+            logger.warning(
+                f"Image generation failed for card {card_number}: {result.get('error')}")
+        return result
+
+    fields = {}
+    try:
+        results = (StageGraph()
+                   .add('reference_image', reference_image)
+                   .add('image_prompt', image_prompt)
+                   .add('image', image, deps=['image_prompt', 'reference_image'])
+                   .add('prompt_log', prompt_log, deps=['image_prompt'], background=True)
+                   .run())
+        fields = story_entry_image_fields(results.get('image'))
+    finally:
+        if room is not None:
+            with room.lock:
+                if not _patch_entry_image(room.state, job.entry_id, fields):
+                    logger.info(f"Story entry {job.entry_id} gone, image of card {card_number} dropped")
+
+
+# Global queues
+play_queue = PlayJobQueue(run_play_job)
+image_jobs = ImageJobQueue(run_image_job)
@@ -0,0 +1,10 @@
+import pytest
+from log_writer import log_writer
+
+
+@pytest.fixture(autouse=True)
+def log_directory(tmp_path, monkeypatch):
+    """Journaux du jeu écrits dans un dossier temporaire, pas à la racine du dépôt"""
+    monkeypatch.setattr(log_writer, 'directory', str(tmp_path))
+    yield
+    log_writer.flush()
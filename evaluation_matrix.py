@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Effet d'une carte pour un rôle, tel que stocké dans la matrice
+EFFECT_VALUES = {'+': 1, '=': 0, '-': -1}
+EFFECT_SYMBOLS = {1: '+', 0: '=', -1: '-'}
+
+
+class EvaluationMatrix:
+    """
+    evaluations.json compiled into a dense int8 matrix (roles x cards) of
+    +1 / 0 / -1, with role and card index maps. Cards absent for a role are 0.
+    """
+
+    def __init__(self, evaluations: Dict[str, Dict[str, str]],
+                 card_numbers: Iterable[int] = ()):
+        self.roles: List[str] = list(evaluations)
+        self.role_index: Dict[str, int] = {role: i for i, role in enumerate(self.roles)}
+
+        numbers = set(card_numbers)
+        for role_evaluations in evaluations.values():
+            numbers.update(int(card) for card in role_evaluations)
+        self.cards: List[int] = sorted(numbers)
+        self.card_index: Dict[int, int] = {card: j for j, card in enumerate(self.cards)}
+
+        self.matrix = np.zeros((len(self.roles), len(self.cards)), dtype=np.int8)
+        for role, role_evaluations in evaluations.items():
+            i = self.role_index[role]
+            for card, effect in role_evaluations.items():
+                self.matrix[i, self.card_index[int(card)]] = EFFECT_VALUES.get(effect, 0)
+
+    def effect(self, card_number: int, role: str) -> Optional[str]:
+        """'+', '-' or '=' for a card played by a role; None if the role is unknown"""
+        i = self.role_index.get(role)
+        if i is None:
+            return None
+        j = self.card_index.get(card_number)
+        if j is None:
+            return '='
+        return EFFECT_SYMBOLS[int(self.matrix[i, j])]
+
+    # Requêtes vectorisées pour l'analyse
+
+    def positive_counts(self) -> np.ndarray:
+        """Number of roles for which each card is positive (aligned with self.cards)"""
+        return (self.matrix == 1).sum(axis=0)
+
+    def negative_counts(self) -> np.ndarray:
+        """Number of roles for which each card is negative (aligned with self.cards)"""
+        return (self.matrix == -1).sum(axis=0)
+
+    def role_balance(self) -> np.ndarray:
+        """Positive minus negative cards for each role (aligned with self.roles)"""
+        return self.matrix.sum(axis=1, dtype=np.int64)
+
+    def card_balance(self) -> np.ndarray:
+        """Positive minus negative roles for each card (aligned with self.cards)"""
+        return self.matrix.sum(axis=0, dtype=np.int64)
+
+    def role_correlation(self) -> np.ndarray:
+        """Pearson correlation between roles (roles x roles); 0 for constant roles"""
+        values = self.matrix.astype(np.float64)
+        centered = values - values.mean(axis=1, keepdims=True)
+        norms = np.sqrt((centered ** 2).sum(axis=1))
+        norms[norms == 0] = np.inf
+        normalized = centered / norms[:, None]
+        return normalized @ normalized.T
@@ -0,0 +1,218 @@
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Journal des mutations de l'état des salles (une salle = un journal + un instantané)
+EVENT_LOG_CONFIG = {
+    'DIR': os.getenv('EVENT_LOG_DIR', os.path.join('data', 'events')),
+    'SNAPSHOT_EVERY': 200,  # Événements avant compaction du journal dans un instantané
+    'FSYNC': os.getenv('EVENT_LOG_FSYNC', '0') == '1',  # fsync de chaque événement (sûr en cas de coupure, plus lent)
+    'RECOVER_WINDOW': 3600.0,  # Salles modifiées récemment rechargées au démarrage
+    'LOCK_STRIPES': 64  # Verrous partagés par les salles (pas de verrou à libérer par salle)
+}
+
+
+class EventLog:
+    """
+    Append-only log of GameState mutations, one JSONL file per room
+    (<room>.log), compacted every snapshot_every events into <room>.snapshot.json.
+    Each event carries a sequence number; the snapshot records the last one it
+    includes, so events left in the log by a crash during compaction are
+    skipped on replay. Loading a room = last snapshot + the tail of its log.
+    Only rooms in memory are tracked: detach() forgets an evicted room.
+    """
+
+    def __init__(self, directory: str = EVENT_LOG_CONFIG['DIR'],
+                 snapshot_every: int = EVENT_LOG_CONFIG['SNAPSHOT_EVERY'],
+                 fsync: bool = EVENT_LOG_CONFIG['FSYNC']):
+        self.directory = os.path.abspath(directory)
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._seqs: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}  # Événements depuis le dernier instantané
+        # Initial state of rooms not yet on disk, written before their first event
+        self._initial: Dict[str, Dict] = {}
+        # Room object currently logging under each id (an evicted one may still be referenced)
+        self._attached: Dict[str, object] = {}
+        self._locks = [threading.Lock() for _ in range(EVENT_LOG_CONFIG['LOCK_STRIPES'])]
+        self.appended = 0
+        self.snapshots = 0
+        self.replayed = 0
+
+    def _lock(self, room_id: str) -> threading.Lock:
+        return self._locks[hash(room_id) % len(self._locks)]
+
+    def log_path(self, room_id: str) -> str:
+        return os.path.join(self.directory, f"{room_id}.log")
+
+    def snapshot_path(self, room_id: str) -> str:
+        return os.path.join(self.directory, f"{room_id}.snapshot.json")
+
+    def attach(self, room):
+        """Load the persisted state of a new room, then log its mutations"""
+        with self._lock(room.room_id):
+            try:
+                self._load(room.room_id, room.state)
+            except Exception as e:
+                logger.error(f"Impossible de recharger la salle {room.room_id}: {e}")
+            self._attached[room.room_id] = room
+        room.state.event_sink = lambda event_type, data: self.append(room, event_type, data)
+
+    def detach(self, room):
+        """Forget a room evicted from memory; its snapshot and log stay on disk for the next attach"""
+        room_id = room.room_id
+        with self._lock(room_id):
+            room.state.event_sink = None
+            if self._attached.get(room_id) is room:
+                del self._attached[room_id]
+                self._seqs.pop(room_id, None)
+                self._pending.pop(room_id, None)
+                self._initial.pop(room_id, None)
+
+    def _load(self, room_id: str, state):
+        seq = 0
+        try:
+            with open(self.snapshot_path(room_id), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            state.load_snapshot(snapshot['state'])
+            seq = snapshot['seq']
+        except FileNotFoundError:
+            # New room: its initial story (entry ids, timestamps) must be replayed as is
+            self._initial[room_id] = copy.deepcopy(state.to_snapshot())
+
+        replayed = 0
+        try:
+            with open(self.log_path(room_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Last line cut by a crash
+                        logger.warning(f"Événement illisible ignoré dans le journal de {room_id}")
+                        break
+                    if event['seq'] <= seq:
+                        continue
+                    state.apply_event(event['type'], event['data'], event['ts'])
+                    seq = event['seq']
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+
+        self._seqs[room_id] = seq
+        self._pending[room_id] = replayed
+        self.replayed += replayed
+        if seq:
+            logger.info(f"Salle {room_id} rechargée (séquence {seq}, {replayed} événements rejoués)")
+
+    def append(self, room, event_type: str, data: Dict):
+        """Write one event (O(1)); compact the log every snapshot_every events"""
+        room_id = room.room_id
+        with self._lock(room_id):
+            initial = self._initial.pop(room_id, None)
+            if initial is not None and not self._write_snapshot(room_id, {'seq': 0, 'state': initial}):
+                self._initial[room_id] = initial
+                return
+            seq = self._seqs.get(room_id, 0) + 1
+            line = json.dumps({'seq': seq, 'type': event_type, 'data': data,
+                               'ts': datetime.now().isoformat()},
+                              ensure_ascii=False, default=str)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.log_path(room_id), 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError as e:
+                logger.error(f"Erreur d'écriture du journal de {room_id}: {e}")
+                return
+            self._seqs[room_id] = seq
+            self._pending[room_id] = self._pending.get(room_id, 0) + 1
+            self.appended += 1
+            if self._pending[room_id] >= self.snapshot_every or event_type == 'reset':
+                self._snapshot_locked(room_id, room.state)
+
+    def snapshot(self, room):
+        """Compact the log of a room into a snapshot"""
+        with room.lock, self._lock(room.room_id):
+            if self._pending.get(room.room_id):
+                self._snapshot_locked(room.room_id, room.state)
+
+    def _snapshot_locked(self, room_id: str, state):
+        payload = {'seq': self._seqs.get(room_id, 0), 'state': state.to_snapshot()}
+        if self._write_snapshot(room_id, payload):
+            # Every event is now in the snapshot
+            open(self.log_path(room_id), 'w').close()
+            self._pending[room_id] = 0
+            self.snapshots += 1
+
+    def _write_snapshot(self, room_id: str, payload: Dict) -> bool:
+        """Atomically replace the snapshot of a room"""
+        payload['ts'] = datetime.now().isoformat()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f, ensure_ascii=False, default=str)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path(room_id))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.error(f"Erreur d'écriture de l'instantané de {room_id}: {e}")
+            return False
+        return True
+
+    def recover(self, registry, window: float = EVENT_LOG_CONFIG['RECOVER_WINDOW']) -> List[str]:
+        """
+        Reload at startup the rooms modified in the last `window` seconds
+        (older ones are reloaded on first access through registry.on_create)
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        cutoff = time.time() - window
+        recent = set()
+        for name in os.listdir(self.directory):
+            for suffix in ('.snapshot.json', '.log'):
+                if name.endswith(suffix):
+                    if os.path.getmtime(os.path.join(self.directory, name)) >= cutoff:
+                        recent.add(name[:-len(suffix)])
+        started = time.perf_counter()
+        for room_id in sorted(recent):
+            registry.get(room_id)
+        if recent:
+            logger.info(f"{len(recent)} salles rechargées en {(time.perf_counter() - started) * 1000:.1f} ms")
+        return sorted(recent)
+
+    def snapshot_all(self, registry):
+        """Compact the logs of every room in memory (at shutdown)"""
+        for room_id in registry.room_ids():
+            room = registry.peek(room_id)
+            if room is not None:
+                self.snapshot(room)
+
+    def stats(self) -> Dict:
+        return {
+            'directory': self.directory,
+            'rooms': len(self._seqs),
+            'appended': self.appended,
+            'snapshots': self.snapshots,
+            'replayed': self.replayed,
+            'snapshot_every': self.snapshot_every,
+            'fsync': self.fsync
+        }
+
+
+# Global event log
+event_log = EventLog()
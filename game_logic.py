@@ -1,9 +1,15 @@
 import time
 import logging
-import requests
 import json
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
+from typing import Callable, Dict, List, Set, Optional
+
+from story_log import StoryLog
+from card_deck import CardDeck
+from evaluation_matrix import EvaluationMatrix
+from log_writer import log_writer
+from metrics import cache_requests_total, errors_total, external_call_seconds, fallbacks_total
 
 logger = logging.getLogger(__name__)
 
@@ -83,7 +89,11 @@ def load_config() -> Dict:
 
 # Load data at module level
 CARD_DECK = load_card_deck()
+# Indexed view of the deck (lookup by number, slugs, available cards)
+DECK = CardDeck(CARD_DECK)
 EVALUATIONS = load_evaluations()
+# Roles x cards effect matrix used on every play
+EVALUATION_MATRIX = EvaluationMatrix(EVALUATIONS, (int(card['numero']) for card in CARD_DECK))
 ROLES = load_roles()
 GAME_CONFIG = load_config()
 
@@ -117,19 +127,69 @@ def reload_config():
     
     return GAME_CONFIG
 
+# Game configuration
+BASE_CARDS_TO_PLAY = 4  # Base number of cards + number of players
+
+
+def starting_score(player_count: int) -> int:
+    """Score before the first card: 2 points per active player, minimum 2"""
+    return max(2, player_count * 2)
+
 # Configuration des délais
 TIMING_CONFIG = {
     'REFRESH_INTERVAL': 0.5,  # 0.5 seconde pour les rafraîchissements
     'PLAYER_TIMEOUT': 2.0,  # 2 secondes pour les joueurs connectés
     'AUTO_RESET_TIMEOUT':
-    600.0  # 10 minutes pour la réinitialisation automatique
+    600.0,  # 10 minutes pour la réinitialisation automatique
+    'STREAM_HEARTBEAT': 15.0,  # Commentaire SSE envoyé à un flux inactif
+    'STREAM_RETRY': 2.0,  # Délai de reconnexion conseillé au navigateur
+    'LONG_POLL_MAX_WAIT': 25.0  # Attente maximale d'un /refresh en long-polling
 }
 
 
 class GameState:
     """Manages the global game state"""
 
-    def __init__(self):
+    # Fields sent to clients by /refresh (response key -> attribute).
+    # Assigning one of these attributes bumps the state version.
+    PUBLISHED_FIELDS = {
+        'score': 'score',
+        'played_cards': 'played_cards',
+        'active_players': 'published_players',
+        'game_ended': 'game_ended',
+        'total_cards': 'published_total_cards',
+        'processing_player': 'processing_player',
+        'processing_card': 'processing_card',
+        'special_cards_played': 'special_cards_played',
+        'processing_job': 'processing_job',
+        'last_play_error': 'last_play_error',
+        'streaming_text': 'streaming_text'
+    }
+    _TRACKED_ATTRIBUTES = {attribute: key for key, attribute in PUBLISHED_FIELDS.items()}
+    # Scalar fields whose assignments are written to the event log
+    PERSISTED_FIELDS = ('score', 'game_ended', 'jeu_commence', 'score_initial', 'total_cards_fixed')
+
+    def __init__(self, room_id: Optional[str] = None):
+        # Called after every version bump (used to wake up push subscribers)
+        self.on_change: Optional[Callable[[], None]] = None
+        # Receives every persistent mutation as (event type, data), see event_log
+        self.event_sink: Optional[Callable[[str, Dict], None]] = None
+        # Change tracking for the /refresh delta protocol. The version starts
+        # from the wall clock (ms) so a room recreated after eviction never
+        # reuses version numbers a client may still hold.
+        self.version: int = int(time.time() * 1000)
+        self._field_versions: Dict[str, int] = {}
+        self._story_versions: List[int] = []
+        self._story_rewrite_version: int = self.version
+        self.published_players: List[Dict] = []
+        self.published_total_cards: int = 0
+        # Open push connections per player: connected players stay active
+        self.connected_players: Dict[str, int] = {}
+        # Bounded story history for prompts (recent entries + rolling summary)
+        from narrative_context import NarrativeContext
+        self.narrative_context = NarrativeContext()
+
+        self.room_id = room_id
         self.active_players: Dict[str, Dict] = {}
         self.special_cards_played: List[Dict] = [
         ]  # Mémoriser toutes les cartes spéciales
@@ -139,16 +199,18 @@ class GameState:
         """Initialize or reset all game state variables"""
         initial_story_text = "Vous habitez un village dans les temps médiévaux, vous entendez depuis plusieurs nuits des bruits étranges comme des bêtes fouillant la terre. Une nuit, un enfant disparaît, vous trouvez un grand trou dans la cave de sa maison."
 
-        self.story: List[Dict] = [{
+        self.story: StoryLog = StoryLog([{
             'player': 'Narrateur',
             'role': 'Narrateur',
             'text': initial_story_text,
             'card': None,
             'effect': None,
             'timestamp': datetime.now().isoformat()
-        }]
+        }])
         self.score: int = 0
         self.played_cards: Set[int] = set()
+        # Same cards as a bitset (bit n set = card n played)
+        self.played_mask: int = 0
         self.game_ended: bool = False
         self.jeu_commence: bool = False
         self.score_initial: int = 0
@@ -158,16 +220,171 @@ class GameState:
         self.total_cards_fixed: Optional[int] = None
         self.processing_player: Optional[str] = None
         self.processing_card: Optional[int] = None
+        # Background play job currently running (stages and timings) and last failure
+        self.processing_job: Optional[Dict] = None
+        self.last_play_error: Optional[Dict] = None
+        # Story text of the card being played, as generated so far
+        self.streaming_text: Optional[Dict] = None
         # Reset special cards list for new game
         self.special_cards_played: List[Dict] = []
 
+    def __setattr__(self, name, value):
+        if (name in self.PERSISTED_FIELDS and self.__dict__.get('event_sink')
+                and self.__dict__.get(name) != value):
+            self._assign(name, value)
+            self._record('set', field=name, value=value)
+        else:
+            self._assign(name, value)
+
+    def _assign(self, name, value):
+        tracking = '_field_versions' in self.__dict__
+        if name == 'story' and not isinstance(value, StoryLog):
+            value = StoryLog(value)
+        if tracking and name == 'story':
+            object.__setattr__(self, name, value)
+            self._mark_story_rewritten()
+            return
+        if tracking and name in self._TRACKED_ATTRIBUTES:
+            changed = name not in self.__dict__ or self.__dict__[name] != value
+            object.__setattr__(self, name, value)
+            if changed:
+                self.mark_changed(self._TRACKED_ATTRIBUTES[name])
+            return
+        object.__setattr__(self, name, value)
+
+    def _record(self, event_type: str, **data):
+        """Hand a persistent mutation to the event log, if one is attached"""
+        if self.event_sink:
+            self.event_sink(event_type, data)
+
+    def _next_version(self) -> int:
+        self.version += 1
+        if self.on_change:
+            self.on_change()
+        return self.version
+
+    def mark_changed(self, *fields: str):
+        """Bump the version for published fields mutated in place (e.g. played_cards.add)"""
+        version = self._next_version()
+        for field in fields:
+            self._field_versions[field] = version
+
+    def _mark_story_rewritten(self):
+        """The story was replaced or reordered: clients must reload it entirely"""
+        version = self._next_version()
+        self._story_rewrite_version = version
+        self._story_versions = [version] * len(self.story)
+
+    def append_story_entry(self, entry: Dict):
+        """Append an entry to the story"""
+        self.story.append(entry)
+        self._story_versions.append(self._next_version())
+        self._record('story_append', entry=entry)
+
+    def update_story_entry(self, index: int, **fields):
+        """Modify fields of an existing story entry"""
+        self.story.update_entry(index, **fields)
+        self._story_versions[index] = self._next_version()
+        self._record('story_update', entry_id=self.story[index]['id'], fields=fields)
+
+    def delete_story_entry(self, index: int) -> Dict:
+        """Remove an entry from the story"""
+        entry = self.story.pop(index)
+        self._mark_story_rewritten()
+        self._record('story_delete', entry_id=entry['id'])
+        return entry
+
+    def replace_story(self, entries: List[Dict]):
+        """Replace every story entry (the special cards played in the game are kept)"""
+        self.story = StoryLog(entries, special_cards=self.story.special_cards)
+        self._record('story_replace', entries=list(self.story))
+
+    def add_played_card(self, card_number: int):
+        """Mark a normal card as played"""
+        self.played_cards.add(card_number)
+        self.played_mask |= 1 << card_number
+        self.mark_changed('played_cards')
+        self._record('card_played', card_number=card_number)
+
+    def remove_played_card(self, card_number: int):
+        """Make a played card available again (Suppression)"""
+        self.played_cards.discard(card_number)
+        self.played_mask &= ~(1 << card_number)
+        self.mark_changed('played_cards')
+        self._record('card_removed', card_number=card_number)
+
+    def is_card_played(self, card_number: int) -> bool:
+        return bool(self.played_mask >> card_number & 1)
+
+    def add_special_card(self, special_card_info: Dict):
+        """Remember a special card played by a player"""
+        self.special_cards_played.append(special_card_info)
+        self.story.record_special_card(special_card_info['player'],
+                                       special_card_info['card_number'])
+        self.mark_changed('special_cards_played')
+        self._record('special_card', card=special_card_info)
+
+    def publish_presence(self, base_cards: int):
+        """Refresh the published players list and card total, bumping the version only on change"""
+        players = self.get_active_players()
+        previous = [(p['name'], p['role']) for p in self.published_players]
+        if [(p['name'], p['role']) for p in players] != previous:
+            self.published_players = players
+        else:
+            # Same players: refresh last_seen without notifying clients
+            self.__dict__['published_players'] = players
+        self.published_total_cards = self.get_total_cards(base_cards)
+
+    def _published_value(self, key: str):
+        value = getattr(self, self.PUBLISHED_FIELDS[key])
+        if isinstance(value, set):
+            return list(value)
+        return value
+
+    def get_delta(self, since: Optional[int] = None) -> Dict:
+        """
+        Build the /refresh payload for a client that already has state `since`.
+        Without `since` (or with an unknown one) the full state is returned.
+        """
+        if since is not None and since == self.version:
+            return {'version': self.version, 'not_modified': True}
+
+        if since is None or since > self.version:
+            payload = {key: self._published_value(key) for key in self.PUBLISHED_FIELDS}
+            payload['story'] = self.story
+            payload['version'] = self.version
+            payload['full'] = True
+            return payload
+
+        payload = {
+            key: self._published_value(key)
+            for key in self.PUBLISHED_FIELDS
+            if self._field_versions.get(key, 0) > since
+        }
+        if since < self._story_rewrite_version:
+            payload['story'] = self.story
+        else:
+            changes = [{'index': i, 'entry': self.story[i]}
+                       for i, entry_version in enumerate(self._story_versions)
+                       if entry_version > since]
+            if changes:
+                payload['story_changes'] = changes
+                payload['story_length'] = len(self.story)
+        payload['version'] = self.version
+        return payload
+
     def get_story_history(self) -> str:
         """Get the complete story history by joining all story entries"""
-        return " ".join(entry['text'] for entry in self.story)
+        return self.story.history()
+
+    def get_story_context(self, purpose: str) -> str:
+        """Story history for a prompt, bounded by the context budget of `purpose`"""
+        return self.narrative_context.build(self.story, purpose)
 
     def update_card_played_timestamp(self):
         """Update the timestamp when a card is played"""
         self.last_card_played = datetime.now()
+        self._record('card_timestamp')
 
     def validate_card_input(self, input_str: str) -> tuple:
         """
@@ -199,11 +416,7 @@ class GameState:
                 try:
                     target_card = int(parts[1])
                     # Vérifier que la carte cible a été jouée
-                    target_played = any(
-                        entry.get('card', {}).get('numero') == str(target_card)
-                        for entry in self.story[1:]
-                        if entry.get('card'))  # Skip narrator
-                    if target_played:
+                    if self.story.position_of_card(target_card) is not None:
                         return ('special_101', 101, target_card)
                     else:
                         return (
@@ -225,91 +438,81 @@ class GameState:
                 'Entrée invalide. Utilisez: 1-55, 100, 101 [numéro], ou 0')
 
     def handle_suppression_card(self, player_name: str, player_role: str,
-                                target_card_number: int) -> str:
-        """Handle the special suppression card 101 - removes a previously played card"""
+                                target_card_number: int, lock=None) -> str:
+        """
+        Handle the special suppression card 101 - removes a previously played card.
+        The state is changed under `lock` (the room lock), the reinterpretation
+        runs without it.
+        """
         logger.info(
             f"Suppression card played by {player_name} ({player_role}) targeting card {target_card_number}"
         )
+        lock = nullcontext() if lock is None else lock
 
-        # Mémoriser la carte spéciale jouée
-        special_card_info = {
-            'player': player_name,
-            'role': player_role,
-            'card_number': 101,
-            'card_name': 'Suppression',
-            'target_card': target_card_number,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.special_cards_played.append(special_card_info)
-
-        # Logger dans déroulement.txt
-        self.log_card_play(player_name, f"101 {target_card_number}",
-                           "spéciale")
-
-        # Trouver la carte à supprimer dans l'histoire (skip narrator at index 0)
-        target_entry = None
-        target_index = -1
-
-        for i, entry in enumerate(self.story[1:],
-                                  1):  # Start from index 1 to skip narrator
-            if entry.get('card', {}).get('numero') == str(target_card_number):
-                target_entry = entry
-                target_index = i
-                break
-
-        if not target_entry:
-            return f"Impossible de trouver la carte {target_card_number} dans l'histoire."
-
-        # Récupérer les détails de la carte supprimée pour ajuster le score
-        removed_card = target_entry['card']
-        removed_effect = target_entry['effect']
-        removed_player_role = target_entry['role']
-
-        # Ajuster le score (inverse de l'effet de la carte supprimée)
-        if removed_effect == '+':
-            self.score -= 1
-        elif removed_effect == '-':
-            self.score += 1
-        # '=' reste neutre, pas de changement de score
-
-        # Supprimer la carte de played_cards si c'était une carte normale
-        if 1 <= int(removed_card['numero']) <= 55:
-            self.played_cards.discard(int(removed_card['numero']))
-
-        # Supprimer l'entrée de l'histoire
-        removed_story_text = target_entry['text']
-        del self.story[target_index]
-
-        # Réinterpréter les cartes après celle supprimée
-        cards_to_reinterpret = []
-        for i in range(target_index, len(self.story)):
-            entry = self.story[i]
-            if entry.get('card') and entry.get(
-                    'card', {}).get('numero') not in ['100', '101']:
-                cards_to_reinterpret.append((i, entry))
-
-        # Réinterpréter chaque carte affectée
-        for story_index, entry in cards_to_reinterpret:
-            original_card = entry['card']
-            original_player_role = entry['role']
-            original_effect = entry['effect']
-
-            # Générer une nouvelle interprétation
-            story_history = self.get_story_history()
-            new_prompt = get_story_prompt(
-                self.story[:story_index],  # Histoire jusqu'à cette carte
-                self.score,
-                original_card,
-                original_player_role,
-                original_effect,
-                story_history=story_history)
-
-            new_story_text = call_mistral_ai(
-                new_prompt + " (Réinterprétée après suppression)")
-
-            # Mettre à jour l'entrée
-            self.story[story_index]['text'] = new_story_text
-            self.story[story_index]['timestamp'] = datetime.now().isoformat()
+        with lock:
+            # Mémoriser la carte spéciale jouée
+            special_card_info = {
+                'player': player_name,
+                'role': player_role,
+                'card_number': 101,
+                'card_name': 'Suppression',
+                'target_card': target_card_number,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.add_special_card(special_card_info)
+
+            # Logger dans déroulement.txt
+            self.log_card_play(player_name, f"101 {target_card_number}",
+                               "spéciale")
+
+            # Trouver la carte à supprimer dans l'histoire
+            target_index = self.story.position_of_card(target_card_number)
+            if target_index is None:
+                return f"Impossible de trouver la carte {target_card_number} dans l'histoire."
+            target_entry = self.story[target_index]
+
+            # Récupérer les détails de la carte supprimée pour ajuster le score
+            removed_card = target_entry['card']
+            removed_effect = target_entry['effect']
+
+            # Ajuster le score (inverse de l'effet de la carte supprimée)
+            if removed_effect == '+':
+                self.score -= 1
+            elif removed_effect == '-':
+                self.score += 1
+            # '=' reste neutre, pas de changement de score
+
+            # Supprimer la carte de played_cards si c'était une carte normale
+            if 1 <= int(removed_card['numero']) <= 55:
+                self.remove_played_card(int(removed_card['numero']))
+
+            # Supprimer l'entrée de l'histoire
+            self.delete_story_entry(target_index)
+
+            # Réinterpréter les cartes après celle supprimée (copies : l'IA travaille hors verrou)
+            cards_to_reinterpret = [
+                dict(entry) for entry in self.story[target_index:]
+                if entry.get('card') and entry.get('card', {}).get('numero') not in ['100', '101']
+            ]
+            story = list(self.story)
+            score = self.score
+            story_history = self.get_story_context('reinterpretation')
+
+        # Réinterpréter les cartes affectées (en parallèle ou en un seul appel)
+        from reinterpretation import reinterpret_entries
+        new_texts = reinterpret_entries(
+            cards_to_reinterpret, story, score,
+            "Réinterprétée après suppression",
+            story_history=story_history)
+
+        with lock:
+            for entry, new_story_text in zip(cards_to_reinterpret, new_texts):
+                # Mettre à jour l'entrée, si elle est encore dans l'histoire
+                story_index = self.story.position_of(entry['id'])
+                if story_index is not None:
+                    self.update_story_entry(story_index,
+                                            text=new_story_text,
+                                            timestamp=datetime.now().isoformat())
 
         # Log de l'action
         self.log_action(
@@ -318,72 +521,77 @@ class GameState:
 
         return f"La carte {target_card_number} a été supprimée de l'histoire ! {len(cards_to_reinterpret)} événements ont été réinterprétés en conséquence."
 
-    def handle_inversion_card(self, player_name: str, player_role: str) -> str:
-        """Handle the special inversion card 100 - reverses story order and replays each card"""
+    def handle_inversion_card(self, player_name: str, player_role: str, lock=None) -> str:
+        """
+        Handle the special inversion card 100 - reverses story order and replays each card.
+        The state is changed under `lock` (the room lock), the replay runs without it.
+        """
         logger.info(f"Inversion card played by {player_name} ({player_role})")
+        lock = nullcontext() if lock is None else lock
 
-        # Mémoriser la carte spéciale jouée
-        special_card_info = {
-            'player': player_name,
-            'role': player_role,
-            'card_number': 100,
-            'card_name': 'Inversion',
-            'timestamp': datetime.now().isoformat()
-        }
-        self.special_cards_played.append(special_card_info)
+        with lock:
+            # Mémoriser la carte spéciale jouée
+            special_card_info = {
+                'player': player_name,
+                'role': player_role,
+                'card_number': 100,
+                'card_name': 'Inversion',
+                'timestamp': datetime.now().isoformat()
+            }
+            self.add_special_card(special_card_info)
 
-        # Logger dans déroulement.txt
-        self.log_card_play(player_name, 100, "spéciale")
+            # Logger dans déroulement.txt
+            self.log_card_play(player_name, 100, "spéciale")
 
-        if len(self.story) <= 1:
-            return "Il n'y a pas encore assez d'histoire à inverser..."
+            if len(self.story) <= 1:
+                return "Il n'y a pas encore assez d'histoire à inverser..."
+
+            # Récupérer les entrées d'histoire (sans l'introduction)
+            story_entries = self.story[1:]
 
-        # Sauvegarder l'introduction (premier élément)
-        introduction = self.story[0]
+            if not story_entries:
+                return "Il n'y a pas d'événements à inverser..."
 
-        # Récupérer les entrées d'histoire (sans l'introduction)
-        story_entries = self.story[1:]
+            # Inverser l'ordre des entrées
+            reversed_entries = list(reversed(story_entries))
 
-        if not story_entries:
-            return "Il n'y a pas d'événements à inverser..."
+            # Rejouer chaque carte dans l'ordre inversé (sauf la carte inversion)
+            entries_to_replay = [
+                dict(entry) for entry in reversed_entries
+                if entry.get('card') and entry.get('card', {}).get('numero') != '100'
+            ]
+            # Entrées de l'histoire rejouée, pour vérifier qu'elle n'a pas changé entre-temps
+            entry_ids = [entry['id'] for entry in self.story]
+            story = list(self.story)
+            score = self.score
+            story_history = self.get_story_context('reinterpretation')
 
-        # Inverser l'ordre des entrées
-        reversed_entries = list(reversed(story_entries))
+        from reinterpretation import reinterpret_entries
+        new_texts = reinterpret_entries(entries_to_replay, story, score,
+                                        "Rejouée dans l'ordre inversé",
+                                        story_history=story_history)
 
-        # Rejouer chaque carte dans l'ordre inversé
         new_story_entries = []
-        for entry in reversed_entries:
-            if entry.get('card') and entry.get('card', {}).get(
-                    'numero') != '100':  # Ne pas rejouer la carte inversion
-                # Récupérer les informations de la carte originale
-                original_card = entry['card']
-                original_player_role = entry['role']
-                original_effect = entry['effect']
-
-                # Générer une nouvelle interprétation de cette carte
-                story_history = self.get_story_history()
-                new_prompt = get_story_prompt(self.story,
-                                              self.score,
-                                              original_card,
-                                              original_player_role,
-                                              original_effect,
-                                              story_history=story_history)
-
-                new_story_text = call_mistral_ai(
-                    new_prompt + " (Rejouée dans l'ordre inversé)")
-
-                new_entry = {
-                    'player': entry['player'],
-                    'role': entry['role'],
-                    'text': new_story_text,
-                    'card': entry['card'],
-                    'effect': entry['effect'],
-                    'timestamp': datetime.now().isoformat()
-                }
-                new_story_entries.append(new_entry)
-
-        # Reconstruire l'histoire : introduction + nouvelles entrées inversées (SANS ajouter la carte inversion)
-        self.story = [introduction] + new_story_entries
+        for entry, new_story_text in zip(entries_to_replay, new_texts):
+            new_entry = {
+                'player': entry['player'],
+                'role': entry['role'],
+                'text': new_story_text,
+                'card': entry['card'],
+                'effect': entry['effect'],
+                'timestamp': datetime.now().isoformat()
+            }
+            new_story_entries.append(new_entry)
+
+        with lock:
+            if [entry['id'] for entry in self.story] != entry_ids:
+                # Réinitialisée ou modifiée pendant le rejeu : l'ancienne histoire n'est pas rétablie
+                self.log_action(f"Inversion jouée par {player_name} - histoire modifiée entre-temps, abandonnée")
+                return "L'histoire a changé pendant l'inversion, elle n'a pas été rejouée."
+
+            # Reconstruire l'histoire : introduction + nouvelles entrées inversées (SANS ajouter la carte inversion)
+            introduction = self.story[0]
+            self.replace_story([introduction] + new_story_entries)
 
         # NE PAS ajouter la carte inversion à played_cards ni à l'histoire
 
@@ -398,12 +606,31 @@ class GameState:
         """Update player activity timestamp"""
         # Only update if both name and role are valid (non-empty strings)
         if player_name and player_name.strip() and player_role and player_role.strip():
+            previous = self.active_players.get(player_name)
+            if previous is None or previous['role'] != player_role:
+                self._record('player_join', name=player_name, role=player_role)
             self.active_players[player_name] = {
                 'role': player_role,
                 'last_seen': datetime.now()
             }
             self.last_activity = datetime.now()
 
+    def connect_player(self, player_name: str, player_role: str):
+        """Register an open push connection (SSE stream or pending long-poll)"""
+        if player_name and player_role:
+            self.connected_players[player_name] = self.connected_players.get(player_name, 0) + 1
+            self.update_player_activity(player_name, player_role)
+
+    def disconnect_player(self, player_name: str):
+        """Close a push connection; the player then expires after PLAYER_TIMEOUT"""
+        count = self.connected_players.get(player_name, 0)
+        if count <= 1:
+            self.connected_players.pop(player_name, None)
+        else:
+            self.connected_players[player_name] = count - 1
+        if player_name in self.active_players:
+            self.active_players[player_name]['last_seen'] = datetime.now()
+
     def get_active_players(self) -> List[Dict]:
         """Get list of active players (seen within configured timeout)"""
         cutoff_time = datetime.now() - timedelta(
@@ -415,7 +642,7 @@ class GameState:
 
         for player_name in player_names:
             player_info = self.active_players[player_name]
-            if player_info['last_seen'] > cutoff_time:
+            if player_info['last_seen'] > cutoff_time or player_name in self.connected_players:
                 # Only add player if both name and role are valid (non-empty strings)
                 if (player_name and player_name.strip() and 
                     player_info.get('role') and player_info['role'].strip()):
@@ -454,11 +681,104 @@ class GameState:
         reload_config()
         
         # Preserve active players and reinitialize everything else
-        self._initialize_state()
-        # Set score based on active players after reset
-        self.score = max(2,
-                         len(self.get_active_players()) *
-                         2)  # 2 points per active player, minimum 2
+        sink, self.event_sink = self.event_sink, None
+        try:
+            self._initialize_state()
+            # Set score based on active players after reset
+            self.score = starting_score(len(self.get_active_players()))
+        finally:
+            self.event_sink = sink
+        # The whole new state in one event: replay does not depend on the config at that time
+        self._record('reset', state=self.to_snapshot())
+
+    def to_snapshot(self) -> Dict:
+        """Persistent part of the state (story, cards, score), JSON-serializable"""
+        return {
+            'story': list(self.story),
+            'special_cards': {player: sorted(cards)
+                              for player, cards in self.story.special_cards.items()},
+            'special_cards_played': list(self.special_cards_played),
+            'played_cards': sorted(self.played_cards),
+            'score': self.score,
+            'game_ended': self.game_ended,
+            'jeu_commence': self.jeu_commence,
+            'score_initial': self.score_initial,
+            'total_cards_fixed': self.total_cards_fixed,
+            'game_start_time': self.game_start_time.isoformat(),
+            'last_card_played': self.last_card_played.isoformat()
+        }
+
+    def load_snapshot(self, data: Dict):
+        """Restore the state written by to_snapshot (the active players are kept)"""
+        special_cards = {player: set(cards) for player, cards in data['special_cards'].items()}
+        self.story = StoryLog(data['story'], special_cards=special_cards)
+        self.special_cards_played = list(data['special_cards_played'])
+        self.played_cards = set(data['played_cards'])
+        self.played_mask = sum(1 << number for number in self.played_cards)
+        for field in self.PERSISTED_FIELDS:
+            setattr(self, field, data[field])
+        self.game_start_time = datetime.fromisoformat(data['game_start_time'])
+        self.last_card_played = datetime.fromisoformat(data['last_card_played'])
+
+    # Published fields outside to_snapshot() that other workers must see too
+    TRANSIENT_FIELDS = ('processing_player', 'processing_card', 'processing_job',
+                        'last_play_error', 'streaming_text', 'published_total_cards')
+
+    def to_shared(self) -> Dict:
+        """State shared with the other workers (see state_backend)"""
+        data = self.to_snapshot()
+        data.update({field: getattr(self, field) for field in self.TRANSIENT_FIELDS})
+        return data
+
+    def load_shared(self, data: Dict, version: int):
+        """
+        Replace the state by the one committed by another worker at `version`.
+        Every field is republished at that version, so a client whose version
+        came from another worker gets a consistent delta.
+        """
+        self.load_snapshot(data)
+        for field in self.TRANSIENT_FIELDS:
+            self.__dict__[field] = data.get(field)
+        self.version = version
+        self._field_versions = {key: version for key in self.PUBLISHED_FIELDS}
+        self._story_rewrite_version = version
+        self._story_versions = [version] * len(self.story)
+        if self.on_change:
+            self.on_change()
+
+    def apply_event(self, event_type: str, data: Dict, timestamp: str):
+        """Replay one event of the log (the event sink must be detached)"""
+        if event_type == 'story_append':
+            self.append_story_entry(data['entry'])
+        elif event_type in ('story_update', 'story_delete'):
+            position = self.story.position_of(data['entry_id'])
+            if position is None:
+                logger.warning(f"Événement {event_type} ignoré: entrée {data['entry_id']} introuvable")
+            elif event_type == 'story_update':
+                self.update_story_entry(position, **data['fields'])
+            else:
+                self.delete_story_entry(position)
+        elif event_type == 'story_replace':
+            self.replace_story(data['entries'])
+        elif event_type == 'card_played':
+            self.add_played_card(data['card_number'])
+        elif event_type == 'card_removed':
+            self.remove_played_card(data['card_number'])
+        elif event_type == 'special_card':
+            self.add_special_card(data['card'])
+        elif event_type == 'set':
+            setattr(self, data['field'], data['value'])
+        elif event_type == 'card_timestamp':
+            self.last_card_played = datetime.fromisoformat(timestamp)
+        elif event_type == 'player_join':
+            self.active_players[data['name']] = {
+                'role': data['role'],
+                'last_seen': datetime.fromisoformat(timestamp)
+            }
+        elif event_type == 'reset':
+            self.load_snapshot(data['state'])
+        else:
+            logger.warning(f"Type d'événement inconnu: {event_type}")
 
     def get_total_cards(self, base_cards: int) -> int:
         """Get total cards to play - fixed once game starts"""
@@ -471,62 +791,66 @@ class GameState:
                 self.get_active_players())
         return self.total_cards_fixed
 
+    def _log_prefix(self) -> str:
+        """Room tag prepended to log lines so several tables can share the log files"""
+        return f"[{self.room_id}] " if self.room_id else ""
+
     def log_action(self, action: str):
         """Log game action to file"""
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = f"[{timestamp}] {action}\n"
-
-            with open('game_log.txt', 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-        except Exception as e:
-            logger.error(f"Error logging action: {e}")
+        now = datetime.now()
+        log_writer.log('game_log.txt',
+                       f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {self._log_prefix()}{action}",
+                       {'ts': now.isoformat(), 'room': self.room_id, 'action': action})
 
     def log_card_play(self,
                       player_name: str,
                       card_info,
                       card_type: str = "normale"):
         """Log card play to déroulement.txt with player and card details"""
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # card_info peut être un int ou une string (pour "101 12" par exemple)
-            if isinstance(card_info, int):
-                card_number = card_info
-                card_details = next(
-                    (c for c in CARD_DECK if int(c['numero']) == card_number),
-                    None)
-                card_name = card_details[
-                    'mot'] if card_details else f"Carte{card_number}"
-                log_entry = f"[{timestamp}] {player_name} a joué la carte {card_number} ({card_name}) - Type: {card_type}\n"
-            else:
-                # Pour les cartes comme "101 12"
-                log_entry = f"[{timestamp}] {player_name} a joué la carte {card_info} - Type: {card_type}\n"
+        now = datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        record = {'ts': now.isoformat(), 'room': self.room_id, 'player': player_name,
+                  'card': card_info, 'type': card_type}
+
+        # card_info peut être un int ou une string (pour "101 12" par exemple)
+        if isinstance(card_info, int):
+            card_number = card_info
+            card_details = DECK.get(card_number)
+            card_name = card_details[
+                'mot'] if card_details else f"Carte{card_number}"
+            record['card_name'] = card_name
+            log_entry = f"[{timestamp}] {self._log_prefix()}{player_name} a joué la carte {card_number} ({card_name}) - Type: {card_type}"
+        else:
+            # Pour les cartes comme "101 12"
+            log_entry = f"[{timestamp}] {self._log_prefix()}{player_name} a joué la carte {card_info} - Type: {card_type}"
 
-            with open('déroulement.txt', 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-        except Exception as e:
-            logger.error(f"Error logging card play: {e}")
+        log_writer.log('déroulement.txt', log_entry, record)
 
 
 def evaluate_card_effect(card_number: int, player_role: str,
-                         evaluations: Dict) -> str:
+                         evaluations: Optional[EvaluationMatrix] = None) -> str:
     """Evaluate the effect of a card for a given player role"""
     try:
-        card_str = str(card_number)
+        effect = (evaluations or EVALUATION_MATRIX).effect(card_number, player_role)
         # Si le rôle n'existe pas du tout dans evaluations.json, toutes les cartes sont neutres
-        if player_role not in evaluations:
+        if effect is None:
             logger.info(f"Role '{player_role}' not found in evaluations, treating all cards as neutral")
             return "="
-        # Si le rôle existe mais pas cette carte spécifique, effet neutre
-        if card_str in evaluations[player_role]:
-            return evaluations[player_role][card_str]
-        return "="  # Neutral effect if card not found for this role
+        return effect
     except Exception as e:
         logger.error(f"Error evaluating card effect: {e}")
         return "="
 
 
+def effect_note(effect: Optional[str]) -> str:
+    """Convert a card effect to the wording used in prompts"""
+    if effect == "+":
+        return "positif"
+    elif effect == "-":
+        return "négatif"
+    return "neutre"
+
+
 def get_story_prompt(story: List[Dict],
                      score: int,
                      card: Optional[Dict] = None,
@@ -551,13 +875,7 @@ def get_story_prompt(story: List[Dict],
     histoire_str = story_history if story_history else " ".join(
         [entry['text'] for entry in story])
 
-    # Convert effect to note format
-    if effect == "+":
-        note = "positif"
-    elif effect == "-":
-        note = "négatif"
-    else:
-        note = "neutre"
+    note = effect_note(effect)
 
     # Build the new prompt format
     prompt = f"""Tu es un narrateur qui raconte une histoire dans un univers médiéval-fantastique.
@@ -598,8 +916,39 @@ Je ne veux que le prompt en retour. Il ne faut pas d'explication en plus."""
     return call_mistral_ai(prompt)
 
 
-def generate_card_image_with_replicate(prompt: str, player_name: str, card_number: int, card_name: str = "") -> dict:
-    """Generate an actual image using Replicate API or return original image based on configuration"""
+def image_generation_enabled() -> bool:
+    """Whether images are generated with Replicate (as opposed to disabled/original images)"""
+    return GAME_CONFIG.get("image_generation", {}).get("enabled", True)
+
+
+def original_image_result(card_name: str, **extra) -> Optional[dict]:
+    """Image result pointing to the original card image (served by /proxy-image), None if there is none"""
+    from card_image_cache import card_image_cache, card_image_url
+
+    clean_card_name = DECK.slug_for_name(card_name)
+    if not card_image_cache.exists(clean_card_name):
+        return None
+    original_url = card_image_url(clean_card_name)
+    logger.info(f"Using original image fallback via proxy: {original_url}")
+    fallbacks_total.inc('fallback_to_original')
+    return dict({
+        "success": True,
+        "images": [{
+            "filename": f"original_{clean_card_name}.jpg",
+            "url": f"/proxy-image/{clean_card_name}",
+            "original_url": original_url,
+            "is_original": True
+        }],
+        "fallback": True
+    }, **extra)
+
+
+def generate_card_image_with_replicate(prompt: str, player_name: str, card_number: int, card_name: str = "",
+                                       image_ref: Optional[str] = None) -> dict:
+    """
+    Generate an actual image using Replicate API or return original image based on configuration.
+    image_ref is the reference image URL when it was already looked up (see get_card_reference_image).
+    """
     
     # Check if image generation is enabled in configuration
     if not GAME_CONFIG.get("image_generation", {}).get("enabled", True):
@@ -607,32 +956,9 @@ def generate_card_image_with_replicate(prompt: str, player_name: str, card_numbe
         
         # If fallback_to_original is enabled, try to get the original card image
         if GAME_CONFIG.get("image_generation", {}).get("fallback_to_original", False) and card_name:
-            try:
-                import requests
-                from unidecode import unidecode
-                
-                # Get card name for original image URL
-                clean_card_name = unidecode(card_name.lower().replace(' ', '').replace("'", ""))
-                original_url = f"http://www.barbason.be/public/{clean_card_name}.jpg"
-                
-                # Check if original image exists
-                response = requests.head(original_url, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"Using original image fallback via proxy: {original_url}")
-                    proxy_url = f"/proxy-image/{clean_card_name}"
-                    return {
-                        "success": True, 
-                        "images": [{
-                            "filename": f"original_{clean_card_name}.jpg",
-                            "url": proxy_url,
-                            "original_url": original_url,
-                            "is_original": True
-                        }],
-                        "fallback": True,
-                        "message": "Image generation disabled, using original image via proxy"
-                    }
-            except Exception as e:
-                logger.warning(f"Could not get original image: {e}")
+            fallback = original_image_result(card_name, message="Image generation disabled, using original image via proxy")
+            if fallback:
+                return fallback
         
         return {
             "success": False, 
@@ -645,7 +971,8 @@ def generate_card_image_with_replicate(prompt: str, player_name: str, card_numbe
         from image_generator import generate_card_image
         
         logger.info(f"Generating actual image for card {card_number} ({card_name}) by {player_name}")
-        result = generate_card_image(prompt, player_name, card_number, card_name=card_name)
+        result = generate_card_image(prompt, player_name, card_number, image_ref=image_ref,
+                                     card_name=card_name)
         
         if result.get("success"):
             logger.info(f"Image generation successful: {len(result.get('images', []))} images created")
@@ -655,30 +982,9 @@ def generate_card_image_with_replicate(prompt: str, player_name: str, card_numbe
             
             # Fallback to original image if enabled and API fails
             if GAME_CONFIG.get("image_generation", {}).get("fallback_to_original", False) and card_name:
-                try:
-                    import requests
-                    from unidecode import unidecode
-                    
-                    clean_card_name = unidecode(card_name.lower().replace(' ', '').replace("'", ""))
-                    original_url = f"http://www.barbason.be/public/{clean_card_name}.jpg"
-                    
-                    response = requests.head(original_url, timeout=5)
-                    if response.status_code == 200:
-                        logger.info(f"API failed, using original image fallback via proxy: {original_url}")
-                        proxy_url = f"/proxy-image/{clean_card_name}"
-                        return {
-                            "success": True,
-                            "images": [{
-                                "filename": f"original_{clean_card_name}.jpg",
-                                "url": proxy_url,
-                                "original_url": original_url,
-                                "is_original": True
-                            }],
-                            "fallback": True,
-                            "api_error": result.get('error')
-                        }
-                except Exception as fallback_e:
-                    logger.warning(f"Original image fallback also failed: {fallback_e}")
+                fallback = original_image_result(card_name, api_error=result.get('error'))
+                if fallback:
+                    return fallback
             
             return result
         
@@ -687,30 +993,9 @@ def generate_card_image_with_replicate(prompt: str, player_name: str, card_numbe
         
         # Fallback to original image if enabled
         if GAME_CONFIG.get("image_generation", {}).get("fallback_to_original", False) and card_name:
-            try:
-                import requests
-                from unidecode import unidecode
-                
-                clean_card_name = unidecode(card_name.lower().replace(' ', '').replace("'", ""))
-                original_url = f"http://www.barbason.be/public/{clean_card_name}.jpg"
-                
-                response = requests.head(original_url, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"Module unavailable, using original image fallback via proxy: {original_url}")
-                    proxy_url = f"/proxy-image/{clean_card_name}"
-                    return {
-                        "success": True,
-                        "images": [{
-                            "filename": f"original_{clean_card_name}.jpg",
-                            "url": proxy_url,
-                            "original_url": original_url,
-                            "is_original": True
-                        }],
-                        "fallback": True,
-                        "module_error": str(e)
-                    }
-            except Exception as fallback_e:
-                logger.warning(f"Original image fallback failed: {fallback_e}")
+            fallback = original_image_result(card_name, module_error=str(e))
+            if fallback:
+                return fallback
         
         return {"success": False, "error": "Image generator module not available"}
     except Exception as e:
@@ -718,55 +1003,71 @@ def generate_card_image_with_replicate(prompt: str, player_name: str, card_numbe
         return {"success": False, "error": str(e)}
 
 
-def call_mistral_ai(prompt: str) -> str:
-    """Call Mistral AI API to generate text or return fallback text based on configuration"""
+def call_mistral_ai(prompt: str, use_cache: bool = True, json_mode: bool = False,
+                    on_text: Optional[Callable[[str], None]] = None,
+                    deadline: Optional[float] = None, fallback: bool = True) -> Optional[str]:
+    """
+    Call Mistral AI API to generate text or return fallback text based on configuration.
+    Completions are cached on disk; use_cache=False forces a fresh answer.
+    json_mode asks the API for a JSON object (the caller must handle fallback text).
+    With on_text the completion is streamed: on_text receives the text generated so far.
+    deadline (time.monotonic()) bounds the API call, retries and timeouts included.
+    fallback=False returns None instead of the fallback text (the caller keeps its own text).
+    """
+
+    def fallback_text(default: str) -> Optional[str]:
+        if not fallback:
+            return None
+        fallbacks_total.inc('fallback_text')
+        return GAME_CONFIG.get("mistral", {}).get("fallback_text", default)
     
     # Check if Mistral is enabled in configuration
     if not GAME_CONFIG.get("mistral", {}).get("enabled", True):
         logger.info("Mistral AI disabled in configuration, using fallback text")
-        return GAME_CONFIG.get("mistral", {}).get("fallback_text", "L'aventure continue avec des événements mystérieux...")
+        return fallback_text("L'aventure continue avec des événements mystérieux...")
     
     import os
-
-    MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
-    MISTRAL_API_URL = "https://api.mistral.ai/v1/chat/completions"
-
-    if not MISTRAL_API_KEY:
+    from mistral_client import mistral_client, CircuitOpenError, MistralError
+    from llm_cache import llm_cache
+
+    model = mistral_client.config['MODEL']
+    temperature = mistral_client.config['TEMPERATURE']
+    use_cache = use_cache and GAME_CONFIG.get("mistral", {}).get("cache", True)
+    if use_cache:
+        cached = llm_cache.get(model, temperature, prompt, json_mode)
+        cache_requests_total.inc('llm', 'miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
+    if not os.getenv('MISTRAL_API_KEY'):
         logger.warning("MISTRAL_API_KEY not found, using fallback text")
-        return GAME_CONFIG.get("mistral", {}).get("fallback_text", "La clé API Mistral n'est pas configurée...")
-
-    headers = {
-        "Authorization": f"Bearer {MISTRAL_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    data = {
-        "model": "mistral-large-latest",
-        "messages": [{
-            "role": "user",
-            "content": prompt
-        }],
-        "temperature": 0.7
-    }
+        return fallback_text("La clé API Mistral n'est pas configurée...")
 
     try:
-        response = requests.post(
-            MISTRAL_API_URL,
-            headers=headers,
-            json=data,
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        if 'choices' in result and len(result['choices']) > 0:
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            logger.error("Unexpected response format from Mistral API")
-            return "L'histoire continue mystérieusement..."
-
-    except requests.exceptions.RequestException as e:
+        # Whole completion, retries and streaming included
+        with external_call_seconds.time('mistral'):
+            if on_text is None:
+                text = mistral_client.chat(prompt, model=model, temperature=temperature,
+                                           json_mode=json_mode, deadline=deadline)
+            else:
+                parts = []
+                for piece in mistral_client.stream_chat(prompt, model=model, temperature=temperature,
+                                                        deadline=deadline):
+                    parts.append(piece)
+                    on_text("".join(parts))
+                text = "".join(parts).strip()
+        # Seules les vraies réponses sont mises en cache, jamais les textes de secours
+        llm_cache.put(model, temperature, prompt, text, json_mode)
+        return text
+
+    except CircuitOpenError:
+        # API jugée indisponible: on répond tout de suite sans attendre un timeout
+        logger.warning("Mistral circuit breaker open, using fallback text")
+        return fallback_text("L'histoire continue dans l'ombre...")
+    except MistralError as e:
         logger.error(f"Error calling Mistral API: {e}")
-        return "L'histoire continue dans l'ombre..."
+        errors_total.inc('mistral')
+        return fallback_text("L'histoire continue dans l'ombre...")
 
 
 def generate_game_conclusion(score_final: int, score_initial: int,
@@ -0,0 +1,34 @@
+import os
+
+# Gunicorn configuration, loaded automatically from the working directory.
+# /stream and long-polling /refresh keep one request open per connected tab:
+# threaded workers make an idle connection cost a sleeping thread instead of
+# a whole worker process.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "64"))
+
+# Several worker processes need the shared room state (STATE_BACKEND=sqlite):
+# with the default in-memory state each worker would run its own games.
+if os.environ.get("STATE_BACKEND") == "sqlite":
+    workers = int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+    # Each worker writes its metrics there, /metrics adds them up (see METRICS_CONFIG)
+    os.environ.setdefault("METRICS_DIR", os.path.join("data", "metrics"))
+else:
+    workers = 1
+
+
+def on_starting(server):
+    """Start the metrics of this run from zero"""
+    if os.environ.get("METRICS_DIR"):
+        from metrics import clear_directory
+        clear_directory(os.environ["METRICS_DIR"])
+
+
+def child_exit(server, worker):
+    """Keep the counters of an exited worker, drop its gauges"""
+    if os.environ.get("METRICS_DIR"):
+        from metrics import mark_worker_dead
+        mark_worker_dead(os.environ["METRICS_DIR"], str(worker.pid))
+
+# Leave the image queue time to drain on restart (see IMAGE_QUEUE_CONFIG)
+graceful_timeout = 75
@@ -1,12 +1,11 @@
 import replicate
-import requests
-import json
-from PIL import Image
-from io import BytesIO
 from datetime import datetime
 import os
 import logging
 
+from image_ingest import ingest_outputs, append_generation_record, filename_part
+from metrics import errors_total, external_call_seconds
+
 logger = logging.getLogger(__name__)
 
 # === CONFIGURATION ===
@@ -20,22 +19,17 @@ DEFAULT_IMAGE_REF = "http://www.barbason.be/public/mariee.jpg"
 def get_card_reference_image(card_name):
     """Construit l'URL de l'image de référence basée sur le nom de la carte."""
     if card_name:
-        # Utiliser unidecode pour convertir tous les caractères accentués
-        from unidecode import unidecode
-        clean_name = unidecode(card_name).lower().replace(' ', '')
+        # Slug précalculé du deck (accents convertis, espaces et apostrophes retirés)
+        from game_logic import DECK
+        clean_name = DECK.slug_for_name(card_name)
         card_url = f"http://www.barbason.be/public/{clean_name}.jpg"
         
-        # Vérifier rapidement si l'URL existe (timeout court)
-        try:
-            import requests
-            response = requests.head(card_url, timeout=2)
-            if response.status_code == 200:
-                logger.info(f"Using card-specific image: {card_url}")
-                return card_url
-            else:
-                logger.info(f"Card image not found ({response.status_code}), using default: {card_url}")
-        except Exception as e:
-            logger.info(f"Card image check failed, using default: {e}")
+        # Existence connue du cache disque (un seul aller-retour par carte)
+        from card_image_cache import card_image_cache
+        if card_image_cache.exists(clean_name):
+            logger.info(f"Using card-specific image: {card_url}")
+            return card_url
+        logger.info(f"Card image not available, using default: {card_url}")
     
     logger.info(f"Using default reference image: {DEFAULT_IMAGE_REF}")
     return DEFAULT_IMAGE_REF
@@ -67,47 +61,27 @@ def construire_input(modele, prompt, image_ref=None):
 def generer_image(modele, input_data):
     """Appelle Replicate avec les paramètres donnés."""
     try:
-        return replicate.run(modele, input=input_data)
+        with external_call_seconds.time('replicate'):
+            return replicate.run(modele, input=input_data)
     except Exception as e:
+        errors_total.inc('replicate')
         logger.error(f"Error calling Replicate API: {e}")
         raise
 
-def enregistrer_image(url, filename):
-    """Télécharge et sauvegarde une image depuis une URL."""
-    try:
-        response = requests.get(url, timeout=30)
-        if response.status_code == 200:
-            img = Image.open(BytesIO(response.content))
-            img.save(filename)
-            logger.info(f"Image saved: {filename}")
-            return True
-        else:
-            logger.error(f"Failed to download image ({response.status_code}): {url}")
-            return False
-    except Exception as e:
-        logger.error(f"Error saving image: {e}")
-        return False
+def enregistrer_images(outputs, player_name, card_number):
+    """Télécharge les images en parallèle, directement sur disque (nom = hash du contenu)."""
+    return ingest_outputs(outputs, f"image_{filename_part(player_name)}_card{card_number}")
 
-def enregistrer_donnees_json(modele, input_data, timestamp, player_name, card_number):
-    """Sauvegarde les paramètres dans un fichier JSON."""
-    try:
-        data = {
-            "timestamp": timestamp,
-            "player_name": player_name,
-            "card_number": card_number,
-            "modele": modele,
-            "input": input_data
-        }
-        
-        filename = f"result/donnees_{timestamp}.json"
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        
-        logger.info(f"JSON data saved: {filename}")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving JSON data: {e}")
-        return False
+def enregistrer_generation(modele, input_data, timestamp, player_name, card_number, images):
+    """Ajoute une ligne décrivant la génération à result/generations.jsonl."""
+    append_generation_record({
+        "timestamp": timestamp,
+        "player_name": player_name,
+        "card_number": card_number,
+        "modele": modele,
+        "input": input_data,
+        "images": [{"filename": image["filename"], "sha256": image["sha256"]} for image in images]
+    })
 
 def generate_card_image(prompt, player_name, card_number, model=None, image_ref=None, card_name=None):
     """
@@ -144,46 +118,24 @@ def generate_card_image(prompt, player_name, card_number, model=None, image_ref=
         logger.info(f"Generating image for card {card_number} by {player_name}")
         output = generer_image(modele, input_data)
         
-        # Sauvegarder les données JSON
-        enregistrer_donnees_json(modele, input_data, timestamp, player_name, card_number)
+        # Un seul résultat pour KONTEXT, une liste pour SCHNELL
+        outputs = output if isinstance(output, list) else [output]
+        images = enregistrer_images(outputs, player_name, card_number)
+        if not images:
+            raise RuntimeError(f"No image could be downloaded ({len(outputs)} outputs)")
+        
+        # Sauvegarder les données de la génération
+        enregistrer_generation(modele, input_data, timestamp, player_name, card_number, images)
         
-        # Sauvegarder l'image
         result = {
             "success": True,
             "timestamp": timestamp,
             "player_name": player_name,
             "card_number": card_number,
             "model": modele,
-            "images": []
+            "images": [{"filename": image["filename"], "url": image["url"]} for image in images]
         }
         
-        if modele == MODELE_KONTEXT:
-            # Un seul résultat pour KONTEXT
-            filename = f"result/image_{player_name}_card{card_number}_{timestamp}.jpg"
-            if enregistrer_image(output, filename):
-                result["images"].append({
-                    "filename": filename,
-                    "url": output
-                })
-        else:
-            # Plusieurs résultats pour SCHNELL
-            if isinstance(output, list):
-                for i, url in enumerate(output):
-                    filename = f"result/image_{player_name}_card{card_number}_{timestamp}_{i}.jpg"
-                    if enregistrer_image(url, filename):
-                        result["images"].append({
-                            "filename": filename,
-                            "url": url
-                        })
-            else:
-                # Un seul résultat
-                filename = f"result/image_{player_name}_card{card_number}_{timestamp}.jpg"
-                if enregistrer_image(output, filename):
-                    result["images"].append({
-                        "filename": filename,
-                        "url": output
-                    })
-        
         logger.info(f"Image generation completed: {len(result['images'])} images saved")
         return result
         
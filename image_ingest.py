@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from unidecode import unidecode
+
+from metrics import errors_total, external_call_seconds
+
+logger = logging.getLogger(__name__)
+
+# Enregistrement des images produites par Replicate
+IMAGE_INGEST_CONFIG = {
+    'RESULT_DIR': 'result',
+    'METADATA_FILE': os.path.join('result', 'generations.jsonl'),  # Une ligne JSON par génération
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 30,
+    'CHUNK_SIZE': 64 * 1024,
+    'MAX_BYTES': 20 * 1024 * 1024,  # Taille maximale d'une image téléchargée
+    'MAX_WORKERS': 4  # Téléchargements simultanés (sorties multiples de Schnell)
+}
+
+# Formats que detect_image_format reconnaît (servis par /result)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+ingest_executor = ThreadPoolExecutor(max_workers=IMAGE_INGEST_CONFIG['MAX_WORKERS'],
+                                     thread_name_prefix='image-ingest')
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_maxsize=IMAGE_INGEST_CONFIG['MAX_WORKERS']))
+_metadata_lock = threading.Lock()
+
+
+class IngestError(Exception):
+    """An output could not be downloaded or is not an image"""
+
+
+def detect_image_format(header: bytes) -> Optional[str]:
+    """File extension (without dot) of an image from its first 12 bytes, None if unknown"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def filename_part(text: str, max_length: int = 40) -> str:
+    """ASCII [A-Za-z0-9_-] form of free text (a player name) usable in file names and headers"""
+    part = re.sub(r'[^A-Za-z0-9_-]+', '_', unidecode(str(text))).strip('_')
+    return part[:max_length] or 'joueur'
+
+
+def output_url(output) -> str:
+    """URL of a Replicate output (plain string or FileOutput)"""
+    return getattr(output, 'url', None) or str(output)
+
+
+def _iter_output(url: str) -> Iterable[bytes]:
+    if url.startswith('data:'):
+        _, encoded = url.split(',', 1)
+        yield base64.b64decode(encoded)
+        return
+    timeout = (IMAGE_INGEST_CONFIG['CONNECT_TIMEOUT'], IMAGE_INGEST_CONFIG['READ_TIMEOUT'])
+    with _session.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise IngestError(f"download failed ({response.status_code}): {url}")
+        yield from response.iter_content(chunk_size=IMAGE_INGEST_CONFIG['CHUNK_SIZE'])
+
+
+def ingest_image(output, prefix: str, result_dir: Optional[str] = None) -> Dict:
+    """
+    Stream one output to disk while hashing it. The file is named
+    <prefix>_<sha256[:16]>.<format>, the format being read from the header
+    (no decode or re-encode). Identical images end up in the same file.
+    """
+    result_dir = result_dir or IMAGE_INGEST_CONFIG['RESULT_DIR']
+    os.makedirs(result_dir, exist_ok=True)
+    url = output_url(output)
+    digest = hashlib.sha256()
+    header = b''
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=result_dir, suffix='.part')
+    try:
+        with external_call_seconds.time('image_download'), os.fdopen(fd, 'wb') as f:
+            for chunk in _iter_output(url):
+                if len(header) < 12:
+                    header += chunk[:12 - len(header)]
+                size += len(chunk)
+                if size > IMAGE_INGEST_CONFIG['MAX_BYTES']:
+                    raise IngestError(f"image larger than {IMAGE_INGEST_CONFIG['MAX_BYTES']} bytes: {url}")
+                digest.update(chunk)
+                f.write(chunk)
+
+        image_format = detect_image_format(header)
+        if image_format is None:
+            raise IngestError(f"not an image: {url}")
+
+        sha256 = digest.hexdigest()
+        filename = os.path.join(result_dir, f"{prefix}_{sha256[:16]}.{image_format}")
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Image saved: {filename} ({size} bytes)")
+    return {'filename': filename, 'url': url, 'sha256': sha256,
+            'format': image_format, 'bytes': size}
+
+
+def ingest_outputs(outputs: List, prefix: str, result_dir: Optional[str] = None) -> List[Dict]:
+    """Save several outputs concurrently; failed downloads are logged and left out"""
+    futures = [ingest_executor.submit(ingest_image, output, prefix, result_dir)
+               for output in outputs]
+    images = []
+    for output, future in zip(outputs, futures):
+        try:
+            images.append(future.result())
+        except (IngestError, requests.exceptions.RequestException, OSError) as e:
+            errors_total.inc('image_download')
+            logger.error(f"Error saving image {output_url(output)}: {e}")
+    return images
+
+
+def append_generation_record(record: Dict, path: Optional[str] = None):
+    """Append one compact JSON line describing a generation"""
+    path = path or IMAGE_INGEST_CONFIG['METADATA_FILE']
+    line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with _metadata_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.error(f"Error saving generation record: {e}")
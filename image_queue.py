@@ -0,0 +1,205 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration de la file de génération d'images
+IMAGE_QUEUE_CONFIG = {
+    'MAX_WORKERS': int(os.getenv('IMAGE_WORKERS', '4')),  # Appels Replicate simultanés, toutes salles confondues
+    'MAX_QUEUED': 200,  # Images en attente au-delà desquelles les nouvelles sont refusées
+    'DRAIN_TIMEOUT': 60.0,  # Secondes laissées aux images en cours à l'arrêt
+    'PENDING_FILE': 'image_jobs_pending.json'  # Images non terminées, reprises au redémarrage
+}
+
+
+class ImageJob:
+    """Image of one story entry, generated after the entry was committed"""
+
+    def __init__(self, room_id: str, entry_id: str, player_name: str, card_number: int,
+                 card_name: str, story_text: str, story_history: str,
+                 job_id: Optional[str] = None, created_at: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.room_id = room_id
+        self.entry_id = entry_id
+        self.player_name = player_name
+        self.card_number = card_number
+        self.card_name = card_name
+        self.story_text = story_text
+        self.story_history = story_history
+        self.created_at = created_at or datetime.now().isoformat()
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'room_id': self.room_id,
+            'entry_id': self.entry_id,
+            'player_name': self.player_name,
+            'card_number': self.card_number,
+            'card_name': self.card_name,
+            'story_text': self.story_text,
+            'story_history': self.story_history,
+            'created_at': self.created_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ImageJob":
+        return cls(**data)
+
+
+class ImageJobQueue:
+    """
+    Bounded queue of image jobs run by a fixed pool of worker threads.
+    A room's images are generated one at a time and in order; at most
+    max_workers Replicate calls run at once across all rooms.
+    """
+
+    def __init__(self, runner: Callable, max_workers: int = IMAGE_QUEUE_CONFIG['MAX_WORKERS'],
+                 max_queued: int = IMAGE_QUEUE_CONFIG['MAX_QUEUED'],
+                 pending_file: str = IMAGE_QUEUE_CONFIG['PENDING_FILE']):
+        self._runner = runner
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.pending_file = pending_file
+        self._room_queues: Dict[str, deque] = {}
+        # Rooms with queued jobs and no job running, in arrival order
+        self._ready: deque = deque()
+        self._running: Dict[str, Tuple[object, ImageJob]] = {}
+        self._queued = 0
+        self._accepting = True
+        self._stopping = False
+        self._workers: List[threading.Thread] = []
+        self._cond = threading.Condition()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start_workers_locked(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, daemon=True,
+                                      name=f'image-worker-{len(self._workers)}')
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, room, job: ImageJob) -> bool:
+        """Queue a job; False if the queue is full or shutting down"""
+        with self._cond:
+            if not self._accepting or self._queued >= self.max_queued:
+                self.rejected += 1
+                logger.warning(f"Image job refused for room {job.room_id} "
+                               f"({self._queued} queued, accepting={self._accepting})")
+                return False
+            queue = self._room_queues.setdefault(job.room_id, deque())
+            queue.append((room, job))
+            self._queued += 1
+            if len(queue) == 1 and job.room_id not in self._running:
+                self._ready.append(job.room_id)
+            self._start_workers_locked()
+            self._cond.notify()
+        return True
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                room_id = self._ready.popleft()
+                room, job = self._room_queues[room_id].popleft()
+                self._queued -= 1
+                self._running[room_id] = (room, job)
+
+            try:
+                self._runner(room, job)
+                succeeded = True
+            except Exception as e:
+                logger.error(f"Image job {job.id} failed: {e}")
+                succeeded = False
+
+            with self._cond:
+                del self._running[room_id]
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                if self._room_queues[room_id]:
+                    self._ready.append(room_id)
+                else:
+                    del self._room_queues[room_id]
+                self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """Number of jobs queued or running"""
+        with self._cond:
+            return self._queued + len(self._running)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Block until every job is done; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queued and not self._running, timeout)
+
+    def shutdown(self, timeout: float = IMAGE_QUEUE_CONFIG['DRAIN_TIMEOUT']):
+        """Stop accepting jobs, drain for up to `timeout` seconds, persist what is left"""
+        with self._cond:
+            self._accepting = False
+            has_work = bool(self._queued or self._running)
+        if has_work:
+            logger.info(f"Draining {self.pending_count()} image jobs (max {timeout:.0f}s)")
+            self.wait_idle(timeout)
+
+        with self._cond:
+            self._stopping = True
+            leftover = [job for _, job in self._running.values()]
+            for queue in self._room_queues.values():
+                leftover.extend(job for _, job in queue)
+            self._cond.notify_all()
+
+        if leftover:
+            self.persist(leftover)
+
+    def persist(self, jobs: List[ImageJob]):
+        """Write unfinished jobs to the pending file (read back by restore)"""
+        try:
+            with open(self.pending_file, 'w', encoding='utf-8') as f:
+                json.dump([job.to_dict() for job in jobs], f, ensure_ascii=False)
+            logger.info(f"{len(jobs)} image jobs saved to {self.pending_file}")
+        except OSError as e:
+            logger.error(f"Could not save pending image jobs: {e}")
+
+    def restore(self, room_lookup: Callable[[str], object]) -> int:
+        """Resubmit the jobs saved by a previous shutdown"""
+        if not os.path.exists(self.pending_file):
+            return 0
+        try:
+            with open(self.pending_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            os.remove(self.pending_file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read pending image jobs: {e}")
+            return 0
+
+        restored = 0
+        for data in saved:
+            job = ImageJob.from_dict(data)
+            if self.submit(room_lookup(job.room_id), job):
+                restored += 1
+        logger.info(f"{restored} pending image jobs restored")
+        return restored
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'queued': self._queued,
+                'running': len(self._running),
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
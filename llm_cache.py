@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration du cache disque des réponses Mistral
+LLM_CACHE_CONFIG = {
+    'PATH': os.getenv('LLM_CACHE_PATH', os.path.join('cache', 'llm_cache.sqlite3')),
+    'TTL': 30 * 24 * 3600.0,  # 30 jours avant expiration d'une réponse
+    'MAX_ENTRIES': 20000,  # Au-delà, les réponses les moins utilisées sont supprimées
+    'EVICT_EVERY': 100  # Nombre d'écritures entre deux passes d'éviction
+}
+
+
+def cache_key(model: str, temperature: float, prompt: str, json_mode: bool = False) -> str:
+    """Content address of a completion request (every parameter that changes the answer)"""
+    raw = f"{model}\x00{temperature!r}\x00{int(json_mode)}\x00{prompt}".encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+class LLMCache:
+    """SQLite cache of completions keyed by sha256(model, temperature, json_mode, prompt)"""
+
+    def __init__(self, path: str = LLM_CACHE_CONFIG['PATH'],
+                 ttl: float = LLM_CACHE_CONFIG['TTL'],
+                 max_entries: int = LLM_CACHE_CONFIG['MAX_ENTRIES']):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_access ON completions(last_access)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, model: str, temperature: float, prompt: str,
+            json_mode: bool = False) -> Optional[str]:
+        """Cached completion, or None on a miss or expired entry"""
+        key = cache_key(model, temperature, prompt, json_mode)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT response, created_at FROM completions WHERE key = ?",
+                                   (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache read failed: {e}")
+            return None
+
+    def put(self, model: str, temperature: float, prompt: str, response: str,
+            json_mode: bool = False):
+        """Store a completion"""
+        key = cache_key(model, temperature, prompt, json_mode)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                             (key, model, response, now, now))
+                self.writes += 1
+                if self.writes % LLM_CACHE_CONFIG['EVICT_EVERY'] == 0:
+                    self._evict_locked(now)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache write failed: {e}")
+
+    def _evict_locked(self, now: float):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        conn = self._connect()
+        conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        conn.execute("""
+            DELETE FROM completions WHERE key IN (
+                SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def evict(self):
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM completions")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and size for debug endpoints"""
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+# Global cache
+llm_cache = LLMCache()
@@ -0,0 +1,209 @@
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import shutil
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Écriture des journaux (game_log.txt, déroulement.txt, image_prompts.txt) en arrière-plan
+LOG_WRITER_CONFIG = {
+    'DIR': os.getenv('LOG_DIR', '.'),
+    'FLUSH_INTERVAL': 0.2,  # Attente maximale avant l'écriture d'un lot (secondes)
+    'BATCH_SIZE': 1000,  # Lignes écrites au plus par lot
+    'FSYNC': os.getenv('LOG_FSYNC', 'interval'),  # 'always' (chaque lot), 'interval' ou 'never'
+    'FSYNC_INTERVAL': 5.0,
+    'MAX_BYTES': 10 * 1024 * 1024,  # Taille d'un journal avant rotation
+    'BACKUPS': 10,  # Archives .gz gardées par journal
+    'MAX_QUEUED': 100000  # Au-delà, les lignes sont abandonnées plutôt que de bloquer les requêtes
+}
+
+
+def jsonl_path(path: str) -> str:
+    """Structured twin of a text log: game_log.txt -> game_log.jsonl"""
+    return os.path.splitext(path)[0] + '.jsonl'
+
+
+class LogWriter:
+    """
+    Single background thread appending log lines fed through a queue. Callers
+    only enqueue (no file I/O on the request thread). Lines are grouped per
+    file and written with one O_APPEND write per batch, so lines of several
+    threads or workers never interleave. Files above max_bytes are rotated
+    and gzipped, keeping the `backups` most recent archives.
+    """
+
+    def __init__(self, directory: str = LOG_WRITER_CONFIG['DIR'],
+                 flush_interval: float = LOG_WRITER_CONFIG['FLUSH_INTERVAL'],
+                 batch_size: int = LOG_WRITER_CONFIG['BATCH_SIZE'],
+                 fsync: str = LOG_WRITER_CONFIG['FSYNC'],
+                 fsync_interval: float = LOG_WRITER_CONFIG['FSYNC_INTERVAL'],
+                 max_bytes: int = LOG_WRITER_CONFIG['MAX_BYTES'],
+                 backups: int = LOG_WRITER_CONFIG['BACKUPS'],
+                 max_queued: int = LOG_WRITER_CONFIG['MAX_QUEUED']):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._fds: Dict[str, int] = {}
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                    self._thread.start()
+
+    def append(self, filename: str, line: str):
+        """Queue one line (newline added if missing) for filename, relative to the log directory"""
+        if self._closed:
+            return
+        self._ensure_started()
+        if not line.endswith('\n'):
+            line += '\n'
+        try:
+            self._queue.put_nowait((filename, line))
+        except queue.Full:
+            self.dropped += 1
+
+    def log(self, filename: str, text: str, record: Optional[Dict] = None):
+        """Queue a human-readable line and its structured JSON record (filename.jsonl)"""
+        self.append(filename, text)
+        if record is not None:
+            self.append(jsonl_path(filename),
+                        json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every line queued so far is written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((None, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Write the pending lines and stop (at exit)"""
+        self.flush(timeout)
+        self._closed = True
+        self._maybe_fsync(force=True)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Erreur d'écriture des journaux: {e}")
+            for filename, item in batch:
+                if filename is None:
+                    item.set()
+
+    def _write_batch(self, batch: List):
+        lines: Dict[str, List[str]] = {}
+        for filename, line in batch:
+            if filename is not None:
+                lines.setdefault(filename, []).append(line)
+        for filename, file_lines in lines.items():
+            fd = self._fd(filename)
+            os.write(fd, ''.join(file_lines).encode('utf-8'))
+            self.written += len(file_lines)
+            if os.fstat(fd).st_size > self.max_bytes:
+                if self.fsync != 'never':
+                    os.fsync(fd)
+                self._rotate(filename)
+        if lines:
+            self.batches += 1
+            self._unsynced = True
+            self._maybe_fsync(force=self.fsync == 'always')
+
+    def _fd(self, filename: str) -> int:
+        """Open file descriptor, reopened when another worker rotated the file"""
+        path = os.path.join(self.directory, filename)
+        fd = self._fds.get(filename)
+        if fd is not None:
+            try:
+                if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._fds[filename] = fd
+        return fd
+
+    def _maybe_fsync(self, force: bool = False):
+        if self.fsync == 'never' or not self._unsynced:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_fsync < self.fsync_interval:
+            return
+        for fd in self._fds.values():
+            os.fsync(fd)
+        self._unsynced = False
+        self._last_fsync = now
+        self.fsyncs += 1
+
+    def _rotate(self, filename: str):
+        """Move the file aside, gzip it and drop the oldest archives"""
+        path = os.path.join(self.directory, filename)
+        os.close(self._fds.pop(filename))
+        rotated = f"{path}.{datetime.now():%Y%m%d-%H%M%S-%f}.{os.getpid()}"
+        try:
+            os.rename(path, rotated)
+        except FileNotFoundError:
+            return  # Already rotated by another worker
+        with open(rotated, 'rb') as source, gzip.open(f"{rotated}.gz", 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.remove(rotated)
+        self.rotations += 1
+        for old in sorted(glob.glob(glob.escape(path) + '.*.gz'))[:-self.backups or None]:
+            os.remove(old)
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'fsyncs': self.fsyncs,
+            'rotations': self.rotations,
+            'dropped': self.dropped,
+            'fsync': self.fsync
+        }
+
+
+# Global writer
+log_writer = LogWriter()
@@ -0,0 +1,361 @@
+import os
+import glob
+import json
+import time
+import bisect
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Métriques exposées par /metrics (format texte Prometheus)
+METRICS_CONFIG = {
+    # Secondes ; les appels externes (Mistral, Replicate) vont jusqu'à la minute
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    # Dossier partagé par les workers gunicorn (vide : un seul processus). Chaque worker y écrit
+    # ses valeurs et /metrics les additionne, quel que soit le worker qui répond
+    'DIR': os.getenv('METRICS_DIR', ''),
+    'WRITE_INTERVAL': 5.0  # Secondes entre deux écritures des valeurs d'un worker
+}
+
+Labels = Tuple[str, ...]
+# Labels added to every line of a series (the worker of a gauge)
+ConstLabels = Tuple[Tuple[str, str], ...]
+
+
+class _ThreadShards:
+    """
+    One dict per thread: a thread only ever writes its own shard, so updates
+    need no lock. Collection copies every shard (dict.copy is atomic under the
+    GIL) and merges them.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def copies(self) -> List[Dict]:
+        with self._lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+
+def _check_labels(metric, labels: Labels):
+    if len(labels) != len(metric.labelnames):
+        raise ValueError(f"{metric.name} attend les labels {metric.labelnames}, reçu {labels}")
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        _check_labels(self, labels)
+        shard = self._shards.shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def collect(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._shards.copies():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def value(self, *labels: str) -> float:
+        return self.collect().get(labels, 0.0)
+
+    def merge(self, totals: Dict[Labels, float], values: Dict[Labels, float]):
+        for labels, value in values.items():
+            totals[labels] = totals.get(labels, 0.0) + value
+
+    def render(self, totals: Optional[Dict[Labels, float]] = None) -> List[str]:
+        totals = self.collect() if totals is None else totals
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(totals.items())]
+
+
+class Gauge:
+    """Value read when /metrics is scraped (nothing to update on the hot path)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = ()
+        self.function = function
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def read(self) -> Optional[float]:
+        if self.function is None:
+            return None
+        try:
+            return self.function()
+        except Exception:
+            return None
+
+    def line(self, value: float, const: ConstLabels = ()) -> str:
+        return f"{self.name}{_format_labels((), (), const)} {_format_value(value)}"
+
+    def render(self) -> List[str]:
+        value = self.read()
+        return [] if value is None else [self.line(value)]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_CONFIG['LATENCY_BUCKETS']):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards()
+
+    def observe(self, value: float, *labels: str):
+        _check_labels(self, labels)
+        shard = self._shards.shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # Counts per bucket (last one: +Inf), then the sum
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the duration of the block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self) -> Dict[Labels, List]:
+        totals: Dict[Labels, List] = {}
+        for shard in self._shards.copies():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(labels)
+                totals[labels] = entry if total is None else [a + b for a, b in zip(total, entry)]
+        return totals
+
+    def count(self, *labels: str) -> int:
+        entry = self.collect().get(labels)
+        return sum(entry[:-1]) if entry else 0
+
+    def merge(self, totals: Dict[Labels, List], values: Dict[Labels, List]):
+        for labels, entry in values.items():
+            if len(entry) != len(self.buckets) + 2:
+                continue  # Written with other buckets (before a config change)
+            total = totals.get(labels)
+            totals[labels] = list(entry) if total is None else [a + b for a, b in zip(total, entry)]
+
+    def render(self, totals: Optional[Dict[Labels, List]] = None) -> List[str]:
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        totals = self.collect() if totals is None else totals
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, entry[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames + ('le',), labels + (bound,))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], const: ConstLabels = ()) -> str:
+    pairs = list(zip(names, values)) + list(const)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _worker_file(directory: str, worker: str) -> str:
+    return os.path.join(directory, f"worker_{worker}.json")
+
+
+def clear_directory(directory: str):
+    """Drop the values of a previous run (gunicorn master, before the workers start)"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def mark_worker_dead(directory: str, worker: str):
+    """
+    Keep the counters of an exited worker (totals never go back) but drop its
+    gauges (gunicorn master, when the worker exits).
+    """
+    try:
+        os.replace(_worker_file(directory, worker),
+                   os.path.join(directory, f"dead_{worker}_{time.time_ns()}.json"))
+    except FileNotFoundError:
+        pass
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process. With a shared directory, every worker writes its
+    values there (every write_interval, and at each scrape for the one that
+    answers): /metrics sums counters and histograms over all workers, dead
+    ones included, and reports the gauges of live workers with a worker label.
+    """
+
+    def __init__(self, directory: str = METRICS_CONFIG['DIR'], worker: Optional[str] = None,
+                 write_interval: float = METRICS_CONFIG['WRITE_INTERVAL']):
+        self.directory = directory
+        # Read when writing (workers are forked after import), fixed in tests
+        self.worker = worker
+        self.write_interval = write_interval
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._writer_pid: Optional[int] = None
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, help_text, function))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = METRICS_CONFIG['LATENCY_BUCKETS']) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _list(self) -> List:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _worker_id(self) -> str:
+        return self.worker or str(os.getpid())
+
+    def write_values(self):
+        """Atomically replace this worker's file in the shared directory"""
+        values = {}
+        for metric in self._list():
+            if metric.kind == 'gauge':
+                value = metric.read()
+                if value is not None:
+                    values[metric.name] = value
+            else:
+                values[metric.name] = [[list(labels), value] for labels, value in metric.collect().items()]
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'worker': self._worker_id(), 'values': values}, f, ensure_ascii=False)
+            os.replace(tmp_path, _worker_file(self.directory, self._worker_id()))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def start_writer(self):
+        """Write this worker's values every write_interval (once per process, shared directory only)"""
+        if not self.directory or self._writer_pid == os.getpid():
+            return
+        self._writer_pid = os.getpid()
+        threading.Thread(target=self._write_loop, name='metrics-writer', daemon=True).start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.write_interval)
+            try:
+                self.write_values()
+            except OSError as e:
+                logger.warning(f"Écriture des métriques impossible: {e}")
+
+    def _read_values(self) -> List[Tuple[Optional[str], Dict]]:
+        """(worker if alive else None, values) of every file in the shared directory"""
+        files = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed meanwhile (dead worker renamed, new run)
+            alive = os.path.basename(path).startswith('worker_')
+            files.append((data['worker'] if alive else None, data['values']))
+        return files
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        files = None
+        if self.directory:
+            self.write_values()
+            files = self._read_values()
+        lines = []
+        for metric in self._list():
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if files is None:
+                lines.extend(metric.render())
+            elif metric.kind == 'gauge':
+                # Not additive (the shared rooms are seen by every worker): one series per live worker
+                lines.extend(metric.line(values[metric.name], (('worker', worker),))
+                             for worker, values in files
+                             if worker is not None and metric.name in values)
+            else:
+                totals = {}
+                for _, values in files:
+                    metric.merge(totals, {tuple(labels): value
+                                          for labels, value in values.get(metric.name, [])})
+                lines.extend(metric.render(totals))
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry and the metrics shared by the modules
+metrics = MetricsRegistry()
+
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', "Durée des requêtes HTTP par route", ('route', 'method', 'status'))
+external_call_seconds = metrics.histogram(
+    'external_call_duration_seconds',
+    "Durée des appels externes (mistral, replicate, card_image, image_download, google_tts)", ('service',))
+play_stage_seconds = metrics.histogram(
+    'play_stage_duration_seconds', "Durée de chaque étape d'un coup joué", ('stage',))
+errors_total = metrics.counter(
+    'errors_total', "Erreurs par origine (http, play_job ou service externe)", ('source',))
+fallbacks_total = metrics.counter(
+    'fallbacks_total', "Réponses de secours (fallback_text, fallback_to_original)", ('kind',))
+cache_requests_total = metrics.counter(
+    'cache_requests_total', "Consultations des caches (llm, card_image, audio) par résultat", ('cache', 'result'))
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Configuration du client Mistral
+MISTRAL_CONFIG = {
+    'API_URL': "https://api.mistral.ai/v1/chat/completions",
+    'MODEL': "mistral-large-latest",
+    'TEMPERATURE': 0.7,
+    'CONNECT_TIMEOUT': 5.0,  # Secondes pour établir la connexion
+    'READ_TIMEOUT': 60.0,  # Secondes d'attente de la réponse
+    'POOL_SIZE': 20,  # Connexions keep-alive gardées ouvertes
+    'MAX_RETRIES': 3,  # Nouvelles tentatives sur 429/5xx/erreur réseau
+    'BACKOFF_BASE': 0.5,  # Premier délai entre deux tentatives (doublé ensuite)
+    'BACKOFF_MAX': 8.0,
+    'BREAKER_FAILURE_THRESHOLD': 5,  # Échecs consécutifs avant ouverture du disjoncteur
+    'BREAKER_RESET_TIMEOUT': 30.0  # Secondes avant un nouvel essai de l'API
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class MistralError(Exception):
+    """The Mistral API could not produce a completion"""
+
+
+class CircuitOpenError(MistralError):
+    """The circuit breaker is open: the API is considered unhealthy"""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker: closed (normal), open (fail fast) and
+    half-open (one trial request after reset_timeout).
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.total_failures = 0
+        self.total_rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.total_rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("Mistral circuit breaker closed")
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def end_trial(self):
+        """The trial request is over, whatever its outcome (none recorded if it raised)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(
+                        f"Mistral circuit breaker opened after {self.consecutive_failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'retry_in': round(retry_in, 1) if retry_in is not None else None,
+                'total_failures': self.total_failures,
+                'total_rejected': self.total_rejected
+            }
+
+
+class MistralClient:
+    """Shared Mistral chat client: keep-alive pool, timeouts, retries and circuit breaker"""
+
+    def __init__(self, config: Dict = MISTRAL_CONFIG):
+        self.config = config
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['POOL_SIZE'])
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker(config['BREAKER_FAILURE_THRESHOLD'],
+                                      config['BREAKER_RESET_TIMEOUT'])
+        self.total_requests = 0
+        self.total_retries = 0
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before the next attempt: Retry-After if given, else jittered exponential"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config['BACKOFF_MAX'])
+            except ValueError:
+                pass
+        ceiling = min(self.config['BACKOFF_MAX'], self.config['BACKOFF_BASE'] * (2 ** attempt))
+        return random.uniform(0, ceiling)  # Full jitter
+
+    def _timeout(self, deadline: Optional[float]):
+        """(connect, read) timeouts, shortened to what is left before the deadline"""
+        connect, read = self.config['CONNECT_TIMEOUT'], self.config['READ_TIMEOUT']
+        if deadline is None:
+            return connect, read
+        remaining = max(deadline - time.monotonic(), 0.1)
+        return min(connect, remaining), min(read, remaining)
+
+    def _post(self, payload: Dict, deadline: Optional[float] = None) -> requests.Response:
+        """
+        POST the payload with retries; the breaker sees one outcome per call.
+        deadline (time.monotonic()) bounds the whole call, retries included.
+        """
+        api_key = os.getenv('MISTRAL_API_KEY')
+        if not api_key:
+            raise MistralError("MISTRAL_API_KEY not configured")
+        if deadline is not None and deadline <= time.monotonic():
+            raise MistralError("Mistral time budget exhausted")
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Mistral circuit breaker is open")
+
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        last_error: Optional[Exception] = None
+
+        try:
+            for attempt in range(self.config['MAX_RETRIES'] + 1):
+                if attempt:
+                    self.total_retries += 1
+                self.total_requests += 1
+                retry_after = None
+                try:
+                    response = self.session.post(self.config['API_URL'], headers=headers,
+                                                 json=payload, timeout=self._timeout(deadline),
+                                                 stream=payload.get('stream', False))
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        if response.status_code >= 400:
+                            # Client errors (bad key, bad request) will not improve with retries
+                            self.breaker.record_failure()
+                            raise MistralError(
+                                f"Mistral API error {response.status_code}: {response.text[:200]}")
+                        self.breaker.record_success()
+                        return response
+                    retry_after = response.headers.get('Retry-After')
+                    last_error = MistralError(f"Mistral API error {response.status_code}")
+                    response.close()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    last_error = e
+                except requests.exceptions.RequestException as e:
+                    # Redirects, invalid headers, bad encoding: not worth a retry
+                    self.breaker.record_failure()
+                    raise MistralError(f"Mistral request failed: {e}") from e
+
+                if attempt < self.config['MAX_RETRIES']:
+                    delay = self._backoff(attempt, retry_after)
+                    if deadline is not None and time.monotonic() + delay >= deadline:
+                        break  # No time left for another attempt
+                    logger.warning(f"Mistral request failed ({last_error}), retrying in {delay:.2f}s")
+                    time.sleep(delay)
+
+            self.breaker.record_failure()
+            raise MistralError(f"Mistral API unavailable after retries: {last_error}")
+        finally:
+            # A half-open trial never stays in flight, even if the call raised unexpectedly
+            self.breaker.end_trial()
+
+    def chat(self, prompt: str, model: Optional[str] = None,
+             temperature: Optional[float] = None, json_mode: bool = False,
+             deadline: Optional[float] = None) -> str:
+        """Return the completion of a single user prompt (a JSON object if json_mode)"""
+        payload = {
+            "model": model or self.config['MODEL'],
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }],
+            "temperature": self.config['TEMPERATURE'] if temperature is None else temperature
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        response = self._post(payload, deadline)
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise MistralError(f"Invalid JSON from Mistral API: {e}")
+
+        if 'choices' in result and len(result['choices']) > 0:
+            return result['choices'][0]['message']['content'].strip()
+        raise MistralError("Unexpected response format from Mistral API")
+
+    def stream_chat(self, prompt: str, model: Optional[str] = None,
+                    temperature: Optional[float] = None,
+                    deadline: Optional[float] = None) -> Iterator[str]:
+        """Yield the completion of a single user prompt piece by piece as it is generated"""
+        payload = {
+            "model": model or self.config['MODEL'],
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }],
+            "temperature": self.config['TEMPERATURE'] if temperature is None else temperature,
+            "stream": True
+        }
+        # Retries only cover the request itself, not a stream cut halfway
+        response = self._post(payload, deadline)
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                    content = chunk['choices'][0]['delta'].get('content')
+                except (ValueError, KeyError, IndexError) as e:
+                    raise MistralError(f"Invalid stream chunk from Mistral API: {e}")
+                if content:
+                    yield content
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            raise MistralError(f"Mistral stream interrupted: {e}")
+        finally:
+            response.close()
+
+    def status(self) -> Dict:
+        """Breaker and pool statistics for operators"""
+        return {
+            'breaker': self.breaker.snapshot(),
+            'total_requests': self.total_requests,
+            'total_retries': self.total_retries,
+            'connect_timeout': self.config['CONNECT_TIMEOUT'],
+            'read_timeout': self.config['READ_TIMEOUT'],
+            'max_retries': self.config['MAX_RETRIES']
+        }
+
+
+# Global client
+mistral_client = MistralClient()
@@ -0,0 +1,206 @@
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Configuration par défaut du contexte narratif envoyé à Mistral,
+# surchargeable par la section "context" de config.json
+CONTEXT_CONFIG = {
+    'recent_entries': 6,  # Derniers événements toujours envoyés mot pour mot
+    'summary_max_words': 120,  # Taille du résumé des événements plus anciens
+    'budgets': {  # Tokens d'histoire maximum par type de prompt
+        'story': 600,
+        'image_prompt': 400,
+        'reinterpretation': 600,
+        'conclusion': 800
+    },
+    'default_budget': 600
+}
+
+# Résumés mis à jour hors du chemin critique d'une carte
+summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='story-summary')
+
+
+def get_context_config() -> Dict:
+    """Defaults merged with the current config.json section"""
+    import game_logic
+    overrides = game_logic.GAME_CONFIG.get("context", {})
+    config = dict(CONTEXT_CONFIG, **overrides)
+    config['budgets'] = dict(CONTEXT_CONFIG['budgets'], **overrides.get('budgets', {}))
+    return config
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for French text)"""
+    return (len(text) + 3) // 4
+
+
+def entry_tokens(text: str) -> int:
+    """Tokens an entry adds to a joined history (its separator included)"""
+    return estimate_tokens(text) + 1
+
+
+def extractive_summary(summary: str, texts: List[str], max_words: int) -> str:
+    """Summary without Mistral: first sentence of each event, most recent words kept"""
+    sentences = [re.split(r'(?<=[.!?])\s', text.strip(), maxsplit=1)[0] for text in texts]
+    words = " ".join([summary] + sentences).split()
+    if len(words) > max_words:
+        words = ["..."] + words[-max_words:]
+    return " ".join(words)
+
+
+def summarize(summary: str, texts: List[str], max_words: int) -> str:
+    """Fold new events into the running summary"""
+    import game_logic
+    if not game_logic.GAME_CONFIG.get("mistral", {}).get("enabled", True):
+        return extractive_summary(summary, texts, max_words)
+
+    events = "\n".join(f"- {text}" for text in texts)
+    prompt = f"""Voici le résumé d'une histoire médiéval-fantastique et les événements qui ont suivi.
+
+[RESUME]
+{summary or "(début de l'histoire)"}
+[/RESUME]
+
+[EVENEMENTS]
+{events}
+[/EVENEMENTS]
+
+Écris un nouveau résumé qui intègre ces événements, en {max_words} mots maximum, sans rien inventer. Je ne veux que le résumé en retour."""
+    result = game_logic.call_mistral_ai(prompt)
+    if result == game_logic.GAME_CONFIG.get("mistral", {}).get("fallback_text"):
+        # Mistral indisponible: on ne remplace pas l'histoire par le texte de secours
+        return extractive_summary(summary, texts, max_words)
+    return result
+
+
+class NarrativeContext:
+    """
+    Story history sent in prompts, bounded per prompt type: the last entries
+    verbatim plus a rolling summary of the older ones. The summary is updated
+    incrementally in the background; until it catches up, the entries it does
+    not cover yet are sent verbatim within the budget. Token counts come from
+    the StoryLog, so building a prompt does not depend on the story length.
+    """
+
+    def __init__(self):
+        self.summary = ""
+        self._summarized_count = 0
+        # StoryLog revision the summary was written from (a rewrite invalidates it)
+        self._summarized_revision = None
+        self._updating = False
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+
+    def _covered_count(self, story, count: int) -> int:
+        """Number of leading entries (at most count) the current summary is valid for"""
+        if story.revision == self._summarized_revision and self._summarized_count <= count:
+            return self._summarized_count
+        return 0
+
+    def update_summary(self, story, count: int):
+        """Bring the summary up to date with the first `count` entries (older than the recent window)"""
+        max_words = get_context_config()['summary_max_words']
+        revision = story.revision
+        count = min(count, len(story))
+        with self._lock:
+            covered = self._covered_count(story, count)
+            summary = self.summary if covered else ""
+        if covered >= count:
+            return
+        texts = [entry['text'] for entry in story[covered:count]]
+        if story.revision != revision:
+            return  # Rewritten meanwhile, the next prompt starts over
+        new_summary = summarize(summary, texts, max_words)
+        with self._lock:
+            self.summary = new_summary
+            self._summarized_count = count
+            self._summarized_revision = revision
+
+    def _schedule_update(self, story, count: int):
+        with self._lock:
+            if self._updating:
+                return
+            self._updating = True
+
+        def run():
+            try:
+                self.update_summary(story, count)
+            except Exception as e:
+                logger.error(f"Story summary update failed: {e}")
+            finally:
+                with self._lock:
+                    self._updating = False
+
+        summary_executor.submit(run)
+
+    def build(self, story, purpose: str, background: bool = True) -> str:
+        """History string of a StoryLog for a prompt of type `purpose` ('story', 'image_prompt', ...)"""
+        config = get_context_config()
+        budget = config['budgets'].get(purpose, config['default_budget'])
+        full_tokens = story.token_total()
+
+        if full_tokens <= budget:
+            context = story.history()
+            sent_tokens = full_tokens
+        else:
+            count = len(story)
+            older_count = count - min(config['recent_entries'], count)
+
+            if background:
+                self._schedule_update(story, older_count)
+            else:
+                self.update_summary(story, older_count)
+            with self._lock:
+                covered = self._covered_count(story, older_count)
+                summary = self.summary if covered else ""
+
+            # Recent entries first, the oldest ones dropped if they alone exceed the budget
+            start = older_count
+            recent_tokens = sum(story.tokens(i) for i in range(start, count))
+            while start < count and recent_tokens > budget:
+                recent_tokens -= story.tokens(start)
+                start += 1
+            remaining = budget - recent_tokens
+
+            parts: List[str] = []
+            if summary:
+                summary_text = f"Résumé des événements précédents : {summary}"
+                if entry_tokens(summary_text) <= remaining:
+                    parts.append(summary_text)
+                    remaining -= entry_tokens(summary_text)
+
+            # Entries the summary does not cover yet, newest first, as long as they fit
+            gap_start = older_count
+            while gap_start > covered and story.tokens(gap_start - 1) <= remaining:
+                gap_start -= 1
+                remaining -= story.tokens(gap_start)
+            gap = [entry['text'] for entry in story[gap_start:older_count]]
+            if gap and gap_start > covered:
+                gap.insert(0, "...")
+            recent = [entry['text'] for entry in story[start:count]]
+            context = " ".join(parts + gap + recent)
+            sent_tokens = estimate_tokens(context)
+
+        with self._lock:
+            self.prompts += 1
+            self.full_tokens += full_tokens
+            self.sent_tokens += sent_tokens
+        return context
+
+    def stats(self) -> Dict:
+        """Token savings for debug endpoints"""
+        with self._lock:
+            return {
+                'prompts': self.prompts,
+                'full_history_tokens': self.full_tokens,
+                'sent_tokens': self.sent_tokens,
+                'saved_tokens': self.full_tokens - self.sent_tokens,
+                'summarized_entries': self._summarized_count,
+                'summary_words': len(self.summary.split())
+            }
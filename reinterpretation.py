@@ -0,0 +1,158 @@
+import json
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import game_logic
+from game_logic import call_mistral_ai, effect_note, get_story_prompt
+
+logger = logging.getLogger(__name__)
+
+# Configuration par défaut de la réinterprétation (Inversion / Suppression),
+# surchargeable par la section "reinterpretation" de config.json
+REINTERPRETATION_CONFIG = {
+    'mode': 'parallel',  # 'parallel' : un appel par entrée, 'batch' : un seul appel JSON
+    'max_workers': 4,  # Appels Mistral simultanés pour une même carte spéciale
+    'time_budget': 45.0  # Secondes au-delà desquelles on garde le texte original
+}
+
+# Threads partagés par toutes les salles, la limite par carte est max_workers
+reinterpretation_executor = ThreadPoolExecutor(max_workers=16,
+                                               thread_name_prefix='reinterpretation')
+
+
+def get_reinterpretation_config() -> Dict:
+    """Defaults merged with the current config.json section"""
+    return dict(REINTERPRETATION_CONFIG, **game_logic.GAME_CONFIG.get("reinterpretation", {}))
+
+
+def _reinterpret_parallel(entries: List[Dict], story: List[Dict], score: int,
+                          story_history: str, suffix: str, config: Dict) -> List[Optional[str]]:
+    """One story prompt per entry, at most max_workers in flight"""
+    deadline = time.monotonic() + config['time_budget']
+    prompts = [
+        get_story_prompt(story, score, entry['card'], entry['role'], entry['effect'],
+                         story_history=story_history) + suffix
+        for entry in entries
+    ]
+    texts: List[Optional[str]] = [None] * len(entries)
+    pending = {}
+    next_index = 0
+
+    while next_index < len(prompts) or pending:
+        # Keep max_workers calls running
+        while next_index < len(prompts) and len(pending) < config['max_workers']:
+            # The deadline also bounds the call itself: a late call does not keep its thread.
+            # No fallback text: a failed call returns None and the entry keeps its text
+            future = reinterpretation_executor.submit(call_mistral_ai, prompts[next_index],
+                                                      deadline=deadline, fallback=False)
+            pending[future] = next_index
+            next_index += 1
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                texts[index] = future.result()
+            except Exception as e:
+                logger.error(f"Reinterpretation of entry {index} failed: {e}")
+
+    for future in pending:
+        future.cancel()
+    return texts
+
+
+def build_batch_prompt(entries: List[Dict], story_history: str, instruction: str) -> str:
+    """Single prompt asking for every reinterpreted entry as a JSON object"""
+    events = []
+    for number, entry in enumerate(entries, 1):
+        events.append(f"""[EVENEMENT {number}]
+Rôle : {entry['role']}
+Clef : {entry['card']['descriptif']} (effet {effect_note(entry['effect'])})
+Texte actuel : {entry['text']}
+[/EVENEMENT {number}]""")
+    events_str = "\n".join(events)
+
+    return f"""Tu es un narrateur qui raconte une histoire dans un univers médiéval-fantastique.
+
+Contexte actuel :
+[HISTOIRE]
+{story_history}
+[/HISTOIRE]
+
+Événements à réécrire ({instruction}) :
+{events_str}
+
+Consigne :
+Réécris chaque événement en incorporant sa clef comme un élément narratif. Ne cite jamais le mot "carte" ni le nom de la carte directement. Garde le mystère. Marque bien l'effet. Chaque texte doit faire 20-25 mots.
+Réponds uniquement avec un objet JSON dont les clés sont les numéros des événements, par exemple {{"1": "texte", "2": "texte"}}."""
+
+
+def parse_batch_response(response: str, count: int) -> List[Optional[str]]:
+    """Texts of a batch response, None for missing or malformed entries"""
+    texts: List[Optional[str]] = [None] * count
+    try:
+        data = json.loads(response)
+    except (TypeError, ValueError):
+        logger.error("Batch reinterpretation response is not valid JSON")
+        return texts
+    if not isinstance(data, dict):
+        return texts
+    for number in range(1, count + 1):
+        text = data.get(str(number))
+        if isinstance(text, str) and text.strip():
+            texts[number - 1] = text.strip()
+    return texts
+
+
+def _reinterpret_batch(entries: List[Dict], story_history: str, instruction: str,
+                       config: Dict) -> List[Optional[str]]:
+    """One multi-entry request with structured (JSON) output"""
+    prompt = build_batch_prompt(entries, story_history, instruction)
+    deadline = time.monotonic() + config['time_budget']
+    future = reinterpretation_executor.submit(call_mistral_ai, prompt, json_mode=True,
+                                              deadline=deadline, fallback=False)
+    done, _ = wait([future], timeout=config['time_budget'])
+    if not done:
+        future.cancel()
+        return [None] * len(entries)
+    try:
+        response = future.result()
+        if response is None:
+            return [None] * len(entries)
+        return parse_batch_response(response, len(entries))
+    except Exception as e:
+        logger.error(f"Batch reinterpretation failed: {e}")
+        return [None] * len(entries)
+
+
+def reinterpret_entries(entries: List[Dict], story: List[Dict], score: int,
+                        instruction: str, story_history: Optional[str] = None) -> List[str]:
+    """
+    Regenerate the text of story entries affected by a special card.
+    The history is built once for every entry (the full story unless a
+    bounded story_history is given). Entries that miss the time budget
+    (or fail) keep their original text.
+    """
+    if not entries:
+        return []
+
+    config = get_reinterpretation_config()
+    if story_history is None:
+        story_history = " ".join(entry['text'] for entry in story)
+    started = time.monotonic()
+
+    if config['mode'] == 'batch':
+        texts = _reinterpret_batch(entries, story_history, instruction, config)
+    else:
+        texts = _reinterpret_parallel(entries, story, score, story_history,
+                                      f" ({instruction})", config)
+
+    kept = sum(1 for text in texts if text is None)
+    logger.info(f"Reinterpreted {len(entries) - kept}/{len(entries)} entries "
+                f"in {time.monotonic() - started:.2f}s (mode {config['mode']})")
+    return [text if text is not None else entry['text'] for text, entry in zip(texts, entries)]
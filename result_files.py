@@ -0,0 +1,120 @@
+import os
+import re
+import time
+import mimetypes
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import Response, request, send_file
+from werkzeug.security import safe_join
+
+# Service des images générées (/result)
+RESULT_FILES_CONFIG = {
+    'DIR': 'result',
+    # '' : Flask envoie le fichier ; 'x-sendfile' (Apache, lighttpd) ou 'x-accel' (nginx) :
+    # le proxy inverse envoie le fichier, le worker Python ne fait que les en-têtes
+    'OFFLOAD': os.getenv('RESULT_OFFLOAD', ''),
+    'ACCEL_PREFIX': os.getenv('RESULT_ACCEL_PREFIX', '/_result/'),  # location internal nginx
+    'STAT_TTL': 10.0,  # Secondes pendant lesquelles un stat est réutilisé
+    'IMMUTABLE_MAX_AGE': 365 * 24 * 3600,  # Noms contenant le hash du contenu
+    'MUTABLE_MAX_AGE': 3600  # Anciens noms horodatés
+}
+
+# <prefix>_<sha256[:16]>.<ext>, voir image_ingest.ingest_image
+CONTENT_HASH_PATTERN = re.compile(r'_([0-9a-f]{16})\.[a-z]+$')
+
+
+def content_hash(filename: str) -> Optional[str]:
+    """Content hash embedded in a result filename, None for older names"""
+    match = CONTENT_HASH_PATTERN.search(filename)
+    return match.group(1) if match else None
+
+
+class FileInfo:
+    def __init__(self, path: str, size: int, mtime: float, etag: str, immutable: bool):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.immutable = immutable
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+class ResultFiles:
+    """
+    Serves the result directory: strong ETags (the content hash when the name
+    has one), immutable caching of content-hashed names, 304 answered from a
+    stat cache without touching the file, Range via send_file, and optional
+    X-Sendfile / X-Accel-Redirect offload to the reverse proxy.
+    """
+
+    def __init__(self, directory: str = RESULT_FILES_CONFIG['DIR'],
+                 offload: str = RESULT_FILES_CONFIG['OFFLOAD'],
+                 stat_ttl: float = RESULT_FILES_CONFIG['STAT_TTL']):
+        self.directory = os.path.abspath(directory)
+        self.offload = offload
+        self.stat_ttl = stat_ttl
+        self._stats: Dict[str, Tuple[float, FileInfo]] = {}
+        self._lock = threading.Lock()
+
+    def info(self, filename: str) -> Optional[FileInfo]:
+        """Stat of a result file (cached for stat_ttl seconds), None if it does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._stats.get(filename)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        path = safe_join(self.directory, filename)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._stats.pop(filename, None)
+            return None
+
+        digest = content_hash(filename)
+        etag = digest or f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        info = FileInfo(path, stat.st_size, stat.st_mtime, etag, immutable=digest is not None)
+        with self._lock:
+            self._stats[filename] = (now + self.stat_ttl, info)
+        return info
+
+    def response(self, filename: str) -> Optional[Response]:
+        """Response serving a result file, None if it does not exist"""
+        info = self.info(filename)
+        if info is None:
+            return None
+
+        max_age = (RESULT_FILES_CONFIG['IMMUTABLE_MAX_AGE'] if info.immutable
+                   else RESULT_FILES_CONFIG['MUTABLE_MAX_AGE'])
+        if info.etag in request.if_none_match:
+            response = Response(status=304)
+        elif self.offload == 'x-accel':
+            response = Response(mimetype=info.mimetype)
+            response.headers['X-Accel-Redirect'] = RESULT_FILES_CONFIG['ACCEL_PREFIX'] + filename
+        elif self.offload == 'x-sendfile':
+            response = Response(mimetype=info.mimetype)
+            response.headers['X-Sendfile'] = info.path
+        else:
+            # Range and If-Modified-Since are handled by send_file; the body goes
+            # through wsgi.file_wrapper (sendfile under gunicorn)
+            response = send_file(info.path, mimetype=info.mimetype, conditional=True,
+                                 etag=info.etag, last_modified=info.mtime, max_age=max_age)
+
+        response.set_etag(info.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if info.immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'offload': self.offload or None, 'cached_stats': len(self._stats)}
+
+
+# Global server
+result_files = ResultFiles()
@@ -0,0 +1,228 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from game_logic import GameState
+from state_backend import MemoryBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+# Salle utilisée quand le client ne précise rien (compatibilité avec l'ancien client)
+DEFAULT_ROOM_ID = "principale"
+
+# Configuration du registre des salles
+ROOM_CONFIG = {
+    'MAX_ROOMS': 5000,  # Nombre maximum de salles gardées en mémoire
+    'IDLE_TIMEOUT': 3600.0  # 1 heure sans accès avant libération de la salle
+}
+
+ROOM_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def normalize_room_id(raw_room_id: Optional[str]) -> Optional[str]:
+    """Return a clean room id, the default room for empty input, or None if invalid"""
+    if raw_room_id is None:
+        return DEFAULT_ROOM_ID
+    room_id = str(raw_room_id).strip()
+    if not room_id:
+        return DEFAULT_ROOM_ID
+    if not ROOM_ID_PATTERN.match(room_id):
+        return None
+    return room_id
+
+
+class Room:
+    """A single game table: its GameState plus the locks protecting it"""
+
+    def __init__(self, room_id: str, backend=None):
+        self.room_id = room_id
+        self.state = GameState(room_id=room_id)
+        self.backend = backend or MemoryBackend()
+        # Short critical sections (state reads/mutations); with a shared backend
+        # each section also loads and commits the state shared by the workers
+        self.lock = self.backend.room_lock(self)
+        # Serializes card plays inside the room (long AI calls)
+        self.play_lock = threading.Lock()
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        # Wakes up push subscribers (/stream, long-polling /refresh) on state changes
+        self.changed = threading.Condition()
+        self.subscribers = 0
+        self.state.on_change = self.notify_change
+
+    def touch(self):
+        """Mark the room as recently used"""
+        self.last_access = time.monotonic()
+
+    def is_busy(self) -> bool:
+        """A room with a card play in progress or open subscribers must not be evicted"""
+        return (self.play_lock.locked() or self.subscribers > 0
+                or self.state.processing_player is not None)
+
+    def notify_change(self):
+        """Wake up every subscriber waiting for a new state version"""
+        with self.changed:
+            self.changed.notify_all()
+
+    def wait_for_change(self, since: int, timeout: float) -> bool:
+        """Block until the state version differs from `since`; False on timeout"""
+        poll_interval = self.backend.poll_interval
+        if not poll_interval:
+            with self.changed:
+                return self.changed.wait_for(lambda: self.state.version != since, timeout)
+
+        # Commits of other workers do not notify this process: poll the shared version
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            with self.changed:
+                if self.changed.wait_for(lambda: self.state.version != since,
+                                         max(0.0, min(remaining, poll_interval))):
+                    return True
+            if remaining <= poll_interval:
+                return False
+            if self.backend.changed_elsewhere(self):
+                with self.lock:
+                    pass  # Acquiring the lock loads the new state
+
+
+class RoomRegistry:
+    """Lazily creates rooms and keeps memory bounded with LRU + idle eviction"""
+
+    def __init__(self,
+                 max_rooms: int = ROOM_CONFIG['MAX_ROOMS'],
+                 idle_timeout: float = ROOM_CONFIG['IDLE_TIMEOUT'],
+                 backend=None):
+        self.max_rooms = max_rooms
+        self.idle_timeout = idle_timeout
+        self.backend = backend or MemoryBackend()
+        # Ordered from least to most recently used
+        self._rooms: "OrderedDict[str, Room]" = OrderedDict()
+        # Only protects the dicts themselves, never held while a room works
+        self._lock = threading.Lock()
+        # One lock per room being created: concurrent first accesses build it once
+        self._creating: Dict[str, threading.Lock] = {}
+        # Called with each new room before first use (e.g. event_log.attach reloads its state)
+        self.on_create: Optional[Callable[[Room], None]] = None
+        # Called with each room dropped from the registry (e.g. event_log.detach)
+        self.on_evict: Optional[Callable[[Room], None]] = None
+
+    def _lookup_locked(self, room_id: str) -> Optional[Room]:
+        room = self._rooms.get(room_id)
+        if room is not None:
+            self._rooms.move_to_end(room_id)
+            room.touch()
+        return room
+
+    def get(self, room_id: str) -> Room:
+        """Get a room, creating it on first access"""
+        with self._lock:
+            room = self._lookup_locked(room_id)
+            if room is not None:
+                evicted = self._evict_locked()
+            else:
+                create_lock = self._creating.setdefault(room_id, threading.Lock())
+        if room is None:
+            # Built and reloaded (on_create) outside the registry lock: other rooms stay reachable
+            with create_lock:
+                with self._lock:
+                    room = self._lookup_locked(room_id)
+                if room is None:
+                    try:
+                        room = Room(room_id, self.backend)
+                        if self.on_create:
+                            self.on_create(room)
+                        with self._lock:
+                            self._rooms[room_id] = room
+                            room.touch()
+                            logger.info(f"Salle créée: {room_id} ({len(self._rooms)} salles)")
+                    finally:
+                        with self._lock:
+                            self._creating.pop(room_id, None)
+                    room.state.log_action("Début")
+            with self._lock:
+                evicted = self._evict_locked()
+        self._evicted(evicted)
+        return room
+
+    def peek(self, room_id: str) -> Optional[Room]:
+        """Get an existing room without creating it nor refreshing its LRU position"""
+        with self._lock:
+            return self._rooms.get(room_id)
+
+    def remove(self, room_id: str) -> bool:
+        """Drop a room from the registry"""
+        with self._lock:
+            room = self._rooms.pop(room_id, None)
+        if room is None:
+            return False
+        self._evicted([room])
+        return True
+
+    def _evicted(self, rooms: List[Room]):
+        """Run on_evict outside the registry lock"""
+        if self.on_evict:
+            for room in rooms:
+                try:
+                    self.on_evict(room)
+                except Exception as e:
+                    logger.error(f"Erreur à la libération de la salle {room.room_id}: {e}")
+
+    def _evict_locked(self) -> List[Room]:
+        """Drop idle rooms, then the least recently used ones above capacity; return the dropped rooms"""
+        now = time.monotonic()
+        skipped: List[Room] = []
+        evicted: List[Room] = []
+
+        while self._rooms:
+            room_id, room = next(iter(self._rooms.items()))
+            over_capacity = len(self._rooms) + len(skipped) > self.max_rooms
+            idle = now - room.last_access > self.idle_timeout
+            if not over_capacity and not idle:
+                break
+            del self._rooms[room_id]
+            if room.is_busy():
+                skipped.append(room)
+                continue
+            evicted.append(room)
+            logger.info(f"Salle libérée: {room_id} (inactive depuis {now - room.last_access:.0f}s)")
+
+        # Busy rooms go back to the front, they will be checked again next time
+        for room in reversed(skipped):
+            self._rooms[room.room_id] = room
+            self._rooms.move_to_end(room.room_id, last=False)
+        return evicted
+
+    def room_ids(self) -> List[str]:
+        """List the ids of rooms currently in memory"""
+        with self._lock:
+            return list(self._rooms.keys())
+
+    def player_count(self) -> int:
+        """Active players over every room in memory"""
+        with self._lock:
+            rooms = list(self._rooms.values())
+        return sum(len(room.state.published_players) for room in rooms)
+
+    def stats(self) -> Dict:
+        """Summary of the registry for debug endpoints"""
+        with self._lock:
+            rooms = list(self._rooms.values())
+        return {
+            'rooms': len(rooms),
+            'max_rooms': self.max_rooms,
+            'idle_timeout': self.idle_timeout,
+            'busy_rooms': sum(1 for room in rooms if room.is_busy()),
+            'state_backend': self.backend.stats()
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rooms)
+
+
+# Global registry
+room_registry = RoomRegistry(backend=state_backend)
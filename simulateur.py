@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Simulateur Monte Carlo de parties pour tester l'équilibre du jeu.
+
+Reprend les règles de GameState : score de départ max(2, joueurs*2), un point
+gagné ou perdu selon l'effet de la carte pour le rôle, BASE_CARDS_TO_PLAY +
+joueurs cartes à jouer, victoire si score final >= score initial. La carte
+Suppression annule l'effet d'une carte jouée et la remet en jeu (une carte de
+plus à jouer) ; l'Inversion ne change pas le score mais consomme un tour.
+
+Les parties sont simulées par lots (tableaux NumPy, un tour à la fois pour
+toutes les parties du lot) et les lots répartis sur plusieurs processus.
+
+Exemple : python simulateur.py --games 200000 --players 2-4 --policy greedy
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations_with_replacement
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from evaluation_matrix import EvaluationMatrix
+from game_logic import BASE_CARDS_TO_PLAY, starting_score
+
+# Cartes normales jouables (voir GameState.validate_card_input)
+NORMAL_CARDS = list(range(1, 56))
+BATCH_SIZE = 50_000  # Parties simulées ensemble par un processus
+
+
+def simulate_batch(effects: np.ndarray, composition: Sequence[int], games: int,
+                   base_cards: int = BASE_CARDS_TO_PLAY, policy: str = 'random',
+                   suppression_rate: float = 0.0, inversion_rate: float = 0.0,
+                   seed=None) -> Dict:
+    """
+    Play `games` games of one role composition.
+    effects: roles x normal cards matrix (+1/0/-1); composition: role index of
+    each player in turn order (the first player is drawn at random).
+    policy 'random' plays a random available card, 'greedy' the best one for the role.
+    """
+    rng = np.random.default_rng(seed)
+    player_count = len(composition)
+    card_count = effects.shape[1]
+    total_cards = base_cards + player_count
+    initial_score = starting_score(player_count)
+    player_effects = effects[list(composition)].astype(np.int8)
+    greedy = policy == 'greedy'
+
+    rows = np.arange(games)
+    score = np.full(games, initial_score, dtype=np.int32)
+    played = np.zeros((games, card_count), dtype=bool)
+    played_effect = np.zeros((games, card_count), dtype=np.int8)
+    played_count = np.zeros(games, dtype=np.int32)
+    turn = rng.integers(0, player_count, size=games)
+    has_suppression = np.ones((games, player_count), dtype=bool)
+    has_inversion = np.ones((games, player_count), dtype=bool)
+    suppressions = 0
+    inversions = 0
+
+    # Each special card is played at most once per player, each Suppression adds a card
+    for _ in range(total_cards + 3 * player_count):
+        active = played_count < total_cards
+        if not active.any():
+            break
+        player = turn % player_count
+
+        invert = active & has_inversion[rows, player] & (rng.random(games) < inversion_rate)
+        has_inversion[rows[invert], player[invert]] = False
+        inversions += int(invert.sum())
+
+        suppress = (active & ~invert & has_suppression[rows, player] & (played_count > 0)
+                    & (rng.random(games) < suppression_rate))
+        if greedy:
+            # Only worth it when a harmful card is in the story
+            suppress &= played_effect.min(axis=1) < 0
+        if suppress.any():
+            idx = rows[suppress]
+            noise = rng.random((len(idx), card_count))
+            keys = (noise * 0.5 - played_effect[idx]) if greedy else noise
+            keys[~played[idx]] = -np.inf
+            target = keys.argmax(axis=1)
+            score[idx] -= played_effect[idx, target]
+            played[idx, target] = False
+            played_effect[idx, target] = 0
+            played_count[idx] -= 1
+            has_suppression[idx, player[suppress]] = False
+            suppressions += len(idx)
+
+        normal = active & ~invert & ~suppress
+        idx = rows[normal]
+        card_effects = player_effects[player[normal]]
+        noise = rng.random((len(idx), card_count))
+        keys = card_effects + noise * 0.5 if greedy else noise
+        keys[played[idx]] = -np.inf
+        card = keys.argmax(axis=1)
+        effect = card_effects[np.arange(len(idx)), card]
+        score[idx] += effect
+        played[idx, card] = True
+        played_effect[idx, card] = effect
+        played_count[idx] += 1
+
+        turn[active] += 1
+
+    wins = score >= initial_score
+    return {
+        'games': games,
+        'wins': int(wins.sum()),
+        'score_sum': int(score.sum()),
+        'card_played': played.sum(axis=0),
+        'card_played_wins': played[wins].sum(axis=0),
+        'suppressions': suppressions,
+        'inversions': inversions
+    }
+
+
+def _run_task(task: Tuple) -> Tuple[Tuple[int, ...], Dict]:
+    effects, composition, games, base_cards, policy, suppression_rate, inversion_rate, seed = task
+    return composition, simulate_batch(effects, composition, games, base_cards, policy,
+                                       suppression_rate, inversion_rate, seed)
+
+
+def simulate(matrix: EvaluationMatrix, compositions: List[Tuple[int, ...]], games: int,
+             base_cards: int = BASE_CARDS_TO_PLAY, policy: str = 'random',
+             suppression_rate: float = 0.0, inversion_rate: float = 0.0,
+             workers: int = 0, seed: int = 0) -> Dict:
+    """Simulate `games` games per composition on a process pool and aggregate the results"""
+    columns = [matrix.card_index[card] for card in NORMAL_CARDS if card in matrix.card_index]
+    card_numbers = [matrix.cards[j] for j in columns]
+    effects = np.ascontiguousarray(matrix.matrix[:, columns])
+
+    tasks = []
+    for composition in compositions:
+        for start in range(0, games, BATCH_SIZE):
+            tasks.append([effects, composition, min(BATCH_SIZE, games - start), base_cards,
+                          policy, suppression_rate, inversion_rate])
+    for task, child_seed in zip(tasks, np.random.SeedSequence(seed).spawn(len(tasks))):
+        task.append(child_seed)
+
+    per_composition: Dict[Tuple[int, ...], Dict] = {}
+    card_played = np.zeros(len(columns), dtype=np.int64)
+    card_played_wins = np.zeros(len(columns), dtype=np.int64)
+    total_games = 0
+    total_wins = 0
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for composition, result in executor.map(_run_task, map(tuple, tasks)):
+            stats = per_composition.setdefault(composition, {
+                'games': 0, 'wins': 0, 'score_sum': 0, 'suppressions': 0, 'inversions': 0})
+            for key in stats:
+                stats[key] += result[key]
+            card_played += result['card_played']
+            card_played_wins += result['card_played_wins']
+            total_games += result['games']
+            total_wins += result['wins']
+
+    # Impact d'une carte : taux de victoire quand elle est dans l'histoire finale - sinon
+    not_played = total_games - card_played
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate_played = card_played_wins / card_played
+        win_rate_not_played = (total_wins - card_played_wins) / not_played
+    impact = np.nan_to_num(win_rate_played - win_rate_not_played)
+
+    return {
+        'games': total_games,
+        'wins': total_wins,
+        'compositions': {
+            composition: dict(stats, win_rate=stats['wins'] / stats['games'],
+                              mean_score=stats['score_sum'] / stats['games'])
+            for composition, stats in per_composition.items()
+        },
+        'cards': [
+            {'numero': card, 'play_rate': float(card_played[j] / total_games),
+             'impact': float(impact[j])}
+            for j, card in enumerate(card_numbers)
+        ]
+    }
+
+
+def parse_player_range(value: str) -> List[int]:
+    """'3' -> [3], '2-4' -> [2, 3, 4]"""
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(value)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulateur Monte Carlo d'équilibre du jeu")
+    parser.add_argument('--games', type=int, default=100_000, help="Parties par composition de rôles")
+    parser.add_argument('--players', default='2-4', help="Nombre de joueurs, ex: 3 ou 2-4")
+    parser.add_argument('--policy', choices=['random', 'greedy'], default='random')
+    parser.add_argument('--base-cards', type=int, default=BASE_CARDS_TO_PLAY)
+    parser.add_argument('--suppression-rate', type=float, default=0.0,
+                        help="Probabilité de jouer sa Suppression à chaque tour")
+    parser.add_argument('--inversion-rate', type=float, default=0.0,
+                        help="Probabilité de jouer son Inversion à chaque tour")
+    parser.add_argument('--evaluations', default='evaluations.json',
+                        help="Fichier d'évaluations à tester (avant déploiement)")
+    parser.add_argument('--workers', type=int, default=0, help="Processus (0 = nombre de CPU)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10, help="Cartes affichées en tête et en fin")
+    args = parser.parse_args()
+
+    with open(args.evaluations, 'r', encoding='utf-8') as f:
+        evaluations = json.load(f)
+    matrix = EvaluationMatrix(evaluations, NORMAL_CARDS)
+    role_ids = range(len(matrix.roles))
+    compositions = [composition for count in parse_player_range(args.players)
+                    for composition in combinations_with_replacement(role_ids, count)]
+
+    print("=== SIMULATION MONTE CARLO ===\n")
+    started = time.monotonic()
+    results = simulate(matrix, compositions, args.games, args.base_cards, args.policy,
+                       args.suppression_rate, args.inversion_rate, args.workers, args.seed)
+    elapsed = time.monotonic() - started
+    print(f"{results['games']:,} parties en {elapsed:.1f}s "
+          f"({results['games'] / elapsed * 60:,.0f} parties/minute), politique {args.policy}")
+    print(f"Taux de victoire global: {results['wins'] / results['games']:.1%}\n")
+
+    print(f"{'Composition':<40} {'Victoires':<10} {'Score moyen':<12}")
+    print("-" * 64)
+    ranked = sorted(results['compositions'].items(), key=lambda item: item[1]['win_rate'])
+    for composition, stats in ranked:
+        names = ", ".join(matrix.roles[i] for i in composition)
+        print(f"{names:<40} {stats['win_rate']:<10.1%} {stats['mean_score']:<12.2f}")
+
+    cards = sorted(results['cards'], key=lambda card: card['impact'], reverse=True)
+    print("\n=== CARTES LES PLUS FAVORABLES ===")
+    for card in cards[:args.top]:
+        print(f"  #{card['numero']:<4} impact {card['impact']:+.1%} (jouée dans {card['play_rate']:.0%} des parties)")
+    print("\n=== CARTES LES PLUS DÉFAVORABLES ===")
+    for card in cards[-args.top:][::-1]:
+        print(f"  #{card['numero']:<4} impact {card['impact']:+.1%} (jouée dans {card['play_rate']:.0%} des parties)")
+
+
+if __name__ == "__main__":
+    main()
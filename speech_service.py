@@ -1,10 +1,69 @@
 import os
+import re
 import requests
 import json
 import base64
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from flask import jsonify
 
+from audio_cache import audio_cache, audio_key
+from metrics import cache_requests_total, errors_total, external_call_seconds
+
+# Synthèse par morceaux des textes longs
+TTS_CONFIG = {
+    'CHUNK_THRESHOLD': 300,  # Caractères au-delà desquels le texte est découpé en phrases
+    'FIRST_CHUNK_MAX_CHARS': 160,  # Premier morceau court : la lecture démarre vite
+    'CHUNK_MAX_CHARS': 600,
+    'API_MAX_CHARS': 5000,  # Limite de l'API Google par requête
+    'MAX_PARALLEL': 4,  # Morceaux d'une même narration synthétisés en même temps
+    'MAX_WORKERS': 8
+}
+
+tts_executor = ThreadPoolExecutor(max_workers=TTS_CONFIG['MAX_WORKERS'], thread_name_prefix='tts')
+
+SENTENCE_END = re.compile(r'(?<=[.!?…»])\s+')
+
+
+def _split_long(sentence, max_chars):
+    """Cut a sentence longer than max_chars at commas, then spaces"""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(', ', 0, max_chars)
+        if cut <= 0:
+            cut = sentence.rfind(' ', 0, max_chars)
+        cut = cut + 1 if cut > 0 else max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text, first_max_chars=None, max_chars=None):
+    """Split text at sentence boundaries into chunks; the first one is kept short"""
+    first_max_chars = first_max_chars or TTS_CONFIG['FIRST_CHUNK_MAX_CHARS']
+    max_chars = max_chars or TTS_CONFIG['CHUNK_MAX_CHARS']
+    sentences = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentences.extend(_split_long(sentence, max_chars))
+
+    chunks = []
+    current = ''
+    for sentence in sentences:
+        limit = max_chars if chunks else first_max_chars
+        if current and len(current) + 1 + len(sentence) > limit:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 class GoogleTextToSpeechService:
     def __init__(self):
         self.api_key = os.environ.get('GOOGLE_API_KEY')
@@ -32,6 +91,126 @@ class GoogleTextToSpeechService:
             'pitch': 0.0,              # Normal pitch
             'volumeGainDb': 0.0        # Normal volume
         }
+        
+        # One synthesis at a time per narration (several players reading the same entry)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _cache_key(self, text, voice_type, rate, pitch):
+        voice_type = voice_type if voice_type in self.voice_configs else 'female'
+        return audio_key(text.strip(), voice_type,
+                         max(0.25, min(4.0, float(rate))), max(-20.0, min(20.0, float(pitch))))
+
+    def _acquire_key(self, key):
+        """In-flight entry of a narration, shared until its last holder releases it"""
+        with self._inflight_lock:
+            entry = self._inflight.get(key)
+            if entry is None:
+                entry = self._inflight[key] = {'lock': threading.Lock(), 'holders': 0, 'error': None}
+            entry['holders'] += 1
+            return entry
+
+    def _release_key(self, key, entry):
+        with self._inflight_lock:
+            entry['holders'] -= 1
+            if entry['holders'] == 0 and self._inflight.get(key) is entry:
+                del self._inflight[key]
+
+    def audio_path(self, key):
+        """Path of a cached narration (see audio_cache), None if absent"""
+        return audio_cache.get(key)
+
+    def presynthesize(self, text, voice_type='female', rate=1.0, pitch=0.0):
+        """Synthesize text ahead of time so the first client asking for it is served from the cache"""
+        if not self.api_key or not text or not text.strip():
+            return None
+        result = self.prepare_speech(text, voice_type, rate, pitch)
+        if result.get('chunks'):
+            # Synthesize every chunk now and store the full narration
+            stream = self.stream_speech(result['audio_key'])
+            if stream is not None:
+                for _ in stream:
+                    pass
+        return result
+
+    def prepare_speech(self, text, voice_type='female', rate=1.0, pitch=0.0):
+        """
+        Synthesize short texts at once; for long texts, store the sentence plan
+        and start the first chunks. In both cases the MP3 is then served by
+        /speech/<audio_key>.mp3 (streamed chunk by chunk for long texts).
+        """
+        if not self.api_key:
+            return {'error': 'Google API key not configured'}
+        if not text or not text.strip():
+            return {'error': 'No text provided'}
+
+        clean_text = text.strip()
+        chunks = split_sentences(clean_text)
+        if len(clean_text) <= TTS_CONFIG['CHUNK_THRESHOLD'] or len(chunks) == 1:
+            return self.synthesize_speech(clean_text, voice_type, rate, pitch)
+
+        key = self._cache_key(clean_text, voice_type, rate, pitch)
+        result = {
+            'success': True,
+            'audio_key': key,
+            'audio_format': 'mp3',
+            'text_length': len(clean_text),
+            'cached': True
+        }
+        if audio_cache.get(key):
+            cache_requests_total.inc('audio', 'hit')
+            return result
+        cache_requests_total.inc('audio', 'miss')
+
+        audio_cache.put_plan(key, {'voice_type': voice_type, 'rate': rate,
+                                   'pitch': pitch, 'chunks': chunks})
+        # The first chunks are ready by the time the client opens the stream
+        for chunk in chunks[:TTS_CONFIG['MAX_PARALLEL']]:
+            tts_executor.submit(self.synthesize_speech, chunk, voice_type, rate, pitch)
+        return dict(result, cached=False, chunks=len(chunks))
+
+    def stream_speech(self, key):
+        """
+        Generator of the MP3 segments of a chunked narration, in order, with at
+        most MAX_PARALLEL chunks synthesized ahead. Once every chunk is done the
+        whole narration is stored under key. None if there is no plan for key.
+        """
+        plan = audio_cache.get_plan(key)
+        if plan is None:
+            return None
+
+        def generate():
+            chunks = deque(plan['chunks'])
+            pending = deque()
+            parts = []
+            complete = True
+
+            def submit_next():
+                if chunks:
+                    pending.append(tts_executor.submit(
+                        self.synthesize_speech, chunks.popleft(),
+                        plan['voice_type'], plan['rate'], plan['pitch']))
+
+            for _ in range(TTS_CONFIG['MAX_PARALLEL']):
+                submit_next()
+            while pending:
+                result = pending.popleft().result()
+                submit_next()
+                path = audio_cache.get(result['audio_key']) if result.get('success') else None
+                if path is None:
+                    logging.error(f"TTS chunk failed for narration {key}: {result.get('error')}")
+                    complete = False
+                    continue
+                with open(path, 'rb') as f:
+                    part = f.read()
+                parts.append(part)
+                yield part
+
+            if complete:
+                audio_cache.put(key, b''.join(parts))
+                audio_cache.remove_plan(key)
+
+        return generate()
 
     def synthesize_speech(self, text, voice_type='female', rate=1.0, pitch=0.0):
         """
@@ -44,7 +223,7 @@ class GoogleTextToSpeechService:
             pitch (float): Pitch adjustment (-20.0 to 20.0)
             
         Returns:
-            dict: Response with audio data or error
+            dict: audio_key of the MP3 stored in audio_cache, or error
         """
         if not self.api_key:
             return {'error': 'Google API key not configured'}
@@ -52,11 +231,38 @@ class GoogleTextToSpeechService:
         if not text or not text.strip():
             return {'error': 'No text provided'}
         
+        key = self._cache_key(text, voice_type, rate, pitch)
+        entry = self._acquire_key(key)
+        try:
+            with entry['lock']:
+                if entry['error'] is not None:
+                    # Failed while we waited: the waiters share the error instead of retrying
+                    return entry['error']
+                if audio_cache.get(key):
+                    cache_requests_total.inc('audio', 'hit')
+                    return {
+                        'success': True,
+                        'audio_key': key,
+                        'audio_format': 'mp3',
+                        'text_length': len(text.strip()),
+                        'cached': True
+                    }
+                cache_requests_total.inc('audio', 'miss')
+                result = self._synthesize(key, text, voice_type, rate, pitch)
+                if 'error' in result:
+                    errors_total.inc('google_tts')
+                    entry['error'] = result
+                return result
+        finally:
+            self._release_key(key, entry)
+
+    def _synthesize(self, key, text, voice_type, rate, pitch):
+        """Call the API and store the MP3 under key"""
         try:
             # Clean text for speech synthesis
             clean_text = text.strip()
-            if len(clean_text) > 5000:  # Google API limit is 5000 characters
-                clean_text = clean_text[:4997] + "..."
+            if len(clean_text) > TTS_CONFIG['API_MAX_CHARS']:  # Long texts go through prepare_speech
+                clean_text = clean_text[:TTS_CONFIG['API_MAX_CHARS'] - 3] + "..."
             
             # Prepare voice configuration
             voice_config = self.voice_configs.get(voice_type, self.voice_configs['female'])
@@ -74,12 +280,13 @@ class GoogleTextToSpeechService:
             }
             
             # Make API request
-            response = requests.post(
-                f"{self.base_url}?key={self.api_key}",
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            with external_call_seconds.time('google_tts'):
+                response = requests.post(
+                    f"{self.base_url}?key={self.api_key}",
+                    headers={'Content-Type': 'application/json'},
+                    json=payload,
+                    timeout=30
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -87,11 +294,13 @@ class GoogleTextToSpeechService:
                 
                 if audio_content:
                     logging.info(f"Google TTS synthesis successful for text: {clean_text[:50]}...")
+                    audio_cache.put(key, base64.b64decode(audio_content))
                     return {
                         'success': True,
-                        'audio_content': audio_content,
+                        'audio_key': key,
                         'audio_format': 'mp3',
-                        'text_length': len(clean_text)
+                        'text_length': len(clean_text),
+                        'cached': False
                     }
                 else:
                     return {'error': 'No audio content in response'}
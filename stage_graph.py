@@ -0,0 +1,114 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Threads partagés par les étapes de toutes les cartes en cours
+STAGE_CONFIG = {
+    'MAX_WORKERS': 16
+}
+
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_CONFIG['MAX_WORKERS'],
+                                    thread_name_prefix='play-stage')
+
+
+class StageFailed(Exception):
+    """Raised by StageGraph.run when a required stage failed or was skipped"""
+
+    def __init__(self, stage_name: str, error: Optional[BaseException]):
+        super().__init__(f"Stage {stage_name} failed: {error}")
+        self.stage_name = stage_name
+        self.error = error
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, deps: Iterable[str],
+                 background: bool, required: bool):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.background = background
+        self.required = required
+
+
+class StageGraph:
+    """
+    A small dependency graph of play stages.
+    Each stage starts as soon as its dependencies are done and receives their
+    results as keyword arguments. run() returns once every foreground stage is
+    finished; background stages keep running on the executor and may only
+    depend on foreground stages. A stage whose dependency failed is skipped.
+    """
+
+    def __init__(self, job=None, executor: ThreadPoolExecutor = stage_executor):
+        self._stages: "OrderedDict[str, Stage]" = OrderedDict()
+        self._job = job
+        self._executor = executor
+
+    def add(self, name: str, func: Callable, deps: Iterable[str] = (),
+            background: bool = False, required: bool = False) -> "StageGraph":
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Unknown dependency {dep} for stage {name}")
+            if background and self._stages[dep].background:
+                raise ValueError(f"Background stage {name} cannot depend on background stage {dep}")
+        self._stages[name] = Stage(name, func, deps, background, required)
+        return self
+
+    def _call(self, stage: Stage, kwargs: Dict):
+        if self._job is None:
+            return stage.func(**kwargs)
+        with self._job.stage(stage.name):
+            return stage.func(**kwargs)
+
+    def run(self) -> Dict:
+        """Execute the graph and return the results of the finished stages"""
+        results: Dict = {}
+        failed: Dict[str, Optional[BaseException]] = {}
+        pending = OrderedDict(self._stages)
+        running = {}
+
+        def foreground_left():
+            return any(not stage.background for stage in pending.values()) or any(
+                not stage.background for stage in running.values())
+
+        while foreground_left():
+            # Start or skip every stage whose dependencies are resolved
+            for name, stage in list(pending.items()):
+                if any(dep in failed for dep in stage.deps):
+                    failed[name] = None
+                    del pending[name]
+                    logger.info(f"Stage {name} skipped (dependency failed)")
+                elif all(dep in results for dep in stage.deps):
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    running[self._executor.submit(self._call, stage, kwargs)] = stage
+                    del pending[name]
+
+            foreground = [future for future, stage in running.items() if not stage.background]
+            if not foreground:
+                # Only background stages are running: wait for the one that unblocks the rest
+                if not running:
+                    break
+                foreground = list(running)
+            done, _ = wait(foreground, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[stage.name] = future.result()
+                else:
+                    failed[stage.name] = error
+                    logger.error(f"Stage {stage.name} failed: {error}")
+
+        # Background stages unblocked by the last foreground results
+        for name, stage in pending.items():
+            if all(dep in results for dep in stage.deps):
+                kwargs = {dep: results[dep] for dep in stage.deps}
+                self._executor.submit(self._call, stage, kwargs)
+
+        for name, error in failed.items():
+            if self._stages[name].required:
+                raise StageFailed(name, error)
+        return results
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stockage de l'état des salles : 'memory' (un seul worker) ou 'sqlite' (partagé par tous les workers)
+STATE_BACKEND_CONFIG = {
+    'BACKEND': os.getenv('STATE_BACKEND', 'memory'),
+    'PATH': os.getenv('STATE_DB', os.path.join('data', 'state.db')),
+    'POLL_INTERVAL': 0.5,  # Les connexions en attente vérifient la version partagée à cet intervalle
+    'PRESENCE_INTERVAL': 1.0,  # Écriture de la présence d'un joueur au plus toutes les secondes
+    'CONNECTION_LEASE': 20.0,  # Un joueur connecté à un autre worker reste actif ce temps (> STREAM_HEARTBEAT)
+    'BUSY_TIMEOUT': 5.0
+}
+
+
+class StateConflictError(RuntimeError):
+    """The state of a room was changed outside room.lock while another worker committed"""
+
+
+class MemoryBackend:
+    """Room state lives in this process only (single gunicorn worker)"""
+
+    shared = False
+    poll_interval: Optional[float] = None
+
+    def room_lock(self, room):
+        return threading.RLock()
+
+    def changed_elsewhere(self, room) -> bool:
+        return False
+
+    def stats(self) -> Dict:
+        return {'backend': 'memory'}
+
+
+class SharedRoomLock:
+    """
+    Re-entrant lock of a room across threads and processes. The outermost
+    acquire takes an exclusive flock on the room, then loads the state
+    committed by other workers if its version moved; the outermost release
+    writes the state back if this process changed it. Every section under
+    room.lock is thus an atomic read-modify-write of the shared state, and a
+    state changed outside room.lock makes the next acquire raise
+    StateConflictError if another worker committed meanwhile.
+    """
+
+    def __init__(self, backend: 'SQLiteBackend', room):
+        self.backend = backend
+        self.room = room
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = None
+        # Shared version the local state was loaded from or written at
+        self.synced_version: Optional[int] = None
+        # Last presence written per player (epoch seconds)
+        self.presence_written: Dict[str, float] = {}
+
+    def acquire(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                self._lock_file = open(self.backend.lock_path(self.room.room_id), 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self.backend.sync(self.room, self)
+            except BaseException:
+                self._unlock_file()
+                self._depth -= 1
+                self._lock.release()
+                raise
+        return True
+
+    def release(self):
+        try:
+            if self._depth == 1:
+                try:
+                    self.backend.commit(self.room, self)
+                finally:
+                    self._unlock_file()
+        finally:
+            self._depth -= 1
+            self._lock.release()
+
+    def _unlock_file(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # Closing releases the flock
+            self._lock_file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SQLiteBackend:
+    """
+    Room states shared by every worker through one SQLite database in WAL mode
+    (concurrent readers, one writer). A room is a row (version, JSON state);
+    player presence is a separate table written at most every
+    PRESENCE_INTERVAL per player, so /refresh polling does not rewrite the story.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = STATE_BACKEND_CONFIG['PATH'],
+                 poll_interval: float = STATE_BACKEND_CONFIG['POLL_INTERVAL']):
+        self.path = os.path.abspath(path)
+        self.lock_dir = f"{self.path}.locks"
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.loads = 0
+        self.commits = 0
+        with self._connection() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS rooms (
+                room_id TEXT PRIMARY KEY, version INTEGER NOT NULL,
+                state TEXT NOT NULL, updated_at REAL NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS presence (
+                room_id TEXT NOT NULL, player TEXT NOT NULL, role TEXT NOT NULL,
+                last_seen REAL NOT NULL, PRIMARY KEY (room_id, player))""")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=STATE_BACKEND_CONFIG['BUSY_TIMEOUT'],
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def lock_path(self, room_id: str) -> str:
+        return os.path.join(self.lock_dir, f"{room_id}.lock")
+
+    def room_lock(self, room) -> SharedRoomLock:
+        return SharedRoomLock(self, room)
+
+    def version(self, room_id: str) -> Optional[int]:
+        """Cheap read of the shared version (no lock, no state)"""
+        row = self._connection().execute(
+            "SELECT version FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return row[0] if row else None
+
+    def changed_elsewhere(self, room) -> bool:
+        """True when another worker committed a state this process has not loaded"""
+        version = self.version(room.room_id)
+        return version is not None and version != room.lock.synced_version
+
+    def sync(self, room, lock: SharedRoomLock):
+        """
+        Load the shared state if it moved, then merge the presence of other workers.
+        Local changes made outside room.lock cannot be merged with it: the shared
+        state is loaded anyway (the room stays usable) and StateConflictError is raised.
+        """
+        state = room.state
+        db = self._connection()
+        row = db.execute(
+            "SELECT version, state FROM rooms WHERE room_id = ? AND version IS NOT ?",
+            (room.room_id, lock.synced_version)).fetchone()
+        if row:
+            version, data = row
+            conflict = lock.synced_version is not None and state.version != lock.synced_version
+            state.load_shared(json.loads(data), version)
+            lock.synced_version = version
+            self.loads += 1
+            if conflict:
+                logger.error(f"Salle {room.room_id}: modifications locales hors verrou perdues "
+                             f"(version partagée {version})")
+                raise StateConflictError(f"Salle {room.room_id} modifiée hors verrou")
+
+        cutoff = time.time() - STATE_BACKEND_CONFIG['CONNECTION_LEASE']
+        for player, role, last_seen in db.execute(
+                "SELECT player, role, last_seen FROM presence WHERE room_id = ? AND last_seen > ?",
+                (room.room_id, cutoff)):
+            current = state.active_players.get(player)
+            if current is None or current['last_seen'].timestamp() < last_seen:
+                state.active_players[player] = {
+                    'role': role,
+                    'last_seen': datetime.fromtimestamp(last_seen)
+                }
+
+    def commit(self, room, lock: SharedRoomLock):
+        """Write the state if this process changed it, and the presence of its players"""
+        state = room.state
+        db = self._connection()
+        now = time.time()
+        presence = []
+        for player, info in list(state.active_players.items()):
+            last_seen = info['last_seen'].timestamp()
+            if player in state.connected_players:
+                # Open connection here: other workers keep the player active meanwhile
+                last_seen = max(last_seen, now + STATE_BACKEND_CONFIG['CONNECTION_LEASE'])
+            if last_seen - lock.presence_written.get(player, 0) >= STATE_BACKEND_CONFIG['PRESENCE_INTERVAL']:
+                presence.append((room.room_id, player, info['role'], last_seen))
+
+        dirty = state.version != lock.synced_version
+        if not dirty and not presence:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if dirty:
+                db.execute(
+                    "INSERT INTO rooms (room_id, version, state, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(room_id) DO UPDATE SET version = excluded.version, "
+                    "state = excluded.state, updated_at = excluded.updated_at",
+                    (room.room_id, state.version,
+                     json.dumps(state.to_shared(), ensure_ascii=False, default=str), now))
+            if presence:
+                db.executemany(
+                    "INSERT INTO presence (room_id, player, role, last_seen) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(room_id, player) DO UPDATE SET role = excluded.role, "
+                    "last_seen = MAX(last_seen, excluded.last_seen)",
+                    presence)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if dirty:
+            lock.synced_version = state.version
+            self.commits += 1
+        for _, player, _, last_seen in presence:
+            lock.presence_written[player] = last_seen
+
+    def stats(self) -> Dict:
+        row = self._connection().execute("SELECT COUNT(*) FROM rooms").fetchone()
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'rooms': row[0],
+            'loads': self.loads,
+            'commits': self.commits
+        }
+
+
+def create_backend(name: str = STATE_BACKEND_CONFIG['BACKEND']):
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name != 'memory':
+        logger.warning(f"STATE_BACKEND inconnu: {name}, état gardé en mémoire")
+    return MemoryBackend()
+
+
+# Global backend
+state_backend = create_backend()
@@ -7,6 +7,9 @@ var gameState = {
     availableCards: null,
     playedCards: [],
     refreshInterval: null,
+    // Last state received from /refresh and its version (delta protocol)
+    stateVersion: null,
+    serverState: null,
     // Interface state persistence
     interfaceState: {
         currentView: 'range-selection', // 'range-selection', 'number-selection', 'special-cards-selection', 'suppression-target-selection'
@@ -28,9 +31,27 @@ var availableVoices = [];
 
 // Configuration
 var CONFIG = {
-    REFRESH_INTERVAL: 500
+    REFRESH_INTERVAL: 500,
+    LONG_POLL_WAIT: 25,        // Seconds the server may hold a long-polling /refresh
+    STREAM_MAX_FAILURES: 3     // SSE errors in a row before switching to long-polling
 };
 
+// Game room (table) selected with ?room=<id> in the page URL
+var ROOM_ID = new URLSearchParams(window.location.search).get('room') || '';
+
+function roomUrl(path, params) {
+    var query = [];
+    if (ROOM_ID) {
+        query.push('room=' + encodeURIComponent(ROOM_ID));
+    }
+    for (var key in params || {}) {
+        if (params[key] !== null && params[key] !== undefined && params[key] !== '') {
+            query.push(encodeURIComponent(key) + '=' + encodeURIComponent(params[key]));
+        }
+    }
+    return query.length ? path + '?' + query.join('&') : path;
+}
+
 // DOM elements
 var playerNameInput;
 var playerRoleSelect;
@@ -272,7 +293,7 @@ function handleCardPlay() {
     console.log('Sending card play request...');
     
     var xhr = new XMLHttpRequest();
-    xhr.open('POST', '/envoyer', true);
+    xhr.open('POST', roomUrl('/envoyer'), true);
     xhr.setRequestHeader('Content-Type', 'application/json');
     
     xhr.onreadystatechange = function() {
@@ -283,8 +304,10 @@ function handleCardPlay() {
             try {
                 var data = JSON.parse(xhr.responseText);
                 
-                if (xhr.status === 200) {
-                    console.log('Card played successfully!');
+                if (xhr.status === 200 || xhr.status === 202) {
+                    // The play runs in the background: progress arrives with state updates
+                    console.log('Card play accepted, job:', data.job_id);
+                    gameState.pendingJobId = data.job_id;
                     cardNumberInput.value = '';
                     hideWaitingMessage();
                     showCardSelectionInterface();
@@ -399,23 +422,26 @@ function showRoleDescription() {
     }
 }
 
-function refreshGameState() {
+// wait: seconds the server may hold the request (long-polling), done(ok): completion callback
+function refreshGameState(wait, done) {
     var xhr = new XMLHttpRequest();
-    xhr.open('POST', '/refresh', true);
+    xhr.open('POST', roomUrl('/refresh'), true);
     xhr.setRequestHeader('Content-Type', 'application/json');
     
     xhr.onreadystatechange = function() {
         if (xhr.readyState === 4) {
+            var ok = false;
             try {
                 if (xhr.status === 200 && xhr.responseText) {
-                    var data = JSON.parse(xhr.responseText);
-                    updateGameDisplay(data);
+                    handleStateUpdate(JSON.parse(xhr.responseText));
+                    ok = true;
                 } else if (xhr.status !== 200) {
                     console.error('Error refreshing game state:', xhr.status);
                 }
             } catch (error) {
                 console.error('Error parsing refresh response:', error, xhr.responseText);
             }
+            if (done) done(ok);
         }
     };
     
@@ -423,17 +449,60 @@ function refreshGameState() {
         console.error('Error refreshing game state');
     };
     
+    var payload = {};
+    if (wait) {
+        payload.wait = wait;
+    }
     if (gameState.playerName && gameState.playerRole) {
-        xhr.send(JSON.stringify({
-            player_name: gameState.playerName,
-            player_role: gameState.playerRole
-        }));
-    } else {
-        xhr.send(JSON.stringify({}));
+        payload.player_name = gameState.playerName;
+        payload.player_role = gameState.playerRole;
+    }
+    if (gameState.stateVersion !== null) {
+        payload.since = gameState.stateVersion;
+    }
+    xhr.send(JSON.stringify(payload));
+}
+
+function handleStateUpdate(data) {
+    if (!data.not_modified) {
+        var storyChanged = applyStateDelta(data);
+        updateGameDisplay(gameState.serverState, storyChanged);
     }
 }
 
-function updateGameDisplay(data) {
+// Merge a /refresh delta into the cached server state.
+// Returns true when the story changed.
+function applyStateDelta(data) {
+    var state = data.full || !gameState.serverState ? {} : gameState.serverState;
+    var storyChanged = false;
+    
+    if (data.story) {
+        state.story = data.story;
+        storyChanged = true;
+    } else if (data.story_changes) {
+        var story = (state.story || []).slice(0, data.story_length);
+        for (var i = 0; i < data.story_changes.length; i++) {
+            var change = data.story_changes[i];
+            story[change.index] = change.entry;
+        }
+        state.story = story;
+        storyChanged = true;
+    }
+    
+    for (var key in data) {
+        if (key === 'story' || key === 'story_changes' || key === 'story_length' ||
+            key === 'version' || key === 'full') {
+            continue;
+        }
+        state[key] = data[key];
+    }
+    
+    gameState.serverState = state;
+    gameState.stateVersion = data.version;
+    return storyChanged;
+}
+
+function updateGameDisplay(data, storyChanged) {
     if (currentScoreSpan) currentScoreSpan.textContent = data.score;
     
     var playedCount = data.played_cards.length;
@@ -446,7 +515,9 @@ function updateGameDisplay(data) {
     
     gameState.playedCards = data.played_cards;
     
-    updateStoryDisplay(data.story);
+    if (storyChanged !== false) {
+        updateStoryDisplay(data.story);
+    }
     updateActivePlayersDisplay(data.active_players);
     
     var playersCountSpan = document.getElementById('players-count');
@@ -455,7 +526,15 @@ function updateGameDisplay(data) {
     }
     
     updateAvailableCardsDisplay(data.played_cards);
-    updateProcessingState(data.processing_player, data.processing_card);
+    updateProcessingState(data.processing_player, data.processing_card, data.processing_job,
+                          data.streaming_text);
+    
+    // Report a failure of our own background play
+    if (data.last_play_error && gameState.pendingJobId &&
+        data.last_play_error.job_id === gameState.pendingJobId) {
+        gameState.pendingJobId = null;
+        alert(data.last_play_error.error || 'Erreur lors du jeu de la carte');
+    }
     updateButtonForScore(data.score, data.game_ended);
     
     // Only restore interface state if not processing
@@ -531,6 +610,15 @@ function updateStoryDisplay(story) {
                              'onclick="window.open(\'' + linkUrl + '\', \'_blank\')">' +
                     '</a>' +
                 '</div>';
+        } else if (entry.image_pending) {
+            // L'image arrive plus tard avec une mise à jour de l'entrée
+            imageElement =
+                '<div class="story-image">' +
+                    '<div class="d-flex align-items-center justify-content-center text-muted small" ' +
+                         'style="width: 100%; height: 120px; border: 2px dashed var(--border-color);">' +
+                        '<i class="fas fa-spinner fa-spin me-2"></i>Image en cours de génération...' +
+                    '</div>' +
+                '</div>';
         }
 
         // Clean text for speech function call (escape quotes)
@@ -881,7 +969,7 @@ function getCurrentPlayedCards() {
 // Other Functions
 function loadAvailableCards() {
     var xhr = new XMLHttpRequest();
-    xhr.open('GET', '/cards', true);
+    xhr.open('GET', roomUrl('/cards'), true);
     
     xhr.onreadystatechange = function() {
         if (xhr.readyState === 4) {
@@ -902,22 +990,97 @@ function loadAvailableCards() {
     xhr.send();
 }
 
+// Start receiving state updates: Server-Sent Events when available,
+// long-polling /refresh otherwise
 function startRefreshInterval() {
     if (gameState.playerName && gameState.playerRole) {
-        var randomOffset = Math.random() * 100;
-        var interval = CONFIG.REFRESH_INTERVAL + randomOffset;
-        gameState.refreshInterval = setInterval(refreshGameState, interval);
+        stopRefreshInterval();
+        if (window.EventSource && !gameState.streamUnavailable) {
+            startStateStream();
+        } else {
+            startLongPolling();
+        }
     }
 }
 
 function stopRefreshInterval() {
-    if (gameState.refreshInterval) {
-        clearInterval(gameState.refreshInterval);
+    var channel = gameState.refreshInterval;
+    if (channel) {
+        channel.active = false;
+        if (channel.source) {
+            channel.source.close();
+        }
         gameState.refreshInterval = null;
     }
 }
 
-function updateProcessingState(processingPlayer, processingCard) {
+function startStateStream() {
+    var source = new EventSource(roomUrl('/stream', {
+        player_name: gameState.playerName,
+        player_role: gameState.playerRole,
+        since: gameState.stateVersion
+    }));
+    var channel = { type: 'stream', active: true, source: source, failures: 0 };
+    gameState.refreshInterval = channel;
+    
+    source.addEventListener('state', function(event) {
+        channel.failures = 0;
+        try {
+            handleStateUpdate(JSON.parse(event.data));
+        } catch (error) {
+            console.error('Error parsing stream event:', error, event.data);
+        }
+    });
+    
+    source.onerror = function() {
+        channel.failures++;
+        if (channel.active && channel.failures >= CONFIG.STREAM_MAX_FAILURES) {
+            console.warn('SSE stream unavailable, falling back to long-polling');
+            gameState.streamUnavailable = true;
+            stopRefreshInterval();
+            startLongPolling();
+        }
+    };
+}
+
+function startLongPolling() {
+    var channel = { type: 'long-poll', active: true };
+    gameState.refreshInterval = channel;
+    
+    function poll() {
+        if (!channel.active) return;
+        refreshGameState(CONFIG.LONG_POLL_WAIT, function(ok) {
+            if (!channel.active) return;
+            // Back off a little after an error instead of hammering the server
+            setTimeout(poll, ok ? 0 : CONFIG.REFRESH_INTERVAL * 4);
+        });
+    }
+    poll();
+}
+
+// Labels of the background play stages
+var STAGE_LABELS = {
+    story: 'Récit',
+    image_prompt: 'Description de l\'image',
+    image: 'Image',
+    commit: 'Enregistrement',
+    conclusion: 'Conclusion',
+    inversion: 'Inversion',
+    suppression: 'Suppression'
+};
+
+function formatProcessingStages(processingJob) {
+    if (!processingJob || !processingJob.stages) return '';
+    var parts = [];
+    for (var i = 0; i < processingJob.stages.length; i++) {
+        var stage = processingJob.stages[i];
+        var icon = stage.status === 'done' ? '✓' : (stage.status === 'failed' ? '✗' : '…');
+        parts.push((STAGE_LABELS[stage.name] || stage.name) + ' ' + icon);
+    }
+    return parts.length ? '<div class="small mt-1">' + parts.join(' · ') + '</div>' : '';
+}
+
+function updateProcessingState(processingPlayer, processingCard, processingJob, streamingText) {
     var processingDiv = document.getElementById('processing-status');
     if (!processingDiv) {
         processingDiv = document.createElement('div');
@@ -938,7 +1101,15 @@ function updateProcessingState(processingPlayer, processingCard) {
                     '<span class="visually-hidden">Loading...</span>' +
                 '</div>' +
                 '<span><strong>' + processingPlayer + '</strong> joue la carte <strong>' + processingCard + '</strong>... Traitement en cours</span>' +
-            '</div>';
+            '</div>' +
+            formatProcessingStages(processingJob);
+        // Story text as Mistral writes it
+        if (streamingText && streamingText.text) {
+            var partial = document.createElement('p');
+            partial.className = 'streaming-text fst-italic mb-0 mt-2';
+            partial.textContent = streamingText.text;
+            processingDiv.appendChild(partial);
+        }
         processingDiv.style.display = 'block';
         hideCardSelectionInterface();
     } else {
@@ -982,7 +1153,7 @@ function updateButtonForScore(score, gameEnded) {
 
 function resetGame() {
     var xhr = new XMLHttpRequest();
-    xhr.open('POST', '/reset', true);
+    xhr.open('POST', roomUrl('/reset'), true);
     xhr.setRequestHeader('Content-Type', 'application/json');
     
     xhr.onreadystatechange = function() {
@@ -1009,7 +1180,7 @@ function resetGame() {
 
 function saveGame() {
     var xhr = new XMLHttpRequest();
-    xhr.open('POST', '/sauver', true);
+    xhr.open('POST', roomUrl('/sauver'), true);
     xhr.setRequestHeader('Content-Type', 'application/json');
     
     xhr.onreadystatechange = function() {
@@ -1228,9 +1399,9 @@ function speakText(text) {
             if (xhr.status === 200) {
                 try {
                     var response = JSON.parse(xhr.responseText);
-                    if (response.success && response.audio_content) {
-                        console.log('✓ Google TTS synthesis successful');
-                        playAudioFromBase64(response.audio_content, response.audio_format);
+                    if (response.success && response.audio_url) {
+                        console.log('✓ Google TTS synthesis successful' + (response.cached ? ' (cache)' : ''));
+                        playAudioFromUrl(response.audio_url);
                     } else {
                         console.error('✗ TTS API error:', response.error || 'Unknown error');
                         alert('Erreur de synthèse vocale: ' + (response.error || 'Erreur inconnue'));
@@ -1260,19 +1431,9 @@ function speakText(text) {
     xhr.send(JSON.stringify(requestData));
 }
 
-function playAudioFromBase64(audioBase64, format) {
+function playAudioFromUrl(audioUrl) {
     try {
-        // Create audio blob from base64
-        var binaryString = atob(audioBase64);
-        var bytes = new Uint8Array(binaryString.length);
-        for (var i = 0; i < binaryString.length; i++) {
-            bytes[i] = binaryString.charCodeAt(i);
-        }
-        
-        var blob = new Blob([bytes], { type: 'audio/' + format });
-        var audioUrl = URL.createObjectURL(blob);
-        
-        // Create and play audio element
+        // Le MP3 est lu en flux depuis le serveur (cache HTTP, requêtes Range)
         currentAudio = new Audio(audioUrl);
         
         currentAudio.onloadstart = function() {
@@ -1290,7 +1451,6 @@ function playAudioFromBase64(audioBase64, format) {
         currentAudio.onended = function() {
             console.log('✓ Audio playback ended');
             updateSpeechButtons(false);
-            URL.revokeObjectURL(audioUrl);
             currentAudio = null;
         };
         
@@ -1298,7 +1458,6 @@ function playAudioFromBase64(audioBase64, format) {
             console.error('✗ Audio playback error:', e);
             alert('Erreur lors de la lecture audio');
             updateSpeechButtons(false);
-            URL.revokeObjectURL(audioUrl);
             currentAudio = null;
         };
         
@@ -1310,7 +1469,7 @@ function playAudioFromBase64(audioBase64, format) {
         });
         
     } catch (error) {
-        console.error('✗ Error creating audio from base64:', error);
+        console.error('✗ Error creating audio:', error);
         alert('Erreur lors de la création de l\'audio');
         updateSpeechButtons(false);
     }
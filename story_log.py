@@ -0,0 +1,141 @@
+import uuid
+import itertools
+from typing import Dict, Iterable, List, Optional, Set
+
+from narrative_context import entry_tokens
+
+# Revisions are unique across StoryLog instances (a reset story never reuses one)
+_revisions = itertools.count(1)
+
+
+def new_entry_id() -> str:
+    """Stable identifier of a story entry (kept across reorders and deletions)"""
+    return uuid.uuid4().hex[:12]
+
+
+def entry_card_number(entry: Dict) -> Optional[int]:
+    """Number of the card an entry was written for, None for narrator entries"""
+    card = entry.get('card')
+    if not card:
+        return None
+    try:
+        return int(card.get('numero'))
+    except (TypeError, ValueError):
+        return None
+
+
+class StoryLog(list):
+    """
+    The story of a game: a list of entry dicts (still JSON-serializable as is)
+    with stable entry ids, an index card number -> position, the special cards
+    played by each player, a cached history string and per-entry token counts.
+    Appends are indexed incrementally; rarer mutations (delete, reorder,
+    rewrite) rebuild the indexes and change `revision`, so the entries before
+    the end are unchanged as long as the revision is.
+    """
+
+    def __init__(self, entries: Iterable[Dict] = (),
+                 special_cards: Optional[Dict[str, Set[int]]] = None):
+        super().__init__()
+        self._by_id: Dict[str, int] = {}
+        self._by_card: Dict[int, int] = {}
+        self._history: Optional[str] = ""
+        self._tokens: List[int] = []
+        self._token_total = 0
+        self.revision = next(_revisions)
+        # Special cards (100, 101) already played by each player in this game
+        self.special_cards: Dict[str, Set[int]] = special_cards if special_cards is not None else {}
+        for entry in entries:
+            self.append(entry)
+
+    def _index_entry(self, position: int, entry: Dict):
+        if not entry.get('id'):
+            entry['id'] = new_entry_id()
+        self._by_id[entry['id']] = position
+        number = entry_card_number(entry)
+        if number is not None:
+            # First occurrence wins, like the linear search it replaces
+            self._by_card.setdefault(number, position)
+
+    def _reindex(self):
+        self._by_id.clear()
+        self._by_card.clear()
+        self._history = None
+        self._tokens = [entry_tokens(entry['text']) for entry in self]
+        self._token_total = sum(self._tokens)
+        self.revision = next(_revisions)
+        for position, entry in enumerate(self):
+            self._index_entry(position, entry)
+
+    def append(self, entry: Dict):
+        super().append(entry)
+        self._index_entry(len(self) - 1, entry)
+        tokens = entry_tokens(entry['text'])
+        self._tokens.append(tokens)
+        self._token_total += tokens
+        if self._history is not None:
+            self._history = f"{self._history} {entry['text']}" if len(self) > 1 else entry['text']
+
+    def pop(self, index: int = -1) -> Dict:
+        entry = super().pop(index)
+        self._reindex()
+        return entry
+
+    def update_entry(self, index: int, **fields):
+        """Modify fields of an entry, keeping the indexes and history in sync"""
+        entry = self[index]
+        entry.update(fields)
+        if 'text' in fields:
+            self._history = None
+            tokens = entry_tokens(entry['text'])
+            self._token_total += tokens - self._tokens[index]
+            self._tokens[index] = tokens
+            self.revision = next(_revisions)
+        if 'card' in fields or 'id' in fields:
+            self._reindex()
+
+    def position_of(self, entry_id: str) -> Optional[int]:
+        """Current position of an entry, None if it was deleted"""
+        return self._by_id.get(entry_id)
+
+    def position_of_card(self, card_number: int) -> Optional[int]:
+        """Position of the entry written for a card, None if not in the story"""
+        return self._by_card.get(card_number)
+
+    def history(self) -> str:
+        """All entry texts joined, rebuilt only after a mutation"""
+        if self._history is None:
+            self._history = " ".join(entry['text'] for entry in self)
+        return self._history
+
+    def tokens(self, index: int) -> int:
+        """Estimated tokens of one entry in the history (separator included)"""
+        return self._tokens[index]
+
+    def token_total(self) -> int:
+        """Estimated tokens of the whole history, kept up to date on every mutation"""
+        return self._token_total
+
+    def record_special_card(self, player_name: str, card_number: int):
+        self.special_cards.setdefault(player_name, set()).add(card_number)
+
+    def has_played_special(self, player_name: str, card_number: int) -> bool:
+        return card_number in self.special_cards.get(player_name, ())
+
+
+def _reindexing(name):
+    base = getattr(list, name)
+
+    def method(self, *args, **kwargs):
+        result = base(self, *args, **kwargs)
+        self._reindex()
+        return result
+
+    method.__name__ = name
+    return method
+
+
+# Any other in-place list mutation keeps the indexes consistent
+for _name in ('__setitem__', '__delitem__', '__iadd__', 'insert', 'extend', 'remove',
+              'clear', 'reverse', 'sort'):
+    setattr(StoryLog, _name, _reindexing(_name))
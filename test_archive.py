@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test de l'archive des parties (recherche, filtres, export NDJSON)
+"""
+
+import os
+import json
+import tempfile
+from datetime import datetime
+from flask import Flask
+from archive import GameArchive, game_outcome
+from game_logic import GameState
+
+
+def make_archive():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tempfile.mkdtemp()}/archive.db"
+    archive = GameArchive()
+    archive.init_app(app)
+    return app, archive
+
+
+def finished_game(player, role, text, score_delta):
+    state = GameState(room_id='table1')
+    state.score_initial = 4
+    state.score = 4 + score_delta
+    state.append_story_entry({'player': player, 'role': role, 'text': text,
+                              'card': {'numero': '9', 'mot': 'Couchant'}, 'effect': '+',
+                              'image_path': '/result/Alice_9_abc.webp'})
+    state.game_ended = True
+    return state.to_snapshot()
+
+
+def test_outcome():
+    """Victoire si le score final n'est pas inférieur au score initial"""
+    assert game_outcome(True, 4, 4) == 'victoire'
+    assert game_outcome(True, 3, 4) == 'défaite'
+    assert game_outcome(False, 0, 4) is None
+    print("✓ Issue de la partie")
+
+
+def test_archive_and_filter():
+    """Les parties archivées se filtrent par rôle, issue et carte"""
+    app, archive = make_archive()
+    won = archive.archive_state('table1', finished_game('Alice', 'Soldat', "Le soldat repousse les loups.", 1),
+                                'fin', [{'name': 'Bob', 'role': 'Moine'}])
+    lost = archive.archive_state('table1', finished_game('Alice', 'Soldat', "Les loups dévorent le village.", -2),
+                                 'fin')
+    assert won and lost
+
+    with app.app_context():
+        lost_soldiers = archive.find_games(role='Soldat', outcome='défaite')
+        assert [game.id for game in lost_soldiers.items] == [lost]
+        assert [game.id for game in archive.find_games(role='Moine').items] == [won]
+        assert archive.find_games(card=9).total == 2
+        game = archive.get_game(won).to_dict(with_entries=True)
+        assert game['entries'][1]['card_name'] == 'Couchant'
+        assert game['entries'][1]['image_path'] == '/result/Alice_9_abc.webp'
+    print("✓ Filtres sur rôle, issue et carte")
+
+
+def test_full_text_search():
+    """Recherche plein texte, insensible aux accents"""
+    app, archive = make_archive()
+    game_id = archive.archive_state('table1', finished_game('Alice', 'Soldat', "Les loups dévorent le village.", -2),
+                                    'fin')
+    with app.app_context():
+        results = archive.search('devorent')['results']
+        assert [r['game_id'] for r in results] == [game_id]
+        assert archive.search('dragon')['results'] == []
+        assert archive.search('"loups')['results']  # Syntaxe FTS5 neutralisée
+    print("✓ Recherche plein texte")
+
+
+def test_export_pages():
+    """Export NDJSON paginé par identifiant"""
+    app, archive = make_archive()
+    for i in range(5):
+        archive.archive_state(f"table{i}", finished_game('Alice', 'Soldat', f"Histoire {i}.", 0), 'sauvegarde')
+    with app.app_context():
+        first = archive.export_ids(limit=3)
+        second = archive.export_ids(after=first[-1], limit=3)
+        assert len(first) == 3 and len(second) == 2
+        lines = list(archive.export_ndjson(first))
+        assert [json.loads(line)['room'] for line in lines] == ['table0', 'table1', 'table2']
+        assert len(json.loads(lines[0])['entries']) == 2
+    print("✓ Export NDJSON")
+
+
+def test_import_saved_files():
+    """Seules les sauvegardes pas encore archivées sont importées"""
+    app, archive = make_archive()
+    directory = tempfile.mkdtemp()
+    pattern = os.path.join(directory, 'histoire_*.json')
+    archived = datetime(2024, 5, 1, 20, 15, 30, 250000)
+    archive.archive_state('table1', finished_game('Alice', 'Soldat', "Déjà archivée.", 0), 'sauvegarde',
+                          saved_at=archived)
+
+    for timestamp, room in (('20240501_201530', 'table1'), ('20240502_090000', 'table2')):
+        with open(os.path.join(directory, f"histoire_{timestamp}.json"), 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': timestamp, 'room': room, 'score': 4, 'game_ended': False,
+                       'story': [{'player': 'Bob', 'role': 'Moine', 'text': f"Sauvegarde {room}."}]}, f)
+
+    assert archive.import_saved_files(pattern) == 1
+    assert archive.import_saved_files(pattern) == 0
+    with app.app_context():
+        games = archive.find_games().items
+        assert sorted(game.room for game in games) == ['table1', 'table2']
+        assert [game.saved_at for game in games if game.room == 'table2'] == [datetime(2024, 5, 2, 9)]
+    print("✓ Import des sauvegardes")
+
+
+if __name__ == "__main__":
+    test_outcome()
+    test_archive_and_filter()
+    test_full_text_search()
+    test_export_pages()
+    test_import_saved_files()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test du cache disque des narrations
+"""
+
+import os
+import tempfile
+from audio_cache import AudioCache, audio_key, is_audio_key
+
+
+def make_cache(**kwargs):
+    return AudioCache(directory=tempfile.mkdtemp(), **kwargs)
+
+
+def test_audio_key():
+    """La clé dépend du texte, de la voix, du débit et de la hauteur"""
+    key = audio_key("Un loup hurle.", 'female', 1.0, 0.0)
+    assert is_audio_key(key)
+    assert key == audio_key("Un loup hurle.", 'female', 1.0, 0.0)
+    assert key != audio_key("Un loup hurle.", 'male', 1.0, 0.0)
+    assert key != audio_key("Un loup hurle.", 'female', 1.2, 0.0)
+    assert not is_audio_key("../secret")
+    print("✓ Clé des narrations")
+
+
+def test_put_and_get():
+    """Une narration stockée est relue depuis le disque, y compris après redémarrage"""
+    cache = make_cache()
+    key = audio_key("texte", 'female', 1.0, 0.0)
+    assert cache.get(key) is None
+    path = cache.put(key, b"ID3mp3")
+    assert cache.get(key) == path and open(path, 'rb').read() == b"ID3mp3"
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    restarted = AudioCache(directory=cache.directory)
+    assert restarted.stats()['files'] == 1 and restarted.get(key) == path
+    print("✓ Narrations relues depuis le disque")
+
+
+def test_lru_eviction():
+    """Au-delà de MAX_BYTES la narration la moins récemment lue est supprimée"""
+    cache = make_cache(max_bytes=25)
+    keys = [audio_key(f"texte {i}", 'female', 1.0, 0.0) for i in range(3)]
+    cache.put(keys[0], b"x" * 10)
+    cache.put(keys[1], b"x" * 10)
+    cache.get(keys[0])  # keys[1] devient la plus ancienne
+    cache.put(keys[2], b"x" * 10)
+
+    assert cache.get(keys[1]) is None and not os.path.exists(cache.path(keys[1]))
+    assert cache.get(keys[0]) and cache.get(keys[2])
+    assert cache.stats()['bytes'] == 20 and cache.stats()['evictions'] == 1
+    print("✓ Éviction LRU")
+
+
+if __name__ == "__main__":
+    test_audio_key()
+    test_put_and_get()
+    test_lru_eviction()
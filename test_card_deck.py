@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test du deck indexé (recherche par numéro, slugs, cartes disponibles)
+"""
+
+import json
+from card_deck import CardDeck, slugify_card_name
+from game_logic import CARD_DECK, DECK, GameState
+
+
+def test_lookup_and_slugs():
+    """Recherche par numéro entier et slug unique par carte"""
+    card = DECK.get(54)
+    assert card is not None and card['mot'] == 'Poisson'
+    assert DECK.get(999) is None
+
+    assert slugify_card_name("Épée") == "epee"
+    assert slugify_card_name("L'Arbre d'or") == "larbredor"
+    assert DECK.slug_for_name("Château") == "chateau"
+    assert DECK.slug(54) == "poisson"
+    assert DECK.has_slug("poisson") and not DECK.has_slug("inconnue")
+    print("✓ Recherche par numéro et slugs")
+
+
+def test_available_cards_bitset():
+    """Les cartes disponibles suivent le bitset des cartes jouées"""
+    deck = CardDeck(CARD_DECK)
+    all_cards = json.loads(deck.available_json(0))
+    assert len(all_cards) == len(CARD_DECK)
+
+    mask = CardDeck.mask_of([54, 24])
+    available = json.loads(deck.available_json(mask))
+    assert len(available) == len(CARD_DECK) - 2
+    assert all(c['numero'] not in ('54', '24') for c in available)
+    # Même combinaison: même réponse, sans recalcul
+    assert deck.available_json(mask) is deck.available_json(mask)
+    print("✓ Cartes disponibles par bitset")
+
+
+def test_game_state_mask():
+    """Le bitset de la partie suit les ajouts, suppressions et la remise à zéro"""
+    game_state = GameState()
+    game_state.add_played_card(12)
+    assert game_state.is_card_played(12) and not game_state.is_card_played(13)
+
+    game_state.remove_played_card(12)
+    assert not game_state.is_card_played(12)
+
+    game_state.add_played_card(5)
+    game_state.reset_game()
+    assert game_state.played_mask == 0
+    print("✓ Bitset des cartes jouées")
+
+
+if __name__ == "__main__":
+    test_lookup_and_slugs()
+    test_available_cards_bitset()
+    test_game_state_mask()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test du cache disque des images originales des cartes
+"""
+
+import tempfile
+import requests
+from card_image_cache import CardImageCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size=1):
+        yield self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+
+class FakeSession:
+    """barbason.be simulé : une image 'loup' avec ETag, le reste en 404"""
+
+    def __init__(self):
+        self.requests = []
+        self.down = False
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        if self.down:
+            raise requests.exceptions.ConnectionError("site indisponible")
+        if not url.endswith('/loup.jpg'):
+            return FakeResponse(404)
+        if (headers or {}).get('If-None-Match') == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(200, b"JPEGDATA", {'ETag': '"v1"', 'Content-Type': 'image/jpeg'})
+
+
+def make_cache(**kwargs):
+    session = FakeSession()
+    return CardImageCache(directory=tempfile.mkdtemp(), session=session, **kwargs), session
+
+
+def test_image_downloaded_once():
+    """Une image est téléchargée une fois puis servie depuis le disque"""
+    cache, session = make_cache()
+    path = cache.fetch('loup')
+    assert path and open(path, 'rb').read() == b"JPEGDATA"
+    assert cache.fetch('loup') == path
+    assert cache.exists('loup')
+    assert len(session.requests) == 1
+    assert cache.stats()['downloads'] == 1 and cache.stats()['hits'] == 2
+    print("✓ Image téléchargée une seule fois")
+
+
+def test_revalidation_with_etag():
+    """Une image périmée est revalidée par GET conditionnel"""
+    cache, session = make_cache(revalidate_after=0)
+    cache.fetch('loup')
+    assert cache.fetch('loup')
+    assert session.requests[-1][1] == {'If-None-Match': '"v1"'}
+    assert cache.stats()['revalidated'] == 1
+
+    # Les métadonnées survivent au redémarrage
+    restarted = CardImageCache(directory=cache.directory, session=session)
+    assert restarted.fetch('loup') and len(session.requests) == 2
+    print("✓ Revalidation ETag")
+
+
+def test_not_found_is_cached():
+    """Un 404 n'est demandé qu'une fois pendant NEGATIVE_TTL"""
+    cache, session = make_cache()
+    assert cache.fetch('licorne') is None
+    assert not cache.exists('licorne')
+    assert len(session.requests) == 1
+    assert cache.stats()['not_found'] == 1
+    print("✓ Cache négatif des 404")
+
+
+def test_stale_copy_when_site_down():
+    """Site indisponible : la copie locale est servie"""
+    cache, session = make_cache(revalidate_after=0)
+    path = cache.fetch('loup')
+    session.down = True
+    assert cache.fetch('loup') == path
+    assert cache.fetch('sanglier') is None
+    print("✓ Copie locale servie quand le site est indisponible")
+
+
+if __name__ == "__main__":
+    test_image_downloaded_once()
+    test_revalidation_with_etag()
+    test_not_found_is_cached()
+    test_stale_copy_when_site_down()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test de la file des cartes jouées en arrière-plan
+"""
+
+import time
+import threading
+from card_play import PlayJob, PlayJobQueue
+
+
+class FakeRoom:
+    def __init__(self, room_id):
+        self.room_id = room_id
+
+
+def test_jobs_run_in_order_per_room():
+    """Les cartes d'une salle sont traitées une par une, dans l'ordre"""
+    executed = []
+    running = {}
+    overlap = []
+    lock = threading.Lock()
+
+    def runner(room, job):
+        with lock:
+            if running.get(room.room_id):
+                overlap.append(job.id)
+            running[room.room_id] = True
+        time.sleep(0.02)
+        with lock:
+            executed.append((room.room_id, job.prompt))
+            running[room.room_id] = False
+        job.finish({'message': 'ok'})
+
+    queue = PlayJobQueue(runner, max_workers=4)
+    salle_a, salle_b = FakeRoom("a"), FakeRoom("b")
+    jobs = []
+    for i in range(3):
+        jobs.append(queue.submit(salle_a, PlayJob("a", "Joueur1", "Soldat", str(i + 1))))
+        jobs.append(queue.submit(salle_b, PlayJob("b", "Joueur2", "Moine", str(i + 10))))
+
+    deadline = time.time() + 5
+    while queue.pending_count() and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert queue.pending_count() == 0
+    assert not overlap
+    assert [p for r, p in executed if r == "a"] == ["1", "2", "3"]
+    assert [p for r, p in executed if r == "b"] == ["10", "11", "12"]
+    assert all(queue.get(job.id).status == 'done' for job in jobs)
+    print("✓ Les cartes sont traitées dans l'ordre, salle par salle")
+
+
+def test_job_stages_are_timed():
+    """Chaque étape d'un job est chronométrée"""
+    job = PlayJob("a", "Joueur1", "Soldat", "12")
+    job.start()
+    with job.stage('story'):
+        time.sleep(0.01)
+    try:
+        with job.stage('image'):
+            raise RuntimeError("Replicate indisponible")
+    except RuntimeError:
+        pass
+
+    stages = job.snapshot()['stages']
+    assert [s['name'] for s in stages] == ['story', 'image']
+    assert stages[0]['status'] == 'done' and stages[0]['duration'] >= 0.01
+    assert stages[1]['status'] == 'failed'
+    print("✓ Les étapes sont chronométrées")
+
+
+if __name__ == "__main__":
+    test_jobs_run_in_order_per_room()
+    test_job_stages_are_timed()
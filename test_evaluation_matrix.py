@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test de la matrice d'évaluation rôles x cartes
+"""
+
+import numpy as np
+from evaluation_matrix import EvaluationMatrix
+from game_logic import EVALUATIONS, evaluate_card_effect
+
+SAMPLE = {
+    'Soldat': {'1': '+', '2': '-'},
+    'Moine': {'1': '+', '3': '-'},
+    'Vide': {}
+}
+
+
+def test_effect_lookup_matches_json():
+    """La matrice donne les mêmes effets que evaluations.json"""
+    for role, role_evaluations in EVALUATIONS.items():
+        for card_number in range(1, 56):
+            assert evaluate_card_effect(card_number, role) == role_evaluations.get(str(card_number), '=')
+    # Rôle inconnu: toutes les cartes sont neutres
+    assert evaluate_card_effect(3, 'Inconnu') == '='
+    print("✓ Effets identiques à evaluations.json")
+
+
+def test_vectorized_queries():
+    """Requêtes vectorisées: comptes par carte, équilibre et corrélation"""
+    matrix = EvaluationMatrix(SAMPLE, card_numbers=[4])
+    assert matrix.matrix.dtype == np.int8
+    assert matrix.cards == [1, 2, 3, 4]
+    assert matrix.effect(4, 'Soldat') == '='
+
+    assert matrix.positive_counts().tolist() == [2, 0, 0, 0]
+    assert matrix.negative_counts().tolist() == [0, 1, 1, 0]
+    assert matrix.role_balance().tolist() == [0, 0, 0]
+
+    correlation = matrix.role_correlation()
+    assert correlation.shape == (3, 3)
+    assert abs(correlation[0, 0] - 1.0) < 1e-9
+    assert correlation[2, 2] == 0  # Rôle constant
+    print("✓ Requêtes vectorisées")
+
+
+if __name__ == "__main__":
+    test_effect_lookup_matches_json()
+    test_vectorized_queries()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test du journal d'événements et de la reprise après redémarrage
+"""
+
+import os
+import tempfile
+from event_log import EventLog
+from room_manager import RoomRegistry
+
+
+def make_registry(directory, registry_kwargs=None, **kwargs):
+    log = EventLog(directory=directory, **kwargs)
+    registry = RoomRegistry(**(registry_kwargs or {}))
+    registry.on_create = log.attach
+    registry.on_evict = log.detach
+    return log, registry
+
+
+def play_some_cards(state):
+    state.add_played_card(7)
+    state.append_story_entry({'player': 'Alice', 'role': 'Chevalier', 'text': "Alice entre dans la cave.",
+                              'card': {'numero': '7', 'mot': 'Torche'}, 'effect': '+'})
+    state.score += 1
+    state.jeu_commence = True
+    state.update_story_entry(1, text="Alice descend dans la cave.")
+    state.add_special_card({'player': 'Bob', 'role': 'Sorcier', 'card_number': 100, 'card_name': 'Inversion'})
+    state.update_player_activity('Alice', 'Chevalier')
+
+
+def test_replay_after_restart():
+    """Le journal rejoué redonne le même état"""
+    directory = tempfile.mkdtemp()
+    log, registry = make_registry(directory)
+    state = registry.get('table1').state
+    play_some_cards(state)
+    assert log.stats()['appended'] >= 6
+
+    _, restarted = make_registry(directory)
+    recovered = restarted.get('table1').state
+    assert recovered.to_snapshot() == state.to_snapshot()
+    assert recovered.story[1]['text'] == "Alice descend dans la cave."
+    assert recovered.is_card_played(7) and recovered.score == 1
+    assert recovered.story.has_played_special('Bob', 100)
+    assert 'Alice' in recovered.active_players
+    print("✓ Rejeu du journal")
+
+
+def test_snapshot_and_tail():
+    """Instantané périodique : le journal est compacté, seule la fin est rejouée"""
+    directory = tempfile.mkdtemp()
+    log, registry = make_registry(directory, snapshot_every=3)
+    state = registry.get('table1').state
+    play_some_cards(state)
+    assert log.stats()['snapshots'] >= 2
+    assert os.path.exists(log.snapshot_path('table1'))
+
+    restarted_log, restarted = make_registry(directory)
+    recovered = restarted.get('table1').state
+    assert recovered.to_snapshot() == state.to_snapshot()
+    assert restarted_log.stats()['replayed'] < 3
+    print("✓ Instantané + fin du journal")
+
+
+def test_reset_and_truncated_line():
+    """Une réinitialisation compacte le journal ; une ligne tronquée est ignorée"""
+    directory = tempfile.mkdtemp()
+    log, registry = make_registry(directory)
+    state = registry.get('table1').state
+    play_some_cards(state)
+    state.reset_game()
+    state.add_played_card(12)
+    with open(log.log_path('table1'), 'a', encoding='utf-8') as f:
+        f.write('{"seq": 99, "type": "card_pl')
+
+    _, restarted = make_registry(directory)
+    recovered = restarted.get('table1').state
+    assert len(recovered.story) == 1 and recovered.played_cards == {12}
+    assert recovered.score == state.score
+    print("✓ Réinitialisation et ligne tronquée")
+
+
+def test_recover_recent_rooms():
+    """Au démarrage, les salles récentes sont rechargées"""
+    directory = tempfile.mkdtemp()
+    _, registry = make_registry(directory)
+    registry.get('table1').state.add_played_card(3)
+    registry.get('table2').state.add_played_card(4)
+
+    log, restarted = make_registry(directory)
+    assert log.recover(restarted) == ['table1', 'table2']
+    assert restarted.peek('table2').state.is_card_played(4)
+    print("✓ Reprise des salles récentes")
+
+
+def test_evicted_rooms_are_forgotten():
+    """Une salle libérée n'est plus suivie en mémoire et se recharge au prochain accès"""
+    directory = tempfile.mkdtemp()
+    log, registry = make_registry(directory, registry_kwargs={'max_rooms': 1})
+    state = registry.get('table1').state
+    play_some_cards(state)
+    for i in range(20):
+        registry.get(f"visite-{i}")  # Jamais modifiées : seul leur état initial était gardé
+    assert log.stats()['rooms'] == 1
+    assert list(log._initial) == ['visite-19']  # Seule la salle en mémoire
+
+    recovered = registry.get('table1').state
+    assert recovered is not state
+    assert recovered.to_snapshot() == state.to_snapshot()
+    recovered.add_played_card(9)
+    _, restarted = make_registry(directory)
+    assert restarted.get('table1').state.is_card_played(9)
+    print("✓ Salles libérées oubliées puis rechargées")
+
+
+if __name__ == "__main__":
+    test_replay_after_restart()
+    test_snapshot_and_tail()
+    test_reset_and_truncated_line()
+    test_recover_recent_rooms()
+    test_evicted_rooms_are_forgotten()
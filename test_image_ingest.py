@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test de l'enregistrement des images produites par Replicate
+"""
+
+import os
+import json
+import base64
+import hashlib
+import tempfile
+from image_ingest import (IMAGE_INGEST_CONFIG, detect_image_format, ingest_image, ingest_outputs,
+                          append_generation_record, filename_part)
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+WEBP = b'RIFF\x24\x00\x00\x00WEBPVP8 ' + b'\x00' * 32
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 32
+
+
+def data_url(content):
+    return 'data:application/octet-stream;base64,' + base64.b64encode(content).decode()
+
+
+def test_detect_image_format():
+    """Le format est lu dans l'en-tête, sans décoder l'image"""
+    assert detect_image_format(JPEG[:12]) == 'jpg'
+    assert detect_image_format(PNG[:12]) == 'png'
+    assert detect_image_format(WEBP[:12]) == 'webp'
+    assert detect_image_format(b'GIF89a\x00\x00') == 'gif'
+    assert detect_image_format(b'<html>') is None
+    print("✓ Détection du format par l'en-tête")
+
+
+def test_content_hash_filename():
+    """Le fichier est nommé par le hash de son contenu, octets inchangés"""
+    result_dir = tempfile.mkdtemp()
+    image = ingest_image(data_url(WEBP), "image_Alice_card5", result_dir)
+    sha256 = hashlib.sha256(WEBP).hexdigest()
+    assert image['filename'] == os.path.join(result_dir, f"image_Alice_card5_{sha256[:16]}.webp")
+    assert open(image['filename'], 'rb').read() == WEBP
+    assert image['sha256'] == sha256 and image['bytes'] == len(WEBP)
+    # Pas de fichier temporaire restant
+    assert os.listdir(result_dir) == [os.path.basename(image['filename'])]
+    print("✓ Nom de fichier par hash du contenu")
+
+
+def test_filename_part():
+    """Le nom du joueur devient une partie de nom de fichier ASCII sûre"""
+    assert filename_part("Alice") == "Alice"
+    assert filename_part("Éloïse d'Arc") == "Eloise_d_Arc"
+    assert filename_part("../../etc/passwd") == "etc_passwd"
+    assert filename_part("龍") == "Long"
+    assert filename_part("///") == "joueur"
+    assert len(filename_part("x" * 200)) == 40
+    print("✓ Nom de joueur assaini")
+
+
+def test_invalid_outputs_are_skipped():
+    """Une sortie qui n'est pas une image est ignorée, les autres sont gardées dans l'ordre"""
+    result_dir = tempfile.mkdtemp()
+    images = ingest_outputs([data_url(JPEG), data_url(b'<html>erreur</html>'), data_url(PNG)],
+                            "image_Bob_card7", result_dir)
+    assert [image['format'] for image in images] == ['jpg', 'png']
+    assert len(os.listdir(result_dir)) == 2
+    print("✓ Sorties invalides ignorées")
+
+
+def test_generation_fails_without_images():
+    """Une génération dont aucune image n'a pu être enregistrée est un échec"""
+    import image_generator
+    original = image_generator.generer_image, image_generator.ensure_result_directory
+    original_dir = IMAGE_INGEST_CONFIG['RESULT_DIR']
+    image_generator.generer_image = lambda modele, input_data: data_url(b'<html>erreur</html>')
+    image_generator.ensure_result_directory = lambda: None
+    IMAGE_INGEST_CONFIG['RESULT_DIR'] = tempfile.mkdtemp()
+    try:
+        result = image_generator.generate_card_image("prompt", "Alice", 5, image_ref="https://exemple/ref.jpg")
+    finally:
+        image_generator.generer_image, image_generator.ensure_result_directory = original
+        IMAGE_INGEST_CONFIG['RESULT_DIR'] = original_dir
+    assert result['success'] is False and 'images' not in result
+    print("✓ Échec si aucune image")
+
+
+def test_generation_records_are_appended():
+    """Une ligne JSON compacte par génération"""
+    path = os.path.join(tempfile.mkdtemp(), 'generations.jsonl')
+    append_generation_record({'card_number': 5, 'images': []}, path)
+    append_generation_record({'card_number': 7, 'images': []}, path)
+    lines = open(path, encoding='utf-8').read().splitlines()
+    assert [json.loads(line)['card_number'] for line in lines] == [5, 7]
+    assert ' ' not in lines[0]
+    print("✓ Métadonnées en JSON Lines")
+
+
+if __name__ == "__main__":
+    test_detect_image_format()
+    test_content_hash_filename()
+    test_filename_part()
+    test_invalid_outputs_are_skipped()
+    test_generation_fails_without_images()
+    test_generation_records_are_appended()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test de la file de génération d'images
+"""
+
+import os
+import time
+import tempfile
+import threading
+from image_queue import ImageJob, ImageJobQueue
+
+
+class FakeRoom:
+    def __init__(self, room_id):
+        self.room_id = room_id
+
+
+def make_job(room_id, card_number):
+    return ImageJob(room_id, f"entree{card_number}", "Joueur1", card_number,
+                    "Loup", "Un loup hurle.", "")
+
+
+def test_jobs_run_in_order_per_room():
+    """Les images d'une salle sont générées dans l'ordre, les salles en parallèle"""
+    executed = []
+    running = {}
+    overlap = []
+    lock = threading.Lock()
+
+    def runner(room, job):
+        with lock:
+            if running.get(room.room_id):
+                overlap.append(job.id)
+            running[room.room_id] = True
+        time.sleep(0.02)
+        with lock:
+            executed.append((room.room_id, job.card_number))
+            running[room.room_id] = False
+
+    queue = ImageJobQueue(runner, max_workers=3, pending_file=os.devnull)
+    salle_a, salle_b = FakeRoom("a"), FakeRoom("b")
+    for i in range(3):
+        assert queue.submit(salle_a, make_job("a", i + 1))
+        assert queue.submit(salle_b, make_job("b", i + 10))
+
+    assert queue.wait_idle(5)
+    assert not overlap
+    assert [c for r, c in executed if r == "a"] == [1, 2, 3]
+    assert [c for r, c in executed if r == "b"] == [10, 11, 12]
+    assert queue.stats()['completed'] == 6
+    print("✓ Les images sont générées dans l'ordre, salle par salle")
+
+
+def test_queue_is_bounded():
+    """Au-delà de MAX_QUEUED les nouvelles images sont refusées"""
+    release = threading.Event()
+    queue = ImageJobQueue(lambda room, job: release.wait(5), max_workers=1,
+                          max_queued=2, pending_file=os.devnull)
+    salle = FakeRoom("a")
+    assert queue.submit(salle, make_job("a", 1))
+    time.sleep(0.05)  # La première image est en cours
+    assert queue.submit(salle, make_job("a", 2))
+    assert queue.submit(salle, make_job("a", 3))
+    assert not queue.submit(salle, make_job("a", 4))
+    assert queue.stats()['rejected'] == 1
+    release.set()
+    assert queue.wait_idle(5)
+    print("✓ La file d'images est bornée")
+
+
+def test_shutdown_persists_and_restores():
+    """Les images non terminées à l'arrêt sont reprises au redémarrage"""
+    pending_file = os.path.join(tempfile.mkdtemp(), 'pending.json')
+    release = threading.Event()
+    queue = ImageJobQueue(lambda room, job: release.wait(5), max_workers=1,
+                          pending_file=pending_file)
+    salle = FakeRoom("a")
+    for i in range(3):
+        queue.submit(salle, make_job("a", i + 1))
+    time.sleep(0.05)
+    queue.shutdown(timeout=0.1)
+    assert not queue.submit(salle, make_job("a", 4))
+    release.set()
+    assert os.path.exists(pending_file)
+
+    restored = []
+    new_queue = ImageJobQueue(lambda room, job: restored.append((room.room_id, job.card_number)),
+                              max_workers=2, pending_file=pending_file)
+    assert new_queue.restore(FakeRoom) == 3
+    assert not os.path.exists(pending_file)
+    assert new_queue.wait_idle(5)
+    assert restored == [("a", 1), ("a", 2), ("a", 3)]
+    print("✓ Les images interrompues sont reprises au redémarrage")
+
+
+if __name__ == "__main__":
+    test_jobs_run_in_order_per_room()
+    test_queue_is_bounded()
+    test_shutdown_persists_and_restores()
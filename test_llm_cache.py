@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test du cache disque des réponses Mistral
+"""
+
+import os
+import tempfile
+import game_logic
+from llm_cache import LLMCache, cache_key
+
+
+def make_cache(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), 'llm_cache.sqlite3')
+    return LLMCache(path=path, **kwargs)
+
+
+def test_hit_and_miss():
+    """Une réponse stockée est relue, les compteurs suivent"""
+    cache = make_cache()
+    assert cache.get("mistral-large-latest", 0.7, "prompt") is None
+    cache.put("mistral-large-latest", 0.7, "prompt", "Un dragon surgit.")
+
+    assert cache.get("mistral-large-latest", 0.7, "prompt") == "Un dragon surgit."
+    # Le modèle, la température et le mode JSON font partie de la clé
+    assert cache.get("mistral-large-latest", 0.2, "prompt") is None
+    assert cache.get("mistral-large-latest", 0.7, "prompt", json_mode=True) is None
+    assert cache_key("a", 0.7, "p") != cache_key("b", 0.7, "p")
+    assert cache_key("a", 0.7, "p") != cache_key("a", 0.7, "p", json_mode=True)
+
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 3 and stats['entries'] == 1
+    print("✓ Succès et échecs du cache")
+
+
+def test_ttl_and_size_eviction():
+    """Les entrées expirées et les moins utilisées sont supprimées"""
+    cache = make_cache(ttl=0.0)
+    cache.put("m", 0.7, "vieux", "texte")
+    assert cache.get("m", 0.7, "vieux") is None
+
+    cache = make_cache(max_entries=2)
+    for i in range(4):
+        cache.put("m", 0.7, f"prompt {i}", f"texte {i}")
+    cache.get("m", 0.7, "prompt 0")  # Devient la plus récemment utilisée
+    cache.evict()
+    assert cache.stats()['entries'] == 2
+    assert cache.get("m", 0.7, "prompt 0") == "texte 0"
+    print("✓ Éviction par TTL et par taille")
+
+
+def test_call_mistral_ai_uses_cache():
+    """call_mistral_ai répond depuis le cache, sauf si use_cache=False"""
+    import llm_cache
+    original_cache = llm_cache.llm_cache
+    original_config = dict(game_logic.GAME_CONFIG.get('mistral', {}))
+    llm_cache.llm_cache = make_cache()
+    game_logic.GAME_CONFIG['mistral'] = dict(original_config, enabled=True, cache=True)
+    saved_key = os.environ.pop('MISTRAL_API_KEY', None)
+    try:
+        from mistral_client import mistral_client
+        model = mistral_client.config['MODEL']
+        temperature = mistral_client.config['TEMPERATURE']
+        llm_cache.llm_cache.put(model, temperature, "Raconte", "Texte en cache.")
+
+        assert game_logic.call_mistral_ai("Raconte") == "Texte en cache."
+        # Une réponse en prose n'est jamais servie à un appel en mode JSON
+        assert game_logic.call_mistral_ai("Raconte", json_mode=True) != "Texte en cache."
+        # Sans cache et sans clé API on retombe sur le texte de secours
+        assert game_logic.call_mistral_ai("Raconte", use_cache=False) != "Texte en cache."
+    finally:
+        llm_cache.llm_cache = original_cache
+        game_logic.GAME_CONFIG['mistral'] = original_config
+        if saved_key is not None:
+            os.environ['MISTRAL_API_KEY'] = saved_key
+    print("✓ call_mistral_ai utilise le cache")
+
+
+if __name__ == "__main__":
+    test_hit_and_miss()
+    test_ttl_and_size_eviction()
+    test_call_mistral_ai_uses_cache()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test de l'écriture des journaux en arrière-plan
+"""
+
+import os
+import glob
+import gzip
+import json
+import tempfile
+import threading
+from log_writer import LogWriter, jsonl_path
+
+
+def test_text_and_jsonl():
+    """Chaque ligne de journal a son enregistrement JSONL"""
+    writer = LogWriter(directory=tempfile.mkdtemp())
+    writer.log('game_log.txt', "[2025-01-01 10:00:00] Début", {'room': 'table1', 'action': 'Début'})
+    writer.log('game_log.txt', "[2025-01-01 10:00:01] Fin", {'room': 'table1', 'action': 'Fin'})
+    assert writer.flush()
+
+    with open(os.path.join(writer.directory, 'game_log.txt'), encoding='utf-8') as f:
+        assert f.read() == "[2025-01-01 10:00:00] Début\n[2025-01-01 10:00:01] Fin\n"
+    with open(os.path.join(writer.directory, 'game_log.jsonl'), encoding='utf-8') as f:
+        assert [json.loads(line)['action'] for line in f] == ['Début', 'Fin']
+    assert jsonl_path('déroulement.txt') == 'déroulement.jsonl'
+    print("✓ Journal texte et JSONL")
+
+
+def test_concurrent_lines_do_not_interleave():
+    """Les lignes de plusieurs threads restent entières, écrites par lots"""
+    writer = LogWriter(directory=tempfile.mkdtemp())
+
+    def write(thread_id):
+        for i in range(200):
+            writer.append('déroulement.txt', f"thread {thread_id} ligne {i} " + "x" * 50)
+
+    threads = [threading.Thread(target=write, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert writer.flush()
+
+    with open(os.path.join(writer.directory, 'déroulement.txt'), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 8 * 200
+    assert all(line.startswith("thread ") and line.endswith("x" * 50) for line in lines)
+    assert writer.stats()['batches'] < len(lines)
+    print("✓ Lignes concurrentes entières")
+
+
+def test_rotation_and_gzip():
+    """Au-delà de max_bytes le journal est compressé, seules les dernières archives sont gardées"""
+    writer = LogWriter(directory=tempfile.mkdtemp(), max_bytes=100, backups=2, batch_size=1)
+    for i in range(12):
+        writer.append('image_prompts.txt', f"prompt {i} " + "y" * 40)
+        assert writer.flush()
+
+    archives = sorted(glob.glob(os.path.join(writer.directory, 'image_prompts.txt.*.gz')))
+    assert writer.stats()['rotations'] >= 3 and len(archives) == 2
+    with gzip.open(archives[-1], 'rt', encoding='utf-8') as f:
+        assert f.read().startswith("prompt ")
+    print("✓ Rotation et compression")
+
+
+if __name__ == "__main__":
+    test_text_and_jsonl()
+    test_concurrent_lines_do_not_interleave()
+    test_rotation_and_gzip()
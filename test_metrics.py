@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test des métriques Prometheus (/metrics)
+"""
+
+import tempfile
+import threading
+from metrics import MetricsRegistry, clear_directory, mark_worker_dead
+
+
+def test_counter_shards_across_threads():
+    """Les incréments de plusieurs threads sont tous comptés"""
+    registry = MetricsRegistry()
+    counter = registry.counter('cache_requests_total', "Consultations", ('cache', 'result'))
+
+    def work():
+        for _ in range(1000):
+            counter.inc('llm', 'hit')
+        counter.inc('llm', 'miss')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value('llm', 'hit') == 8000
+    assert counter.value('llm', 'miss') == 8
+    text = registry.render()
+    assert '# TYPE cache_requests_total counter' in text
+    assert 'cache_requests_total{cache="llm",result="hit"} 8000' in text
+    print("✓ Compteur réparti par thread")
+
+
+def test_histogram_buckets():
+    """Les buckets sont cumulatifs, avec somme et nombre"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('external_call_duration_seconds', "Durée", ('service',),
+                                   buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'mistral')
+    histogram.observe(0.5, 'mistral')
+    histogram.observe(3.0, 'mistral')
+    with histogram.time('replicate'):
+        pass
+
+    assert histogram.count('mistral') == 3 and histogram.count('replicate') == 1
+    lines = registry.render().splitlines()
+    assert 'external_call_duration_seconds_bucket{service="mistral",le="0.1"} 1' in lines
+    assert 'external_call_duration_seconds_bucket{service="mistral",le="1"} 2' in lines
+    assert 'external_call_duration_seconds_bucket{service="mistral",le="+Inf"} 3' in lines
+    assert 'external_call_duration_seconds_sum{service="mistral"} 3.55' in lines
+    assert 'external_call_duration_seconds_count{service="mistral"} 3' in lines
+    print("✓ Histogramme")
+
+
+def test_gauges_and_labels():
+    """Les jauges sont lues à la collecte, les labels sont échappés"""
+    registry = MetricsRegistry()
+    queued = []
+    registry.gauge('image_jobs_queued', "Images en attente", lambda: len(queued))
+    registry.gauge('broken', "Jauge en erreur", lambda: 1 / 0)
+    counter = registry.counter('errors_total', "Erreurs", ('source',))
+    counter.inc('a "b"\\c')
+
+    queued.extend([1, 2])
+    text = registry.render()
+    assert 'image_jobs_queued 2\n' in text
+    assert '\nbroken ' not in text
+    assert 'errors_total{source="a \\"b\\"\\\\c"} 1' in text
+
+    try:
+        counter.inc()
+        assert False, "labels manquants acceptés"
+    except ValueError:
+        pass
+    print("✓ Jauges et labels")
+
+
+def make_worker(directory, worker, queued):
+    registry = MetricsRegistry(directory=directory, worker=worker)
+    counter = registry.counter('errors_total', "Erreurs", ('source',))
+    histogram = registry.histogram('play_stage_duration_seconds', "Étapes", ('stage',), buckets=(1.0,))
+    registry.gauge('image_jobs_queued', "Images en attente", lambda: queued)
+    return registry, counter, histogram
+
+
+def test_workers_are_aggregated():
+    """Avec un dossier partagé, chaque worker répond avec le total de tous les workers"""
+    directory = tempfile.mkdtemp()
+    clear_directory(directory)
+    worker1, errors1, stages1 = make_worker(directory, '101', 1)
+    worker2, errors2, stages2 = make_worker(directory, '102', 2)
+    errors1.inc('http')
+    errors2.inc('http', amount=2)
+    stages1.observe(0.5, 'story')
+    stages2.observe(3.0, 'story')
+    worker2.write_values()  # Écriture périodique du worker qui ne répond pas
+
+    # Le même total, quel que soit le worker qui répond
+    for registry in (worker1, worker2):
+        lines = registry.render().splitlines()
+        assert 'errors_total{source="http"} 3' in lines
+        assert 'play_stage_duration_seconds_bucket{stage="story",le="1"} 1' in lines
+        assert 'play_stage_duration_seconds_count{stage="story"} 2' in lines
+        assert 'image_jobs_queued{worker="101"} 1' in lines
+        assert 'image_jobs_queued{worker="102"} 2' in lines
+
+    # Un worker arrêté garde ses compteurs (le total ne recule pas) mais plus ses jauges
+    mark_worker_dead(directory, '102')
+    lines = worker1.render().splitlines()
+    assert 'errors_total{source="http"} 3' in lines
+    assert not any(line.startswith('image_jobs_queued{worker="102"}') for line in lines)
+    print("✓ Métriques additionnées entre workers")
+
+
+if __name__ == "__main__":
+    test_counter_shards_across_threads()
+    test_histogram_buckets()
+    test_gauges_and_labels()
+    test_workers_are_aggregated()
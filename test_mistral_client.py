@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test du client Mistral: nouvelles tentatives et disjoncteur
+"""
+
+import time
+import requests
+from mistral_client import (CircuitBreaker, CircuitOpenError, MistralClient, MistralError,
+                            MISTRAL_CONFIG)
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.headers = {}
+        self.text = str(self._payload)
+
+    def json(self):
+        return self._payload
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._payload.get('lines', []))
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Renvoie les réponses prévues dans l'ordre (ou lève les exceptions prévues)"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+        self.timeouts = []
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        self.timeouts.append(kwargs.get('timeout'))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_client(responses, **overrides):
+    config = dict(MISTRAL_CONFIG, BACKOFF_BASE=0.0, BACKOFF_MAX=0.0)
+    config.update(overrides)
+    client = MistralClient(config)
+    client.session = FakeSession(responses)
+    return client
+
+
+def ok(text):
+    return FakeResponse(200, {'choices': [{'message': {'content': f" {text} "}}]})
+
+
+def test_retries_on_server_errors(monkeypatch):
+    """Les 429/5xx sont retentés, le succès final est renvoyé"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    client = make_client([FakeResponse(503), FakeResponse(429), ok("Le pont s'effondre.")])
+
+    assert client.chat("prompt") == "Le pont s'effondre."
+    assert client.session.calls == 3
+    assert client.breaker.state == 'closed'
+    print("✓ Nouvelles tentatives sur 429/5xx")
+
+
+def test_client_error_not_retried(monkeypatch):
+    """Une erreur 4xx n'est pas retentée"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    client = make_client([FakeResponse(401), ok("jamais")])
+
+    try:
+        client.chat("prompt")
+        assert False, "MistralError attendue"
+    except MistralError:
+        pass
+    assert client.session.calls == 1
+    print("✓ Pas de nouvelle tentative sur 4xx")
+
+
+def test_breaker_opens_and_recovers(monkeypatch):
+    """Le disjoncteur s'ouvre après N échecs puis laisse passer un essai"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    client = make_client([FakeResponse(500), FakeResponse(500), ok("De retour.")],
+                         MAX_RETRIES=0, BREAKER_FAILURE_THRESHOLD=2, BREAKER_RESET_TIMEOUT=0.05)
+
+    for _ in range(2):
+        try:
+            client.chat("prompt")
+        except MistralError:
+            pass
+    assert client.breaker.state == 'open'
+
+    try:
+        client.chat("prompt")
+        assert False, "CircuitOpenError attendue"
+    except CircuitOpenError:
+        pass
+    assert client.session.calls == 2  # Échec immédiat, aucun appel réseau
+
+    time.sleep(0.06)
+    assert client.chat("prompt") == "De retour."
+    assert client.breaker.state == 'closed'
+    print("✓ Disjoncteur ouvert puis refermé")
+
+
+def test_deadline_bounds_call(monkeypatch):
+    """Le temps restant borne les timeouts et empêche une tentative trop tardive"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    busy = FakeResponse(503)
+    busy.headers['Retry-After'] = '5'
+    client = make_client([busy, ok("Trop tard.")], BACKOFF_MAX=10.0)
+
+    try:
+        client.chat("prompt", deadline=time.monotonic() + 1.0)
+        assert False, "MistralError attendue"
+    except MistralError:
+        pass
+    assert client.session.calls == 1
+    assert max(client.session.timeouts[0]) <= 1.0
+    print("✓ Appel borné par le temps restant")
+
+
+def test_half_open_allows_single_trial():
+    """En demi-ouverture une seule requête d'essai passe"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+    breaker.record_failure()
+    assert breaker.snapshot()['state'] == 'open'
+    print("✓ Un seul essai en demi-ouverture")
+
+
+def test_other_request_errors_reach_breaker(monkeypatch):
+    """Les autres erreurs de requests deviennent des MistralError et libèrent l'essai"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    client = make_client([FakeResponse(500), requests.exceptions.ChunkedEncodingError("coupé"),
+                          ok("De retour.")],
+                         MAX_RETRIES=0, BREAKER_FAILURE_THRESHOLD=1, BREAKER_RESET_TIMEOUT=0.0)
+    for _ in range(2):
+        try:
+            client.chat("prompt")
+            assert False, "MistralError attendue"
+        except MistralError:
+            pass
+    assert client.breaker.snapshot()['total_failures'] == 2
+    assert client.chat("prompt") == "De retour."  # L'essai suivant passe
+    print("✓ Autres erreurs réseau comptées par le disjoncteur")
+
+
+def test_stream_chat_yields_pieces(monkeypatch):
+    """Le mode streaming renvoie le texte morceau par morceau"""
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    lines = [
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        '',
+        'data: {"choices": [{"delta": {"content": "Le pont "}}]}',
+        'data: {"choices": [{"delta": {"content": "s\'effondre."}}]}',
+        'data: [DONE]'
+    ]
+    client = make_client([FakeResponse(200, {'lines': lines})])
+
+    assert list(client.stream_chat("prompt")) == ["Le pont ", "s'effondre."]
+    print("✓ Texte reçu en streaming")
+
+
+if __name__ == "__main__":
+    import pytest
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_retries_on_server_errors(monkeypatch)
+        test_client_error_not_retried(monkeypatch)
+        test_breaker_opens_and_recovers(monkeypatch)
+        test_deadline_bounds_call(monkeypatch)
+        test_half_open_allows_single_trial()
+        test_other_request_errors_reach_breaker(monkeypatch)
+        test_stream_chat_yields_pieces(monkeypatch)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test du contexte narratif borné (derniers événements + résumé glissant)
+"""
+
+import game_logic
+from narrative_context import NarrativeContext, estimate_tokens
+from story_log import StoryLog
+
+
+def make_story(count):
+    return StoryLog({'text': f"Événement {i}. Le groupe avance prudemment dans les galeries sombres sous le village."}
+                    for i in range(count))
+
+
+def test_short_story_sent_verbatim():
+    """Une histoire courte est envoyée telle quelle"""
+    context = NarrativeContext()
+    story = make_story(3)
+    assert context.build(story, 'story') == " ".join(e['text'] for e in story)
+    assert context.stats()['saved_tokens'] == 0
+    print("✓ Histoire courte envoyée en entier")
+
+
+def test_long_story_is_bounded():
+    """Une longue histoire reste sous le budget et garde les derniers événements"""
+    original = dict(game_logic.GAME_CONFIG.get('mistral', {}))
+    game_logic.GAME_CONFIG['mistral'] = dict(original, enabled=False)  # Résumé extractif
+    try:
+        context = NarrativeContext()
+        story = make_story(40)
+        text = context.build(story, 'story', background=False)
+
+        assert estimate_tokens(text) <= 600
+        assert text.endswith(story[-1]['text'])
+        assert "Résumé des événements précédents" in text
+        assert context.stats()['saved_tokens'] > 0
+
+        # Un événement de plus: le résumé est complété, pas recalculé depuis le début
+        story.append({'text': "Événement 40. Un dragon surgit."})
+        context.build(story, 'story', background=False)
+        assert context.stats()['summarized_entries'] == len(story) - 6
+    finally:
+        game_logic.GAME_CONFIG['mistral'] = original
+    print("✓ Longue histoire bornée par le budget")
+
+
+def test_rewrite_invalidates_summary():
+    """Une réécriture de l'histoire (Inversion, Suppression) invalide le résumé"""
+    original = dict(game_logic.GAME_CONFIG.get('mistral', {}))
+    game_logic.GAME_CONFIG['mistral'] = dict(original, enabled=False)
+    try:
+        context = NarrativeContext()
+        story = make_story(40)
+        context.build(story, 'story', background=False)
+
+        story[0] = {'text': "Un tout autre début."}
+        text = context.build(story, 'story', background=False)
+        assert "Un tout autre début" in text
+    finally:
+        game_logic.GAME_CONFIG['mistral'] = original
+    print("✓ Résumé invalidé après réécriture")
+
+
+if __name__ == "__main__":
+    test_short_story_sent_verbatim()
+    test_long_story_is_bounded()
+    test_rewrite_invalidates_summary()
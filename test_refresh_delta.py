@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test du protocole de rafraîchissement différentiel (since=<version>)
+"""
+
+from datetime import datetime
+from game_logic import GameState
+
+
+def make_entry(text):
+    return {
+        'player': 'Joueur1',
+        'role': 'Soldat',
+        'text': text,
+        'card': None,
+        'effect': '=',
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def test_full_then_not_modified():
+    """Sans version on reçoit tout, puis une réponse vide si rien n'a changé"""
+    game_state = GameState()
+
+    full = game_state.get_delta()
+    assert full['full'] is True
+    assert len(full['story']) == 1
+    assert 'score' in full and 'active_players' in full
+
+    unchanged = game_state.get_delta(full['version'])
+    assert unchanged == {'version': full['version'], 'not_modified': True}
+    print("✓ Réponse complète puis 'not modified'")
+
+
+def test_delta_contains_only_changes():
+    """Le delta ne contient que les entrées ajoutées et les champs modifiés"""
+    game_state = GameState()
+    version = game_state.get_delta()['version']
+
+    game_state.append_story_entry(make_entry("Un loup hurle au loin."))
+    game_state.score += 1
+
+    delta = game_state.get_delta(version)
+    assert delta['version'] > version
+    assert delta['score'] == 1
+    assert 'played_cards' not in delta
+    assert 'story' not in delta
+    assert [c['index'] for c in delta['story_changes']] == [1]
+    assert delta['story_length'] == 2
+
+    # Assigner la même valeur ne change pas la version
+    version = delta['version']
+    game_state.score = 1
+    assert game_state.get_delta(version)['not_modified']
+    print("✓ Le delta ne contient que les changements")
+
+
+def test_story_rewrite_sends_full_story():
+    """Une suppression ou une inversion renvoie l'histoire complète"""
+    game_state = GameState()
+    game_state.append_story_entry(make_entry("Premier événement."))
+    game_state.append_story_entry(make_entry("Second événement."))
+    version = game_state.get_delta()['version']
+
+    game_state.update_story_entry(2, text="Second événement réinterprété.")
+    delta = game_state.get_delta(version)
+    assert [c['index'] for c in delta['story_changes']] == [2]
+
+    version = delta['version']
+    game_state.delete_story_entry(1)
+    delta = game_state.get_delta(version)
+    assert len(delta['story']) == 2
+    print("✓ Les réécritures de l'histoire renvoient l'histoire complète")
+
+
+if __name__ == "__main__":
+    test_full_then_not_modified()
+    test_delta_contains_only_changes()
+    test_story_rewrite_sends_full_story()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test de la réinterprétation des cartes spéciales (Inversion / Suppression)
+"""
+
+import json
+import time
+import threading
+import pytest
+import requests
+import game_logic
+import mistral_client
+import reinterpretation
+from reinterpretation import reinterpret_entries, parse_batch_response
+
+
+def make_entry(numero, text, descriptif="Une épée brisée"):
+    return {
+        'player': 'Joueur1',
+        'role': 'Soldat',
+        'text': text,
+        'card': {'numero': str(numero), 'descriptif': descriptif},
+        'effect': '+'
+    }
+
+
+def with_config(config, fake_call, test):
+    """Exécute test avec une config et un faux appel Mistral"""
+    original_call = reinterpretation.call_mistral_ai
+    had_section = 'reinterpretation' in game_logic.GAME_CONFIG
+    original_section = game_logic.GAME_CONFIG.get('reinterpretation')
+    reinterpretation.call_mistral_ai = fake_call
+    game_logic.GAME_CONFIG['reinterpretation'] = config
+    try:
+        test()
+    finally:
+        reinterpretation.call_mistral_ai = original_call
+        if had_section:
+            game_logic.GAME_CONFIG['reinterpretation'] = original_section
+        else:
+            game_logic.GAME_CONFIG.pop('reinterpretation', None)
+
+
+def test_parallel_keeps_order_and_budget():
+    """Les appels tournent en parallèle, les retardataires gardent leur texte"""
+    entries = [make_entry(i, f"Original {i}", descriptif=f"Clef {i}") for i in range(1, 5)]
+    story = [{'text': "Au commencement."}] + entries
+
+    def fake_call(prompt, **kwargs):
+        if "Clef 3" in prompt:
+            time.sleep(1.0)  # Dépasse le budget
+        else:
+            time.sleep(0.1)
+        return "Nouveau " + prompt.split("Clef ")[1][0]
+
+    def test():
+        started = time.monotonic()
+        texts = reinterpret_entries(entries, story, 5, "Réinterprétée après suppression")
+        elapsed = time.monotonic() - started
+        assert texts == ["Nouveau 1", "Nouveau 2", "Original 3", "Nouveau 4"], texts
+        assert elapsed < 0.8, elapsed
+
+    with_config({'mode': 'parallel', 'max_workers': 4, 'time_budget': 0.5}, fake_call, test)
+    print("✓ Mode parallèle avec budget de temps")
+
+
+def test_batch_single_call():
+    """Le mode batch fait un seul appel JSON"""
+    entries = [make_entry(i, f"Original {i}") for i in range(1, 4)]
+    calls = []
+
+    def fake_call(prompt, **kwargs):
+        calls.append(kwargs)
+        return json.dumps({"1": "Premier réécrit", "3": "Troisième réécrit"})
+
+    def test():
+        texts = reinterpret_entries(entries, entries, 5, "Rejouée dans l'ordre inversé")
+        assert texts == ["Premier réécrit", "Original 2", "Troisième réécrit"]
+        assert [sorted(kwargs) for kwargs in calls] == [['deadline', 'fallback', 'json_mode']]
+        assert calls[0]['json_mode'] is True and calls[0]['deadline'] > time.monotonic()
+
+    with_config({'mode': 'batch'}, fake_call, test)
+    print("✓ Mode batch en un seul appel")
+
+
+def test_parse_batch_response_tolerates_garbage():
+    """Une réponse non JSON garde tous les textes originaux"""
+    assert parse_batch_response("Une ombre plane...", 2) == [None, None]
+    assert parse_batch_response('["a", "b"]', 2) == [None, None]
+    print("✓ Réponse batch invalide ignorée")
+
+
+class DownSession:
+    """API injoignable"""
+
+    def post(self, *args, **kwargs):
+        raise requests.exceptions.ConnectionError("hors ligne")
+
+
+def test_failed_calls_keep_original_text(monkeypatch):
+    """Avec le vrai call_mistral_ai, un échec garde le texte original (pas le texte de secours)"""
+    client = mistral_client.MistralClient(dict(mistral_client.MISTRAL_CONFIG, MAX_RETRIES=0))
+    client.session = DownSession()
+    monkeypatch.setattr(mistral_client, 'mistral_client', client)
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    monkeypatch.setitem(game_logic.GAME_CONFIG, 'mistral',
+                        dict(game_logic.GAME_CONFIG.get('mistral', {}), enabled=True, cache=False))
+    entries = [make_entry(i, f"Original {i}") for i in range(1, 3)]
+
+    for mode in ('parallel', 'batch'):
+        def test():
+            texts = reinterpret_entries(entries, entries, 5, "Réinterprétée après suppression")
+            assert texts == ["Original 1", "Original 2"], texts
+
+        with_config({'mode': mode}, game_logic.call_mistral_ai, test)
+    print("✓ Échec de l'API : textes originaux gardés")
+
+
+def test_special_cards_reinterpret_outside_lock():
+    """Les cartes spéciales modifient l'état sous le verrou, l'IA travaille sans lui"""
+    state = game_logic.GameState(room_id='table1')
+    for numero in (1, 2, 3):
+        state.append_story_entry(make_entry(numero, f"Original {numero}"))
+    state.score = 3
+    lock = threading.Lock()
+    held = []
+
+    def fake_call(prompt, **kwargs):
+        held.append(lock.locked())
+        return json.dumps({"1": "Réécrit"})
+
+    def suppression():
+        state.handle_suppression_card('Alice', 'Moine', 1, lock=lock)
+        assert [entry['text'] for entry in state.story[1:]] == ["Réécrit", "Original 3"]
+        assert state.score == 2
+
+    def changed_during_inversion(prompt, **kwargs):
+        state.delete_story_entry(1)  # Histoire modifiée pendant le rejeu
+        return json.dumps({})
+
+    def inversion():
+        message = state.handle_inversion_card('Bob', 'Soldat', lock=lock)
+        assert "a changé" in message
+        assert [entry['text'] for entry in state.story[1:]] == ["Original 3"]
+
+    with_config({'mode': 'batch'}, fake_call, suppression)
+    with_config({'mode': 'batch'}, changed_during_inversion, inversion)
+    assert held == [False] and not lock.locked()
+    print("✓ Cartes spéciales : IA hors verrou")
+
+
+if __name__ == "__main__":
+    test_parallel_keeps_order_and_budget()
+    test_batch_single_call()
+    test_parse_batch_response_tolerates_garbage()
+    test_special_cards_reinterpret_outside_lock()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_failed_calls_keep_original_text(monkeypatch)
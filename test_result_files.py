@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test du service des images générées (/result)
+"""
+
+import os
+import tempfile
+from flask import Flask
+from result_files import ResultFiles, content_hash
+
+HASHED = "image_Alice_card5_0123456789abcdef.webp"
+OLD = "image_Alice_card5_20250724_092652.jpg"
+
+
+def make_app(offload=''):
+    directory = tempfile.mkdtemp()
+    for name in (HASHED, OLD):
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(b"0123456789" * 10)
+    files = ResultFiles(directory, offload=offload)
+    app = Flask(__name__)
+
+    @app.route('/result/<filename>')
+    def serve(filename):
+        return files.response(filename) or ('', 404)
+
+    return app.test_client(), files
+
+
+def test_content_hashed_names_are_immutable():
+    """Les noms avec hash sont cachés un an, ETag fort = hash"""
+    assert content_hash(HASHED) == "0123456789abcdef"
+    assert content_hash(OLD) is None
+    client, _ = make_app()
+
+    response = client.get(f'/result/{HASHED}')
+    assert response.status_code == 200 and len(response.data) == 100
+    assert response.headers['ETag'] == '"0123456789abcdef"'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'no-cache' not in response.headers['Cache-Control']
+    assert response.mimetype == 'image/webp'
+
+    response = client.get(f'/result/{OLD}')
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert 'max-age=3600' in response.headers['Cache-Control']
+    print("✓ Cache immuable pour les noms avec hash")
+
+
+def test_conditional_and_range_requests():
+    """304 sur If-None-Match, 206 sur Range"""
+    client, _ = make_app()
+    response = client.get(f'/result/{HASHED}', headers={'If-None-Match': '"0123456789abcdef"'})
+    assert response.status_code == 304 and response.data == b""
+
+    response = client.get(f'/result/{OLD}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206 and response.data == b"0123456789"
+
+    assert client.get('/result/absente.jpg').status_code == 404
+    assert client.get('/result/..%2Fsecret.jpg').status_code == 404
+    print("✓ Requêtes conditionnelles et Range")
+
+
+def test_offload_to_reverse_proxy():
+    """En mode x-accel le corps est laissé au proxy inverse"""
+    client, _ = make_app(offload='x-accel')
+    response = client.get(f'/result/{HASHED}')
+    assert response.headers['X-Accel-Redirect'] == f'/_result/{HASHED}'
+    assert response.data == b""
+
+    client, files = make_app(offload='x-sendfile')
+    response = client.get(f'/result/{HASHED}')
+    assert response.headers['X-Sendfile'] == os.path.join(files.directory, HASHED)
+    print("✓ Délégation au proxy inverse")
+
+
+def test_stat_cache():
+    """Le stat est réutilisé pendant STAT_TTL"""
+    _, files = make_app()
+    first = files.info(HASHED)
+    assert files.info(HASHED) is first
+    os.remove(first.path)
+    assert files.info(HASHED) is first
+    assert ResultFiles(files.directory, stat_ttl=0).info(HASHED) is None
+    print("✓ Cache des stat")
+
+
+if __name__ == "__main__":
+    test_content_hashed_names_are_immutable()
+    test_conditional_and_range_requests()
+    test_offload_to_reverse_proxy()
+    test_stat_cache()
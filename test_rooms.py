@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test du registre des salles (plusieurs tables indépendantes)
+"""
+
+import time
+import threading
+from room_manager import RoomRegistry, normalize_room_id, DEFAULT_ROOM_ID
+
+
+def test_room_isolation():
+    """Deux salles ont des états de jeu indépendants"""
+    registry = RoomRegistry(max_rooms=10, idle_timeout=60)
+
+    salle_a = registry.get("table-a")
+    salle_b = registry.get("table-b")
+    salle_a.state.score = 7
+
+    assert registry.get("table-a") is salle_a
+    assert salle_b.state.score == 0
+    assert len(registry) == 2
+    print("✓ Les salles sont indépendantes")
+
+
+def test_room_eviction():
+    """Les salles les plus anciennes sont libérées au-delà de la capacité"""
+    registry = RoomRegistry(max_rooms=3, idle_timeout=60)
+    for i in range(5):
+        registry.get(f"table-{i}")
+
+    assert registry.room_ids() == ["table-2", "table-3", "table-4"]
+
+    # Une salle en cours de traitement n'est jamais libérée
+    registry = RoomRegistry(max_rooms=2, idle_timeout=60)
+    occupee = registry.get("occupee")
+    occupee.state.processing_player = "Joueur1"
+    registry.get("table-1")
+    registry.get("table-2")
+    assert registry.peek("occupee") is occupee
+    print("✓ L'éviction respecte la capacité et les salles occupées")
+
+
+def test_idle_rooms_are_released():
+    """Les salles inactives sont libérées au prochain accès au registre"""
+    registry = RoomRegistry(max_rooms=10, idle_timeout=0.05)
+    registry.get("ancienne")
+    time.sleep(0.1)
+    registry.get("nouvelle")
+
+    assert registry.room_ids() == ["nouvelle"]
+    print("✓ Les salles inactives sont libérées")
+
+
+def test_creation_does_not_block_other_rooms():
+    """Le rechargement d'une salle ne bloque pas l'accès aux autres ; elle n'est créée qu'une fois"""
+    registry = RoomRegistry(max_rooms=10, idle_timeout=60)
+    registry.get("autre")
+    loading = threading.Event()
+    release = threading.Event()
+    created = []
+
+    def slow_attach(room):
+        created.append(room)
+        loading.set()
+        release.wait(5)
+
+    registry.on_create = slow_attach
+    rooms = []
+    threads = [threading.Thread(target=lambda: rooms.append(registry.get("lente"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert loading.wait(5)
+    assert registry.get("autre") is not None  # Pas bloqué par la salle en cours de chargement
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and rooms[0] is rooms[1] is created[0]
+    print("✓ Création hors du verrou du registre")
+
+
+def test_room_id_validation():
+    """Les identifiants de salle sont validés"""
+    assert normalize_room_id(None) == DEFAULT_ROOM_ID
+    assert normalize_room_id("  ") == DEFAULT_ROOM_ID
+    assert normalize_room_id("Table_1") == "Table_1"
+    assert normalize_room_id("../etc") is None
+    print("✓ Validation des identifiants de salle")
+
+
+if __name__ == "__main__":
+    test_room_isolation()
+    test_room_eviction()
+    test_idle_rooms_are_released()
+    test_creation_does_not_block_other_rooms()
+    test_room_id_validation()
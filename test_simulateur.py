@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test du simulateur Monte Carlo d'équilibre
+"""
+
+import numpy as np
+from simulateur import simulate_batch, parse_player_range
+
+
+def test_score_rules():
+    """Cartes toutes positives: victoire assurée, score = départ + cartes jouées"""
+    effects = np.ones((2, 10), dtype=np.int8)
+    result = simulate_batch(effects, (0, 1), games=1000, base_cards=4, seed=1)
+    assert result['wins'] == 1000
+    # Score de départ 4 (2 joueurs) + 6 cartes positives
+    assert result['score_sum'] == 1000 * 10
+    assert result['card_played'].sum() == 1000 * 6
+
+    effects = -np.ones((2, 10), dtype=np.int8)
+    result = simulate_batch(effects, (0, 1), games=1000, base_cards=4, seed=1)
+    assert result['wins'] == 0
+    print("✓ Règles de score et de fin de partie")
+
+
+def test_greedy_policy_and_suppression():
+    """La politique greedy choisit les bonnes cartes et supprime les mauvaises"""
+    effects = np.array([[1, 1, 1, 1, 1, 1, -1, -1, -1, -1]], dtype=np.int8)
+    result = simulate_batch(effects, (0,), games=500, base_cards=4, policy='greedy', seed=2)
+    assert result['wins'] == 500
+    assert result['card_played'][6:].sum() == 0
+
+    # Avec Suppression le nombre de cartes jouées en fin de partie reste le même
+    result = simulate_batch(effects, (0, 0), games=500, base_cards=4, policy='greedy',
+                            suppression_rate=1.0, seed=3)
+    assert result['card_played'].sum() == 500 * 6
+    print("✓ Politique greedy et Suppression")
+
+
+def test_parse_player_range():
+    assert parse_player_range('3') == [3]
+    assert parse_player_range('2-4') == [2, 3, 4]
+    print("✓ Plage de joueurs")
+
+
+if __name__ == "__main__":
+    test_score_rules()
+    test_greedy_policy_and_suppression()
+    test_parse_player_range()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test de la synthèse vocale par morceaux
+"""
+
+import time
+import tempfile
+import threading
+from audio_cache import audio_cache
+from speech_service import GoogleTextToSpeechService, TTS_CONFIG, split_sentences
+
+LONG_TEXT = " ".join(f"Le chevalier numéro {i} traverse la forêt sombre sous la pluie." for i in range(20))
+
+
+class RecordingTTS(GoogleTextToSpeechService):
+    """Synthèse simulée : le MP3 d'un morceau est son texte, les appels sont comptés"""
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = 'test'
+        self.calls = []
+        self._calls_lock = threading.Lock()
+
+    def _synthesize(self, key, text, voice_type, rate, pitch):
+        with self._calls_lock:
+            self.calls.append(text)
+        audio_cache.put(key, text.encode('utf-8') + b"|")
+        return {'success': True, 'audio_key': key, 'audio_format': 'mp3',
+                'text_length': len(text), 'cached': False}
+
+
+class FailingTTS(RecordingTTS):
+    """Synthèse simulée en échec, bloquée jusqu'à `release`"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _synthesize(self, key, text, voice_type, rate, pitch):
+        with self._calls_lock:
+            self.calls.append(text)
+        self.started.set()
+        self.release.wait(5)
+        return {'error': 'TTS API error: 503'}
+
+
+def with_temporary_cache(test):
+    def run():
+        directory = audio_cache.directory
+        audio_cache.directory = tempfile.mkdtemp()
+        try:
+            test()
+        finally:
+            audio_cache.directory = directory
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def test_split_sentences():
+    """Découpage aux fins de phrase, premier morceau court, rien n'est tronqué"""
+    chunks = split_sentences(LONG_TEXT)
+    assert len(chunks) > 2
+    assert len(chunks[0]) <= TTS_CONFIG['FIRST_CHUNK_MAX_CHARS']
+    assert all(len(chunk) <= TTS_CONFIG['CHUNK_MAX_CHARS'] for chunk in chunks)
+    assert all(chunk.endswith('.') for chunk in chunks)
+    assert " ".join(chunks) == LONG_TEXT
+
+    # Une phrase sans ponctuation plus longue que la limite est coupée aux espaces
+    words = "mot " * 400
+    pieces = split_sentences(words, max_chars=100)
+    assert all(len(piece) <= 100 for piece in pieces)
+    assert " ".join(pieces).split() == words.split()
+    print("✓ Découpage en phrases")
+
+
+@with_temporary_cache
+def test_stream_in_order_and_store_full_narration():
+    """Les morceaux arrivent dans l'ordre, puis la narration complète est mise en cache"""
+    tts = RecordingTTS()
+    result = tts.prepare_speech(LONG_TEXT)
+    assert result['success'] and result['chunks'] > 2
+    key = result['audio_key']
+
+    body = b"".join(tts.stream_speech(key))
+    assert body.decode('utf-8').split("|")[:-1] == split_sentences(LONG_TEXT)
+    assert sorted(tts.calls) == sorted(split_sentences(LONG_TEXT))  # Chaque morceau une seule fois
+
+    # Deuxième lecture : fichier complet, aucun appel API
+    assert open(tts.audio_path(key), 'rb').read() == body
+    assert tts.stream_speech(key) is None
+    calls = len(tts.calls)
+    assert tts.prepare_speech(LONG_TEXT)['cached']
+    assert len(tts.calls) == calls
+    print("✓ Flux ordonné puis narration complète en cache")
+
+
+@with_temporary_cache
+def test_short_text_is_synthesized_at_once():
+    """Un texte court est synthétisé en une requête"""
+    tts = RecordingTTS()
+    result = tts.prepare_speech("Un loup hurle.")
+    assert 'chunks' not in result and tts.calls == ["Un loup hurle."]
+    print("✓ Texte court en une requête")
+
+
+@with_temporary_cache
+def test_failed_synthesis_is_shared_with_waiters():
+    """Un échec est partagé par les lectures en attente, sans nouvelle synthèse"""
+    tts = FailingTTS()
+    key = tts._cache_key("Le pont s'effondre.", 'female', 1.0, 0.0)
+    results = []
+
+    def read():
+        results.append(tts.synthesize_speech("Le pont s'effondre."))
+
+    threads = [threading.Thread(target=read)]
+    threads[0].start()
+    assert tts.started.wait(5)
+    threads += [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    while tts._inflight[key]['holders'] < 4:
+        time.sleep(0.01)
+    tts.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(tts.calls) == 1
+    assert results == [{'error': 'TTS API error: 503'}] * 4
+    assert key not in tts._inflight
+    tts.synthesize_speech("Le pont s'effondre.")  # Une lecture ultérieure retente
+    assert len(tts.calls) == 2
+    print("✓ Échec de synthèse partagé par les lectures en attente")
+
+
+if __name__ == "__main__":
+    test_split_sentences()
+    test_stream_in_order_and_store_full_narration()
+    test_short_text_is_synthesized_at_once()
+    test_failed_synthesis_is_shared_with_waiters()
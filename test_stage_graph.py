@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test du graphe d'étapes d'une carte jouée
+"""
+
+import threading
+from stage_graph import StageGraph, StageFailed
+
+
+def test_independent_stages_run_concurrently():
+    """Les étapes indépendantes s'exécutent en parallèle"""
+    # Chaque étape attend l'autre : exécutées l'une après l'autre, la barrière expire
+    barriere = threading.Barrier(2, timeout=5)
+
+    def attend_l_autre(valeur):
+        def etape(**kwargs):
+            barriere.wait()
+            return valeur
+        return etape
+
+    results = (StageGraph()
+               .add('story', attend_l_autre("texte"))
+               .add('reference_image', attend_l_autre("ref.jpg"))
+               .add('image', lambda story, reference_image: f"{story}+{reference_image}",
+                    deps=['story', 'reference_image'])
+               .run())
+
+    assert results['image'] == "texte+ref.jpg"
+    assert not barriere.broken
+    print("✓ Étapes parallèles")
+
+
+def test_failed_dependency_skips_stage():
+    """Une étape dont la dépendance échoue est ignorée"""
+    def echec():
+        raise RuntimeError("Mistral indisponible")
+
+    results = (StageGraph()
+               .add('image_prompt', echec)
+               .add('image', lambda image_prompt: "image", deps=['image_prompt'])
+               .add('story', lambda: "texte")
+               .run())
+    assert results == {'story': "texte"}
+
+    try:
+        StageGraph().add('story', echec, required=True).run()
+        assert False, "StageFailed attendu"
+    except StageFailed as e:
+        assert e.stage_name == 'story'
+    print("✓ Les dépendances en échec sont gérées")
+
+
+if __name__ == "__main__":
+    test_independent_stages_run_concurrently()
+    test_failed_dependency_skips_stage()
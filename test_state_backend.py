@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test de l'état partagé entre workers (backend SQLite)
+"""
+
+import os
+import tempfile
+import threading
+from room_manager import RoomRegistry
+from state_backend import SQLiteBackend, StateConflictError
+
+
+def make_workers(count=2, **kwargs):
+    """Several registries on one database, like several gunicorn workers"""
+    path = os.path.join(tempfile.mkdtemp(), 'state.db')
+    return [RoomRegistry(backend=SQLiteBackend(path, **kwargs)) for _ in range(count)]
+
+
+def test_state_seen_by_other_worker():
+    """Une carte jouée sur un worker est vue par l'autre, avec la même version"""
+    worker1, worker2 = make_workers()
+    room1 = worker1.get('table1')
+    room2 = worker2.get('table1')
+    with room2.lock:
+        pass  # Le second worker charge l'état créé par le premier
+
+    with room1.lock:
+        room1.state.add_played_card(7)
+        room1.state.append_story_entry({'player': 'Alice', 'role': 'Soldat', 'text': "Alice entre.",
+                                        'card': {'numero': '7', 'mot': 'Torche'}, 'effect': '+'})
+        room1.state.score += 1
+        version = room1.state.version
+
+    with room2.lock:
+        assert room2.state.is_card_played(7) and room2.state.score == 1
+        assert room2.state.story[1]['text'] == "Alice entre."
+        assert room2.state.version == version
+        # A client that got `version` from the first worker is up to date on the second
+        assert room2.state.get_delta(version) == {'version': version, 'not_modified': True}
+        # An older client gets everything that changed
+        delta = room2.state.get_delta(version - 1)
+        assert delta['played_cards'] == [7] and len(delta['story']) == 2
+    print("✓ État vu par l'autre worker")
+
+
+def test_atomic_read_modify_write():
+    """Les sections sous room.lock sont atomiques entre workers"""
+    workers = make_workers(3)
+    rooms = [worker.get('table1') for worker in workers]
+
+    def increment(room):
+        for _ in range(20):
+            with room.lock:
+                room.state.score += 1
+
+    threads = [threading.Thread(target=increment, args=(room,)) for room in rooms for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with rooms[0].lock:
+        assert rooms[0].state.score == 3 * 2 * 20
+    print("✓ Lecture-modification-écriture atomique")
+
+
+def test_presence_across_workers():
+    """Un joueur connecté à un worker est actif pour les autres"""
+    worker1, worker2 = make_workers()
+    room1 = worker1.get('table1')
+    room2 = worker2.get('table1')
+    with room1.lock:
+        room1.state.connect_player('Alice', 'Soldat')
+
+    with room2.lock:
+        players = room2.state.get_active_players()
+    assert [(p['name'], p['role']) for p in players] == [('Alice', 'Soldat')]
+    print("✓ Présence partagée")
+
+
+def test_wait_wakes_on_other_worker_commit():
+    """Une connexion en attente sur un worker est réveillée par un commit de l'autre"""
+    worker1, worker2 = make_workers(poll_interval=0.05)
+    room1 = worker1.get('table1')
+    room2 = worker2.get('table1')
+    with room2.lock:
+        since = room2.state.version
+
+    def play():
+        with room1.lock:
+            room1.state.add_played_card(3)
+
+    timer = threading.Timer(0.1, play)
+    timer.start()
+    assert room2.wait_for_change(since, 5.0)
+    timer.join()
+    assert room2.state.is_card_played(3)
+    print("✓ Réveil sur commit d'un autre worker")
+
+
+def test_change_outside_lock_conflicts():
+    """Un état modifié hors verrou n'est pas écrasé en silence par celui d'un autre worker"""
+    worker1, worker2 = make_workers()
+    room1 = worker1.get('table1')
+    room2 = worker2.get('table1')
+    with room1.lock:
+        pass
+
+    room1.state.score = 9  # Hors verrou
+    with room2.lock:
+        room2.state.add_played_card(5)
+
+    try:
+        with room1.lock:
+            assert False, "conflit non détecté"
+    except StateConflictError:
+        pass
+    with room1.lock:
+        assert room1.state.is_card_played(5) and room1.state.score == 0
+    print("✓ Conflit d'une modification hors verrou")
+
+
+if __name__ == "__main__":
+    test_state_seen_by_other_worker()
+    test_atomic_read_modify_write()
+    test_presence_across_workers()
+    test_wait_wakes_on_other_worker_commit()
+    test_change_outside_lock_conflicts()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test de la structure StoryLog (index des cartes, identifiants stables, historique en cache)
+"""
+
+import json
+from game_logic import GameState
+from narrative_context import entry_tokens
+from story_log import StoryLog
+
+
+def make_entry(numero, text):
+    return {
+        'player': 'Joueur1',
+        'role': 'Soldat',
+        'text': text,
+        'card': {'numero': str(numero)} if numero is not None else None,
+        'effect': '+'
+    }
+
+
+def test_card_index_and_ids():
+    """Les positions des cartes et des entrées suivent les suppressions"""
+    story = StoryLog([make_entry(None, "Intro."), make_entry(12, "A."), make_entry(7, "B.")])
+    entry_id = story[2]['id']
+    assert story.position_of_card(7) == 2
+    assert story.position_of_card(99) is None
+
+    story.pop(1)
+    assert story.position_of_card(12) is None
+    assert story.position_of_card(7) == 1
+    assert story.position_of(entry_id) == 1
+    # Toujours sérialisable comme une liste
+    assert len(json.loads(json.dumps(story))) == 2
+    print("✓ Index des cartes et identifiants stables")
+
+
+def test_history_cache():
+    """L'historique est complété à l'ajout et recalculé après une modification"""
+    story = StoryLog([make_entry(None, "Intro.")])
+    story.append(make_entry(3, "Suite."))
+    assert story.history() == "Intro. Suite."
+
+    story.update_entry(1, text="Autre suite.")
+    assert story.history() == "Intro. Autre suite."
+    story.reverse()
+    assert story.history() == "Autre suite. Intro."
+    print("✓ Historique en cache")
+
+
+def test_token_counts():
+    """Le total de tokens suit chaque modification, la révision change sauf à l'ajout"""
+    story = StoryLog([make_entry(None, "Intro.")])
+    revision = story.revision
+    story.append(make_entry(3, "Une suite nettement plus longue."))
+    assert story.revision == revision
+    assert story.token_total() == sum(entry_tokens(entry['text']) for entry in story)
+
+    story.update_entry(1, text="Court.")
+    assert story.revision != revision
+    assert story.tokens(1) == entry_tokens("Court.")
+    story.pop(0)
+    assert story.token_total() == entry_tokens("Court.")
+    assert StoryLog().revision != story.revision
+    print("✓ Tokens et révisions")
+
+
+def test_game_state_integration():
+    """GameState utilise l'index pour la carte 101 et mémorise les cartes spéciales"""
+    game_state = GameState()
+    game_state.append_story_entry(make_entry(5, "Un loup hurle."))
+
+    assert game_state.validate_card_input("101 5")[0] == 'special_101'
+    assert game_state.validate_card_input("101 6")[0] == 'invalid'
+
+    game_state.add_special_card({'player': 'Joueur1', 'card_number': 100})
+    assert game_state.story.has_played_special('Joueur1', 100)
+    assert not game_state.story.has_played_special('Joueur1', 101)
+
+    # L'inversion remplace l'histoire sans oublier les cartes spéciales
+    game_state.replace_story(list(reversed(game_state.story)))
+    assert game_state.story.has_played_special('Joueur1', 100)
+    assert game_state.story.position_of_card(5) == 0
+
+    game_state.reset_game()
+    assert not game_state.story.has_played_special('Joueur1', 100)
+    print("✓ Intégration dans GameState")
+
+
+if __name__ == "__main__":
+    test_card_index_and_ids()
+    test_history_cache()
+    test_token_counts()
+    test_game_state_integration()